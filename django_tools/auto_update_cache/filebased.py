@@ -9,12 +9,15 @@
 
 import logging
 import os
-import pathlib
 import time
+import zlib
 
 from django.conf import settings
 from django.core.cache.backends.filebased import FileBasedCache
 
+from django_tools.cache.file_index import FileCacheIndexMixin
+from django_tools.cache.pressure import DEFAULT_PRESSURE_PROVIDER, get_pressure_provider
+
 
 try:
     import pickle
@@ -27,6 +30,7 @@ logger = logging.getLogger(__name__)
 
 AUTOUPDATECACHE_CHANGE_TIME = getattr(settings, "AUTOUPDATECACHE_CHANGE_TIME", "AUTOUPDATECACHE_CHANGE_TIME")
 AUTOUPDATECACHE_UPDATE_TIMESTAMP = getattr(settings, "AUTOUPDATECACHE_UPDATE_TIMESTAMP", 10)
+AUTOUPDATECACHE_PRESSURE_PROVIDER = getattr(settings, "AUTOUPDATECACHE_PRESSURE_PROVIDER", DEFAULT_PRESSURE_PROVIDER)
 AUTOUPDATECACHE_TIMES = getattr(settings, "AUTOUPDATECACHE_TIMES", (
     # load value, max age in sec.
     (0, 10),  # < 0.5     -> 10sec
@@ -59,9 +63,9 @@ def get_max_age(load_average) -> int:
             return max_age
 
 
-class AutoUpdateFileBasedCache(FileBasedCache):
+class AutoUpdateFileBasedCache(FileCacheIndexMixin, FileBasedCache):
     CHANGE_TIME = None  # Timestamp of the "last update"
-    NEXT_SYNC = None  # Point in the future to update the CHANGE_TIME
+    NEXT_SYNC = 0  # Point in the future to update the CHANGE_TIME
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -97,7 +101,7 @@ class AutoUpdateFileBasedCache(FileBasedCache):
             if change_time is None:
                 logger.debug("CHANGE_TIME is None")
                 self.save_change_time()  # save change time into cache
-            elif change_time > self.CHANGE_TIME:
+            elif self.CHANGE_TIME is None or change_time > self.CHANGE_TIME:
                 self.CHANGE_TIME = change_time
                 logger.debug(f"update change time to: {change_time!r}")
         else:
@@ -116,7 +120,7 @@ class AutoUpdateFileBasedCache(FileBasedCache):
             return False
 
         outdate_age = last_change_time - create_time
-        load_average = os.getloadavg()[0]  # load over last minute
+        load_average = get_pressure_provider(AUTOUPDATECACHE_PRESSURE_PROVIDER).get_pressure()
         max_age = get_max_age(load_average)
         if outdate_age > max_age:
             logger.debug(f"Out-dated {key!r} (age: {outdate_age}, max age: {max_age}, load: {load_average})")
@@ -126,15 +130,21 @@ class AutoUpdateFileBasedCache(FileBasedCache):
         return False
 
     def get(self, key, default=None, version=None):
-        key = self.make_key(key, version=version)
-        self.validate_key(key)
+        fname = self._key_to_file(key, version)
+
+        # With the optional index: expired/out-dated entries without opening the file
+        index_entry = self._index_lookup(fname)
+        if index_entry is not None and (
+            index_entry.expiry < time.time() or self.must_updated(key, index_entry.mtime)
+        ):
+            self._delete(fname)
+            return default
 
-        fname = pathlib.Path(self._key_to_file(key))
         try:
-            with fname.open('rb') as f:
+            with open(fname, 'rb') as f:
                 exp = pickle.load(f)
                 now = time.time()
-                if exp < now:
+                if exp is not None and exp < now:
                     self._delete(fname)
                 else:
                     # ----------------------------------------------------------
@@ -142,14 +152,15 @@ class AutoUpdateFileBasedCache(FileBasedCache):
                     #
                     # Use the modify time of the cache file and
                     # compare it with the "last change" time.
+                    # (Already done above, if the entry is in the index)
                     mtime = os.fstat(f.fileno()).st_mtime
-                    if self.must_updated(key, mtime):
+                    if index_entry is None and self.must_updated(key, mtime):
                         self._delete(fname)
                     else:
-                        return pickle.load(f)
+                        return pickle.loads(zlib.decompress(f.read()))
 
                     # END area of changes to the original function.
                     # ----------------------------------------------------------
-        except (OSError, EOFError, pickle.PickleError):
+        except (OSError, EOFError, pickle.PickleError, zlib.error):
             pass
         return default
@@ -0,0 +1,120 @@
+"""
+    Compression codecs for cached pages
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Used by the per-site cache middleware to store the content pre-compressed.
+    gzip is always available, brotli ("br") needs the brotli package and
+    zstd needs Python 3.14 or the zstandard package.
+
+    :copyleft: 2026 by the django-tools team, see AUTHORS for more details.
+    :license: GNU GPL v3 or above, see LICENSE for more details.
+"""
+
+import gzip
+
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    from compression import zstd  # Python 3.14+
+except ImportError:
+    try:
+        import zstandard as zstd
+    except ImportError:
+        zstd = None
+
+
+# Don't compress smaller content (same limit as django.middleware.gzip.GZipMiddleware):
+MIN_SIZE = 200
+
+IDENTITY = 'identity'
+
+
+def _gzip_compress(data):
+    # mtime=0: The same content results always in the same bytes
+    return gzip.compress(data, compresslevel=6, mtime=0)
+
+
+CODECS = {
+    'gzip': (_gzip_compress, gzip.decompress),
+}
+if brotli is not None:
+    CODECS['br'] = (brotli.compress, brotli.decompress)
+if zstd is not None:
+    CODECS['zstd'] = (zstd.compress, zstd.decompress)
+
+
+def get_available_encodings(encodings):
+    """
+    return the given encodings that can be used here.
+
+    >>> get_available_encodings(('gzip', 'foobar'))
+    ('gzip',)
+    """
+    return tuple(encoding for encoding in encodings if encoding in CODECS)
+
+
+def compress(encoding, data):
+    compress_func = CODECS[encoding][0]
+    return compress_func(data)
+
+
+def decompress(encoding, data):
+    decompress_func = CODECS[encoding][1]
+    return decompress_func(data)
+
+
+def parse_accept_encoding(header):
+    """
+    return the encodings with the q-value from the "Accept-Encoding" header
+
+    >>> parse_accept_encoding('gzip, deflate, br;q=0.9, *;q=0')
+    {'gzip': 1.0, 'deflate': 1.0, 'br': 0.9, '*': 0.0}
+    >>> parse_accept_encoding('GZIP;q=invalid')
+    {'gzip': 0.0}
+    >>> parse_accept_encoding('')
+    {}
+    """
+    result = {}
+    for part in header.split(','):
+        encoding, _, params = part.partition(';')
+        encoding = encoding.strip().lower()
+        if not encoding:
+            continue
+
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        result[encoding] = quality
+    return result
+
+
+def choose_encoding(accept_encoding, encodings):
+    """
+    return the first of the given encodings that is accepted by the client or None
+
+    >>> choose_encoding('gzip, deflate, br', ('br', 'gzip'))
+    'br'
+    >>> choose_encoding('gzip, br;q=0', ('br', 'gzip'))
+    'gzip'
+    >>> choose_encoding('*', ('br', 'gzip'))
+    'br'
+    >>> choose_encoding('deflate', ('br', 'gzip')) is None
+    True
+    """
+    if not accept_encoding:
+        return None
+
+    accepted = parse_accept_encoding(accept_encoding)
+    default = accepted.get('*', 0.0)
+    for encoding in encodings:
+        if accepted.get(encoding, default) > 0:
+            return encoding
+    return None
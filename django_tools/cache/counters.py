@@ -0,0 +1,154 @@
+"""
+    Sharded counters
+    ~~~~~~~~~~~~~~~~
+
+    Thread safe counters without a lock in the hot path: Every thread counts
+    into its own dict (shard). The sum of all shards is the process total.
+
+    flush() sends only the difference since the last flush to the shared
+    cache backend (one cache.incr() per changed counter), so many
+    processes can count together without a cache call per event.
+
+    :copyleft: 2026 by the django-tools team, see AUTHORS for more details.
+    :license: GNU GPL v3 or above, see LICENSE for more details.
+"""
+
+import logging
+import os
+import threading
+import time
+import weakref
+
+
+logger = logging.getLogger(__name__)
+
+
+# All counters of this process, for the reset after a fork:
+_COUNTERS = weakref.WeakSet()
+
+
+class ShardedCounter:
+    """
+    >>> counter = ShardedCounter({'requests': 'requests_key', 'hits': 'hits_key'})
+    >>> counter.incr('requests')
+    >>> counter.incr('requests')
+    >>> counter.incr('hits')
+    >>> counter.get_totals()
+    {'requests': 2, 'hits': 1}
+    >>> counter.get_unflushed()
+    {'requests': 2, 'hits': 1}
+    """
+
+    def __init__(self, cache_keys, flush_interval=5):
+        """
+        cache_keys: counter name -> cache key used by flush()
+        flush_interval: seconds between two flush_if_due() calls
+        """
+        self.cache_keys = dict(cache_keys)
+        self.names = tuple(self.cache_keys)
+        self.flush_interval = flush_interval
+
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._shards = []  # (thread, shard) tuples, replaced on change (copy-on-write)
+        self._retired = dict.fromkeys(self.names, 0)  # counts of finished threads
+        self._flushed = dict.fromkeys(self.names, 0)
+        self._next_flush = 0
+        _COUNTERS.add(self)
+
+    def _new_shard(self):
+        shard = dict.fromkeys(self.names, 0)
+        with self._lock:
+            shards = []
+            for thread, old_shard in self._shards:
+                if thread.is_alive():
+                    shards.append((thread, old_shard))
+                else:
+                    # Merge shards of finished threads, so they don't pile up
+                    for name, value in old_shard.items():
+                        self._retired[name] += value
+            shards.append((threading.current_thread(), shard))
+            self._shards = shards
+        self._local.shard = shard
+        return shard
+
+    def incr(self, name, delta=1):
+        try:
+            shard = self._local.shard
+        except AttributeError:
+            shard = self._new_shard()
+        shard[name] += delta  # Only the own thread writes into this dict
+
+    def get_totals(self):
+        """
+        return the counts of this process
+        """
+        with self._lock:
+            totals = self._retired.copy()
+            shards = self._shards
+        for thread, shard in shards:
+            for name, value in shard.copy().items():
+                totals[name] += value
+        return totals
+
+    def get_unflushed(self):
+        totals = self.get_totals()
+        return {name: totals[name] - self._flushed[name] for name in self.names}
+
+    def flush(self, cache):
+        """
+        Add the counts since the last flush to the values in the cache.
+        """
+        with self._flush_lock:
+            totals = self.get_totals()
+            for name in self.names:
+                delta = totals[name] - self._flushed[name]
+                if not delta:
+                    continue
+                key = self.cache_keys[name]
+                try:
+                    cache.incr(key, delta)
+                except ValueError:  # Doesn't exist, yet.
+                    if not cache.add(key, delta, timeout=None):
+                        cache.incr(key, delta)  # Created by a other process in the meantime
+                self._flushed[name] = totals[name]
+            self._next_flush = time.monotonic() + self.flush_interval
+
+    def flush_if_due(self, cache):
+        if time.monotonic() < self._next_flush:
+            return
+        if self._flush_lock.locked():
+            return  # A other thread flushes at the moment
+        try:
+            self.flush(cache)
+        except Exception:
+            logger.exception('Flush counters failed')
+            self._next_flush = time.monotonic() + self.flush_interval
+
+    def reset(self):
+        """
+        Set all counts of this process to zero.
+        """
+        with self._lock:
+            for thread, shard in self._shards:
+                for name in self.names:
+                    shard[name] = 0
+            self._retired = dict.fromkeys(self.names, 0)
+            self._flushed = dict.fromkeys(self.names, 0)
+            self._next_flush = 0
+
+    def _after_fork(self):
+        # The counts of the parent are flushed by the parent process
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._flushed = self.get_totals()
+        self._next_flush = 0
+
+
+def _reset_after_fork():
+    for counter in list(_COUNTERS):
+        counter._after_fork()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
@@ -0,0 +1,439 @@
+"""
+    mmap index for file based caches
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    A file based cache stores every entry in a own file. To check the expiry
+    the file must be opened and to cull entries the whole directory must be
+    listed. With many entries, this can stall requests for seconds.
+
+    The optional index is one memory mapped file with fixed-size slots
+    (a hash table with linear probing). Every slot holds the md5 hash of the
+    key (that is also the file name), the expiry, the mtime and the size of
+    the entry. So expired/out-dated entries can be detected without opening
+    the entry file and culling needs only O(culled) operations.
+
+    Activate it via OPTIONS, e.g.:
+
+        CACHES = {
+            'default': {
+                'BACKEND': 'django_tools.cache.smooth_cache_backends.SmoothFileBasedCache',
+                'LOCATION': '/var/tmp/django_cache',
+                'OPTIONS': {
+                    'MAX_ENTRIES': 250_000,
+                    'MMAP_INDEX': True,
+                },
+            }
+        }
+
+    :copyleft: 2026 by the django-tools team, see AUTHORS for more details.
+    :license: GNU GPL v3 or above, see LICENSE for more details.
+"""
+
+import logging
+import math
+import mmap
+import os
+import pickle
+import random
+import struct
+import threading
+import time
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.core.files import locks
+
+
+logger = logging.getLogger(__name__)
+
+
+INDEX_FILENAME = 'index.mmap'
+
+_HEADER = struct.Struct('<4sHxxIII')  # magic, version, slot count, used slots, deleted slots
+_HEADER_SIZE = 64
+_MAGIC = b'DTCI'
+_VERSION = 1
+
+_SLOT = struct.Struct('<B3x16sddI')  # state, md5 digest, expiry, mtime, size
+_EMPTY, _USED, _DELETED = 0, 1, 2
+
+# Rebuild the hash table, if used + deleted slots exceed this ratio:
+_MAX_FILL = 0.75
+
+
+def get_slot_count(max_entries):
+    """
+    return the number of slots for the given max entries: The next power of two
+    with enough free slots for the entries and the deleted markers, so that the
+    linear probing stays short and a rebuild is rarely needed.
+
+    >>> get_slot_count(300)
+    1024
+    >>> get_slot_count(200_000)
+    1048576
+    """
+    return 2 ** math.ceil(math.log2(max(max_entries, 8) * 2 / _MAX_FILL))
+
+
+class IndexEntry:
+    __slots__ = ('expiry', 'mtime', 'size')
+
+    def __init__(self, expiry, mtime, size):
+        self.expiry = expiry  # math.inf for "never expires"
+        self.mtime = mtime
+        self.size = size
+
+
+class IndexMismatchError(Exception):
+    """
+    The existing index file was created with other settings (e.g. other MMAP_INDEX_SLOTS/MAX_ENTRIES)
+    """
+
+
+class FileCacheIndex:
+    """
+    Memory mapped hash table, shared by all threads and processes that use the same cache directory.
+    Readers are lock free, writers hold a thread lock and a file lock.
+    """
+
+    def __init__(self, path, slot_count):
+        self.path = path
+        self.slot_count = slot_count
+        self.thread_lock = threading.Lock()
+
+        size = _HEADER_SIZE + slot_count * _SLOT.size
+        self.file = open(path, 'a+b')  # noqa: SIM115 - Must be open for the whole lifetime
+        try:
+            with self.lock():
+                self.file.seek(0, os.SEEK_END)
+                file_size = self.file.tell()
+                if file_size == 0:
+                    self.file.truncate(size)  # New (zero filled) index file
+                elif file_size != size:
+                    # Never resize it: Other processes may have it mapped with their size!
+                    raise IndexMismatchError(
+                        f'{path} has {file_size} bytes, but {size} are needed for {slot_count} slots'
+                    )
+                self.mmap = mmap.mmap(self.file.fileno(), size)
+
+                magic, version, existing_slot_count, _used, _deleted = _HEADER.unpack_from(self.mmap, 0)
+                if magic == bytes(len(_MAGIC)):
+                    # New file, or the creator died before the header was written
+                    self._set_counts(0, 0)
+                    self.created = True
+                elif (magic, version, existing_slot_count) != (_MAGIC, _VERSION, slot_count):
+                    self.mmap.close()
+                    raise IndexMismatchError(
+                        f'{path} has magic {magic!r} version {version} with {existing_slot_count} slots,'
+                        f' but {_MAGIC!r} version {_VERSION} with {slot_count} slots are needed'
+                    )
+                else:
+                    self.created = False
+        except BaseException:
+            self.file.close()
+            raise
+
+    def lock(self):
+        return _IndexLock(self)
+
+    def __len__(self):
+        return _HEADER.unpack_from(self.mmap, 0)[3]
+
+    def _get_counts(self):
+        return _HEADER.unpack_from(self.mmap, 0)[3:]
+
+    def _set_counts(self, used, deleted):
+        _HEADER.pack_into(self.mmap, 0, _MAGIC, _VERSION, self.slot_count, used, deleted)
+
+    def _offset(self, slot):
+        return _HEADER_SIZE + slot * _SLOT.size
+
+    def _find(self, digest):
+        """
+        return the slot number of the given digest and the first reusable slot.
+        """
+        mask = self.slot_count - 1
+        slot = int.from_bytes(digest[:8], 'little') & mask
+        reusable = None
+        for _ in range(self.slot_count):
+            state, slot_digest, _expiry, _mtime, _size = _SLOT.unpack_from(self.mmap, self._offset(slot))
+            if state == _EMPTY:
+                return None, slot if reusable is None else reusable
+            elif state == _DELETED:
+                if reusable is None:
+                    reusable = slot
+            elif slot_digest == digest:
+                return slot, reusable
+            slot = (slot + 1) & mask
+        return None, reusable
+
+    def lookup(self, digest):
+        """
+        return the IndexEntry for the given md5 digest or None.
+        """
+        slot, _reusable = self._find(digest)
+        if slot is None:
+            return None
+        state, slot_digest, expiry, mtime, size = _SLOT.unpack_from(self.mmap, self._offset(slot))
+        if state != _USED or slot_digest != digest:
+            return None  # Changed by a other thread/process in the meantime
+        return IndexEntry(expiry, mtime, size)
+
+    def store(self, digest, expiry, mtime, size):
+        with self.lock():
+            slot, reusable = self._find(digest)
+            if slot is None:
+                used, deleted = self._get_counts()
+                if reusable is None or (used + deleted + 1) / self.slot_count > _MAX_FILL:
+                    self._rebuild()
+                    used, deleted = self._get_counts()
+                    slot, reusable = self._find(digest)
+                if reusable is None:
+                    logger.warning(f'Cache index {self.path} is full!')
+                    return
+                slot = reusable
+                if self.mmap[self._offset(slot)] == _DELETED:
+                    deleted -= 1
+                self._set_counts(used + 1, deleted)
+            _SLOT.pack_into(self.mmap, self._offset(slot), _USED, digest, expiry, mtime, size)
+
+    def remove(self, digest):
+        with self.lock():
+            slot, _reusable = self._find(digest)
+            if slot is not None:
+                self._remove_slot(slot)
+
+    def _remove_slot(self, slot):
+        _SLOT.pack_into(self.mmap, self._offset(slot), _DELETED, bytes(16), 0, 0, 0)
+        used, deleted = self._get_counts()
+        self._set_counts(max(used - 1, 0), deleted + 1)
+
+    def _sync_counts(self):
+        """
+        Set the counts in the header to the real slot states (Must be called with the lock hold)
+        """
+        states = [self.mmap[self._offset(slot)] for slot in range(self.slot_count)]
+        self._set_counts(states.count(_USED), states.count(_DELETED))
+
+    def cull(self, count):
+        """
+        Remove the given number of random entries and return their md5 digests.
+        Needs O(count) operations, as long as the index is not nearly empty.
+        """
+        digests = []
+        mask = self.slot_count - 1
+        with self.lock():
+            while len(digests) < count and len(self):
+                slot = random.randrange(self.slot_count)
+                for _ in range(self.slot_count):
+                    state, digest, _expiry, _mtime, _size = _SLOT.unpack_from(self.mmap, self._offset(slot))
+                    if state == _USED:
+                        break
+                    slot = (slot + 1) & mask
+                else:
+                    # The used count in the header doesn't match the slots (e.g.: a crashed writer)
+                    logger.warning(f'Used count {len(self)} of {self.path} is wrong: sync it with the slots')
+                    self._sync_counts()
+                    continue
+                self._remove_slot(slot)
+                digests.append(digest)
+        return digests
+
+    def clear(self):
+        with self.lock():
+            self.mmap[_HEADER_SIZE:] = bytes(self.slot_count * _SLOT.size)
+            self._set_counts(0, 0)
+
+    def items(self):
+        """
+        Iterate over (digest, IndexEntry) of all used slots.
+        """
+        for slot in range(self.slot_count):
+            state, digest, expiry, mtime, size = _SLOT.unpack_from(self.mmap, self._offset(slot))
+            if state == _USED:
+                yield digest, IndexEntry(expiry, mtime, size)
+
+    def _rebuild(self):
+        """
+        Remove all deleted markers (Must be called with the lock hold)
+        """
+        entries = list(self.items())
+        self.mmap[_HEADER_SIZE:] = bytes(self.slot_count * _SLOT.size)
+        mask = self.slot_count - 1
+        for digest, entry in entries:
+            slot = int.from_bytes(digest[:8], 'little') & mask
+            while self.mmap[self._offset(slot)] != _EMPTY:
+                slot = (slot + 1) & mask
+            _SLOT.pack_into(self.mmap, self._offset(slot), _USED, digest, entry.expiry, entry.mtime, entry.size)
+        self._set_counts(len(entries), 0)
+
+    def close(self):
+        self.mmap.close()
+        self.file.close()
+
+
+class _IndexLock:
+    """
+    fcntl locks are hold per process, so the threads need a own lock.
+    """
+
+    def __init__(self, index):
+        self.index = index
+
+    def __enter__(self):
+        self.index.thread_lock.acquire()
+        locks.lock(self.index.file, locks.LOCK_EX)
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        locks.unlock(self.index.file)
+        self.index.thread_lock.release()
+
+
+# All FileCacheIndex instances of the current process:
+_INDEXES = {}
+_INDEXES_LOCK = threading.Lock()
+
+
+class FileCacheIndexMixin:
+    """
+    Maintain a FileCacheIndex in a FileBasedCache, if OPTIONS['MMAP_INDEX'] is True.
+    Must be placed before FileBasedCache in the bases.
+    """
+
+    def __init__(self, dir, params):
+        super().__init__(dir, params)
+        options = params.get('OPTIONS', {})
+        self._use_index = options.get('MMAP_INDEX', False)
+        self._index_slots = options.get('MMAP_INDEX_SLOTS') or get_slot_count(self._max_entries)
+
+    @property
+    def file_index(self):
+        """
+        The FileCacheIndex of this cache directory or None, if not activated
+        or the existing index file doesn't match the settings of this process.
+        """
+        if not self._use_index:
+            return None
+        try:
+            return _INDEXES[self._dir]
+        except KeyError:
+            with _INDEXES_LOCK:
+                if self._dir not in _INDEXES:
+                    self._createdir()
+                    try:
+                        index = FileCacheIndex(os.path.join(self._dir, INDEX_FILENAME), self._index_slots)
+                    except IndexMismatchError as err:
+                        # Another process may use the index: Cull via directory listing, without it.
+                        logger.warning(
+                            f'Cache index not used: {err}'
+                            f' (Delete it, if no process with the old settings is running)'
+                        )
+                        index = None
+                    else:
+                        if index.created:
+                            self._fill_index(index)
+                    _INDEXES[self._dir] = index
+                return _INDEXES[self._dir]
+
+    def _fill_index(self, index):
+        """
+        Add all existing entries to a new index (Needs one directory listing)
+        """
+        for fname in self._list_cache_files():
+            try:
+                with open(fname, 'rb') as f:
+                    expiry = pickle.load(f)
+                    stat = os.fstat(f.fileno())
+            except (OSError, EOFError, pickle.PickleError):
+                continue
+            index.store(
+                self._file_to_digest(fname),
+                math.inf if expiry is None else expiry,
+                stat.st_mtime,
+                stat.st_size,
+            )
+        logger.info(f'Cache index {index.path} created with {len(index)} entries')
+
+    def _file_to_digest(self, fname):
+        return bytes.fromhex(os.path.basename(fname)[: -len(self.cache_suffix)])
+
+    def _digest_to_file(self, digest):
+        return os.path.join(self._dir, f'{digest.hex()}{self.cache_suffix}')
+
+    def _index_lookup(self, fname):
+        """
+        return the IndexEntry for the given cache file or None.
+        """
+        index = self.file_index
+        if index is None:
+            return None
+        return index.lookup(self._file_to_digest(fname))
+
+    def _index_store(self, fname, timeout):
+        index = self.file_index
+        if index is not None:
+            try:
+                stat = os.stat(fname)
+            except OSError:
+                return  # e.g.: deleted by a other process in the meantime
+            expiry = self.get_backend_timeout(timeout)
+            index.store(
+                self._file_to_digest(fname),
+                math.inf if expiry is None else expiry,
+                stat.st_mtime,
+                stat.st_size,
+            )
+
+    def get(self, key, default=None, version=None):
+        fname = self._key_to_file(key, version)
+        entry = self._index_lookup(fname)
+        if entry is not None and entry.expiry < time.time():
+            self._delete(fname)
+            return default
+        return super().get(key, default, version)
+
+    def has_key(self, key, version=None):
+        fname = self._key_to_file(key, version)
+        entry = self._index_lookup(fname)
+        if entry is not None and entry.expiry < time.time():
+            self._delete(fname)
+            return False
+        return super().has_key(key, version)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        super().set(key, value, timeout, version)
+        self._index_store(self._key_to_file(key, version), timeout)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        if super().touch(key, timeout, version):
+            self._index_store(self._key_to_file(key, version), timeout)
+            return True
+        return False
+
+    def _delete(self, fname):
+        index = self.file_index
+        if index is not None and fname.endswith(self.cache_suffix):
+            index.remove(self._file_to_digest(fname))
+        return super()._delete(fname)
+
+    def _cull(self):
+        """
+        Same as FileBasedCache._cull(), but without a directory listing.
+        """
+        index = self.file_index
+        if index is None:
+            return super()._cull()
+
+        num_entries = len(index)
+        if num_entries < self._max_entries:
+            return  # return early if no culling is required
+        if self._cull_frequency == 0:
+            return self.clear()  # Clear the cache when CULL_FREQUENCY = 0
+
+        for digest in index.cull(int(num_entries / self._cull_frequency)):
+            super()._delete(self._digest_to_file(digest))
+
+    def clear(self):
+        super().clear()
+        index = self.file_index
+        if index is not None:
+            index.clear()
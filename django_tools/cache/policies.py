@@ -0,0 +1,158 @@
+r"""
+    per-URL cache policies
+    ~~~~~~~~~~~~~~~~~~~~~~
+
+    Setup the per-site cache middleware per URL, without a CACHE_CALLBACK, e.g.:
+
+        CACHE_MIDDLEWARE_POLICIES = (
+            ('/admin/', {'cache': False}),
+            ('/blog/', {'timeout': 3600, 'stale_time': 600}),
+            ('/api/', {'vary': ('Accept',)}),
+            (re.compile(r'^/news/\d+/$'), {'timeout': 60}),
+        )
+
+    A string is a prefix of request.path, a compiled regular expression must match
+    at the start of request.path. Regular expressions are checked first (in the given
+    order), after this the longest matching prefix is used.
+
+    All patterns are compiled into one regular expression, so every request is
+    decided with one re.match() call. Only regular expressions with groups (or global
+    inline flags) are matched on their own.
+
+    :copyleft: 2026 by the django-tools team, see AUTHORS for more details.
+    :license: GNU GPL v3 or above, see LICENSE for more details.
+"""
+
+import re
+
+
+class CachePolicy:
+    __slots__ = ('cache', 'pattern', 'stale_time', 'timeout', 'vary')
+
+    def __init__(self, pattern=None, cache=True, timeout=None, vary=(), stale_time=None):
+        self.pattern = pattern
+        self.cache = cache  # False: never cache these URLs
+        self.timeout = timeout  # None: use CACHE_MIDDLEWARE_SECONDS (if the response has no "max-age")
+        self.vary = tuple(vary)  # request header names that are added to the cache key
+        self.stale_time = stale_time  # None: use CACHE_MIDDLEWARE_STALE_TIME
+
+    def __repr__(self):
+        return (
+            f'<CachePolicy {self.pattern!r} cache={self.cache} timeout={self.timeout}'
+            f' vary={self.vary} stale_time={self.stale_time}>'
+        )
+
+
+DEFAULT_POLICY = CachePolicy()
+
+_INLINE_FLAGS = ((re.IGNORECASE, 'i'), (re.MULTILINE, 'm'), (re.DOTALL, 's'), (re.VERBOSE, 'x'))
+
+
+def get_scoped_regex(pattern):
+    r"""
+    Wrap the pattern into a non-capturing group with the flags of the compiled pattern,
+    so it can be a alternative in the combined regular expression.
+
+    >>> get_scoped_regex(re.compile('/foo/', re.IGNORECASE))
+    '(?i:/foo/)'
+    >>> get_scoped_regex(re.compile('/foo/|/bar/'))
+    '(?:/foo/|/bar/)'
+    >>> get_scoped_regex(re.compile('/foo/  # comment', re.VERBOSE))
+    '(?x:/foo/  # comment\n)'
+    """
+    regex = pattern.pattern
+    if pattern.flags & re.VERBOSE:
+        regex += '\n'  # End a comment in the last line
+    flags = ''.join(letter for flag, letter in _INLINE_FLAGS if pattern.flags & flag)
+    return f'(?{flags}:{regex})'
+
+
+def can_combine(pattern):
+    r"""
+    return True if the compiled pattern can be a part of the combined regular expression.
+    Not possible with groups: Their numbers (and backreferences) would change and
+    their names may clash with other patterns. Also not possible with global inline flags.
+
+    >>> can_combine(re.compile(r'/blog/\d+/$'))
+    True
+    >>> can_combine(re.compile(r'/(?P<year>\d{4})/'))
+    False
+    >>> can_combine(re.compile(r'/(\w+)/\1/'))
+    False
+    >>> can_combine(re.compile(r'(?i)/foo/'))
+    False
+    """
+    if pattern.groups:
+        return False
+    try:
+        re.compile(get_scoped_regex(pattern))
+    except re.error:
+        return False
+    return True
+
+
+class PolicyTable:
+    r"""
+    >>> table = PolicyTable((
+    ...     ('/', {'timeout': 60}),
+    ...     ('/blog/', {'timeout': 3600}),
+    ...     ('/blog/drafts/', {'cache': False}),
+    ...     (re.compile(r'/blog/\d+/$'), {'timeout': 10}),
+    ... ))
+    >>> table.lookup('/blog/drafts/foo/')
+    <CachePolicy '/blog/drafts/' cache=False timeout=None vary=() stale_time=None>
+    >>> table.lookup('/blog/foo/').timeout
+    3600
+    >>> table.lookup('/blog/123/').timeout
+    10
+    >>> table.lookup('/foo/').timeout
+    60
+    >>> PolicyTable(()).lookup('/foo/') is DEFAULT_POLICY
+    True
+    """
+
+    def __init__(self, policies, default=DEFAULT_POLICY):
+        self.default = default
+
+        regex_patterns = []
+        prefix_patterns = []
+        for pattern, options in policies:
+            if isinstance(pattern, re.Pattern):
+                regex_patterns.append((pattern, CachePolicy(pattern.pattern, **options)))
+            elif isinstance(pattern, str):
+                prefix_patterns.append((re.escape(pattern), CachePolicy(pattern, **options)))
+            else:
+                raise TypeError(f'Cache policy pattern must be a string or a compiled regex, not: {pattern!r}')
+
+        # The first matching alternative wins -> sort the prefixes: longest first
+        prefix_patterns.sort(key=lambda item: len(item[1].pattern), reverse=True)
+
+        # Consecutive patterns are combined into one regular expression. A regex that
+        # can't be combined (see can_combine()) is matched on its own, in the same order.
+        self.matchers = []  # [(compiled regex, {group name: policy} or a policy), ...]
+        alternatives = {}
+        for regex, policy in regex_patterns + prefix_patterns:
+            if isinstance(regex, re.Pattern):
+                if not can_combine(regex):
+                    self._add_combined(alternatives)
+                    alternatives = {}
+                    self.matchers.append((regex, policy))
+                    continue
+                regex = get_scoped_regex(regex)
+            alternatives[f'_policy{len(alternatives)}'] = (regex, policy)
+        self._add_combined(alternatives)
+
+    def _add_combined(self, alternatives):
+        if alternatives:
+            regex = re.compile('|'.join(f'(?P<{name}>{regex})' for name, (regex, _) in alternatives.items()))
+            self.matchers.append((regex, {name: policy for name, (_, policy) in alternatives.items()}))
+
+    def lookup(self, path):
+        for regex, policy in self.matchers:
+            match = regex.match(path)
+            if match is not None:
+                if isinstance(policy, dict):
+                    # Combined patterns have no own groups -> lastgroup is the matching alternative
+                    return policy[match.lastgroup]
+                return policy
+        return self.default
@@ -0,0 +1,219 @@
+"""
+    pressure provider
+    ~~~~~~~~~~~~~~~~~
+
+    The smooth cache backends and the AutoUpdateFileBasedCache keep out-dated
+    entries longer if the system is under pressure.
+    The "pressure" is a float on the same scale as the load average, because
+    it's mapped to a max age via SMOOTH_CACHE_TIMES / AUTOUPDATECACHE_TIMES.
+
+    os.getloadavg() reflects the whole host. In containers it's better to use
+    e.g. the cgroup v2 CPU pressure or the state of our own request handling.
+
+    more information in the README.
+
+    :copyleft: 2026 by the django-tools team, see AUTHORS for more details.
+    :license: GNU GPL v3 or above, see LICENSE for more details.
+"""
+
+import collections
+import logging
+import math
+import os
+import threading
+import time
+from pathlib import Path
+
+from django.conf import settings
+
+from django_tools.utils.importlib import get_attr_from_string
+
+
+logger = logging.getLogger(__name__)
+
+
+# Sample every pressure provider at most once per interval (in seconds):
+CACHE_PRESSURE_INTERVAL = getattr(settings, 'CACHE_PRESSURE_INTERVAL', 1)
+
+# Number of the last response times used by the ResponseTimeP95Provider:
+CACHE_PRESSURE_WINDOW = getattr(settings, 'CACHE_PRESSURE_WINDOW', 200)
+
+DEFAULT_PRESSURE_PROVIDER = 'django_tools.cache.pressure.LoadAverageProvider'
+
+
+class PressureProvider:
+    """
+    Base class of all pressure provider.
+    Subclasses must implement measure() and should scale the value with self.factor.
+    """
+
+    factor = 1.0
+    interval = CACHE_PRESSURE_INTERVAL
+
+    def __init__(self):
+        self.next_sample = 0  # Point in the future (monotonic clock) to measure again
+        self.pressure = None
+        self.lock = threading.Lock()
+
+    def measure(self) -> float:
+        raise NotImplementedError
+
+    def get_pressure(self) -> float:
+        """
+        return the current pressure, measured at most once per interval.
+        """
+        now = time.monotonic()
+        if now >= self.next_sample:
+            with self.lock:
+                if now >= self.next_sample:
+                    self.pressure = self.measure()
+                    self.next_sample = now + self.interval
+        return self.pressure
+
+
+class LoadAverageProvider(PressureProvider):
+    """
+    The system load over the last minute (The default)
+    """
+
+    def measure(self):
+        return os.getloadavg()[0] * self.factor
+
+
+def parse_psi(text, line_type='some', avg='avg10'):
+    """
+    return one average value from a "pressure stall information" file.
+
+    >>> parse_psi('some avg10=1.50 avg60=0.75 avg300=0.10 total=1234')
+    1.5
+    >>> parse_psi('some avg10=1.50 avg60=0.75 avg300=0.10 total=1234', avg='avg60')
+    0.75
+    >>> parse_psi('full avg10=0.50 avg60=0.00 avg300=0.00 total=56', line_type='full')
+    0.5
+    """
+    for line in text.splitlines():
+        parts = line.split()
+        if parts and parts[0] == line_type:
+            values = dict(part.split('=', 1) for part in parts[1:])
+            return float(values[avg])
+    raise ValueError(f'No {line_type!r} line in: {text!r}')
+
+
+class CgroupPressureProvider(PressureProvider):
+    """
+    The cgroup v2 CPU "pressure stall information" of the own container:
+    The percentage of time in which at least one task waits for the CPU (avg. over 10 sec).
+    With the default factor a stall of 100% results in a pressure of 4.0
+    Falls back to the load average, if the file doesn't exist (e.g.: cgroup v1 or not Linux)
+    """
+
+    path = Path('/sys/fs/cgroup/cpu.pressure')
+    factor = 0.04
+
+    def __init__(self):
+        super().__init__()
+        self.fallback = None
+
+    def measure(self):
+        if self.fallback is None:
+            try:
+                return parse_psi(self.path.read_text()) * self.factor
+            except (OSError, ValueError) as err:
+                logger.warning(f'Use load average: Can not read {self.path}: {err}')
+                self.fallback = LoadAverageProvider()
+        return self.fallback.measure()
+
+
+class RequestStats:
+    """
+    Count the requests in flight and store the last response times.
+    Filled by PressureMiddleware.
+    """
+
+    def __init__(self, window=CACHE_PRESSURE_WINDOW):
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.response_times = collections.deque(maxlen=window)
+
+    def start(self):
+        with self.lock:
+            self.in_flight += 1
+        return time.perf_counter()
+
+    def finish(self, start_time):
+        self.response_times.append(time.perf_counter() - start_time)
+        with self.lock:
+            self.in_flight -= 1
+
+    def get_p95(self):
+        """
+        return the 95th percentile of the last response times in seconds.
+        """
+        response_times = sorted(self.response_times)
+        if not response_times:
+            return 0.0
+        index = math.ceil(len(response_times) * 0.95) - 1
+        return response_times[index]
+
+
+# Statistics of the current process:
+request_stats = RequestStats()
+
+
+class PressureMiddleware:
+    """
+    Collect the request statistics for InFlightRequestsProvider and ResponseTimeP95Provider.
+    Should be the first middleware, to count the complete request handling.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        start_time = request_stats.start()
+        try:
+            return self.get_response(request)
+        finally:
+            request_stats.finish(start_time)
+
+
+class InFlightRequestsProvider(PressureProvider):
+    """
+    The number of requests that are currently handled in this process.
+    With the default factor 16 requests results in a pressure of 4.0
+    Needs the PressureMiddleware.
+    """
+
+    factor = 0.25
+
+    def measure(self):
+        return request_stats.in_flight * self.factor
+
+
+class ResponseTimeP95Provider(PressureProvider):
+    """
+    The 95th percentile of the last response times in seconds.
+    Needs the PressureMiddleware.
+    """
+
+    def measure(self):
+        return request_stats.get_p95() * self.factor
+
+
+# All PressureProvider instances of the current process:
+_PROVIDERS = {}
+
+
+def get_pressure_provider(path=DEFAULT_PRESSURE_PROVIDER):
+    """
+    return the PressureProvider instance for the given class path.
+    All caches share one instance, so every provider is sampled at most once per interval.
+
+    >>> get_pressure_provider('django_tools.cache.pressure.LoadAverageProvider') # doctest: +ELLIPSIS
+    <django_tools.cache.pressure.LoadAverageProvider object at ...>
+    """
+    try:
+        return _PROVIDERS[path]
+    except KeyError:
+        provider_class = get_attr_from_string(path, 'pressure provider')
+        return _PROVIDERS.setdefault(path, provider_class())
@@ -9,15 +9,25 @@
 """
 
 
+import functools
 import logging
 import sys
+import time
+import uuid
+from collections.abc import Mapping
+from hashlib import md5
 
+from asgiref.sync import sync_to_async
 from django.conf import settings
 from django.contrib import messages
 from django.core.cache import cache
-from django.http import HttpResponse
-from django.utils.cache import get_max_age, patch_response_headers
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import get_max_age, patch_response_headers, patch_vary_headers, set_response_etag
+from django.utils.http import http_date, parse_etags, parse_http_date_safe
 
+from django_tools.cache import compression
+from django_tools.cache.counters import ShardedCounter
+from django_tools.cache.policies import PolicyTable
 from django_tools.utils.importlib import get_attr_from_settings
 
 
@@ -27,10 +37,35 @@ CACHE_MIDDLEWARE_ANONYMOUS_ONLY = getattr(settings, 'CACHE_MIDDLEWARE_ANONYMOUS_
 RUN_WITH_DEV_SERVER = getattr(settings, "RUN_WITH_DEV_SERVER", "runserver" in sys.argv)
 EXTRA_DEBUG = getattr(settings, "CACHE_EXTRA_DEBUG", False)
 
+# Stop collecting the chunks of a streaming response for the cache after this number of bytes.
+# Not used for normal responses: Their content is already in memory and is cached as before.
+CACHE_MIDDLEWARE_MAX_SIZE = getattr(settings, "CACHE_MIDDLEWARE_MAX_SIZE", 1024 * 1024)
+
+# Store the content compressed with these encodings, e.g.: ("br", "gzip")
+CACHE_MIDDLEWARE_COMPRESSION = getattr(settings, "CACHE_MIDDLEWARE_COMPRESSION", ())
+
 COUNT_FETCH_FROM_CACHE = getattr(settings, "COUNT_FETCH_FROM_CACHE", False)
 COUNT_UPDATE_CACHE = getattr(settings, "COUNT_UPDATE_CACHE", False)
 COUNT_IN_CACHE = getattr(settings, "COUNT_IN_CACHE", False)
 
+# Single-flight for cache misses: Only one request renders a missing page, concurrent requests
+# for the same page wait for it. Seconds the lock is valid (0 == disabled):
+CACHE_MIDDLEWARE_LOCK_TIMEOUT = getattr(settings, "CACHE_MIDDLEWARE_LOCK_TIMEOUT", 0)
+# Max. seconds a request waits for the page, before it renders the page itself:
+CACHE_MIDDLEWARE_LOCK_WAIT = getattr(settings, "CACHE_MIDDLEWARE_LOCK_WAIT", 5)
+# Retain expired pages this number of seconds: Served (instead of waiting) while a other request renders the page.
+CACHE_MIDDLEWARE_STALE_TIME = getattr(settings, "CACHE_MIDDLEWARE_STALE_TIME", 0)
+
+# Mix the generations of the path segments into the cache keys, needed for delete_cache_prefix():
+CACHE_MIDDLEWARE_PREFIX_INVALIDATION = getattr(settings, "CACHE_MIDDLEWARE_PREFIX_INVALIDATION", False)
+
+# per-URL cache policies, see django_tools.cache.policies
+CACHE_MIDDLEWARE_POLICIES = getattr(settings, "CACHE_MIDDLEWARE_POLICIES", ())
+POLICY_TABLE = PolicyTable(CACHE_MIDDLEWARE_POLICIES)
+
+# Seconds between two transfers of the counts into the cache (with COUNT_IN_CACHE=True):
+COUNT_FLUSH_INTERVAL = getattr(settings, "COUNT_FLUSH_INTERVAL", 5)
+
 cache_callback = get_attr_from_settings("CACHE_CALLBACK", "DjangoTools cache callback")
 logger.debug(f"Use cache callback: {cache_callback!r}")
 
@@ -43,51 +78,96 @@ CACHE_RESPONSE_HITS = "DJANGOTOOLS_CACHE_RESPONSE_HITS_COUNT"
 _CACHE_KEYS = (CACHE_REQUESTS, CACHE_REQUEST_HITS, CACHE_RESPONSES, CACHE_RESPONSE_HITS)
 
 
-# Some information from the cache usage.
-# Note: These values are only for current process/thread valid and they not thread safe!
-# Set settings.COUNT_IN_CACHE=True for process/thread safe counting.
-LOCAL_CACHE_INFO = {
-    # from FetchFromCacheMiddleware:
-    "requests": None,  # total numbers of requests
-    "request hits": None,  # number of cache hits
+# The counts of this process. Thread safe without a lock: every thread counts into its own shard.
+# With settings.COUNT_IN_CACHE=True the counts are added to the values in the cache every COUNT_FLUSH_INTERVAL seconds.
+COUNTER = ShardedCounter(
+    {
+        # from FetchFromCacheMiddleware:
+        "requests": CACHE_REQUESTS,  # total numbers of requests
+        "request hits": CACHE_REQUEST_HITS,  # number of cache hits
+
+        # from UpdateCacheMiddleware:
+        "responses": CACHE_RESPONSES,  # total numbers of responses
+        "response hits": CACHE_RESPONSE_HITS,  # number of responses from cache
+    },
+    flush_interval=COUNT_FLUSH_INTERVAL,
+)
+
 
-    # from UpdateCacheMiddleware:
-    "responses": None,  # total numbers of responses
-    "response hits": None,  # number of responses from cache
-}
+class LocalCacheInfo(Mapping):
+    """
+    Read only dict of the counts in the current process.
+    All values are None, if the counting is disabled.
+    """
+
+    def _is_enabled(self, key):
+        if key in ("requests", "request hits"):
+            return COUNT_FETCH_FROM_CACHE
+        return COUNT_UPDATE_CACHE
+
+    def __getitem__(self, key):
+        if key not in COUNTER.cache_keys:
+            raise KeyError(key)
+        if not self._is_enabled(key):
+            return None
+        return COUNTER.get_totals()[key]
+
+    def __iter__(self):
+        return iter(COUNTER.names)
+
+    def __len__(self):
+        return len(COUNTER.names)
+
+
+LOCAL_CACHE_INFO = LocalCacheInfo()
 
 
 def init_cache_counting():
     """
-    prepare LOCAL_CACHE_INFO and the counter in cache:
+    Reset the counts of this process and create the missing counter in cache:
     All initial count value should be None, if count is disabled
     and should be 0, if enabled.
+    The existing counts in cache (from other processes) are not touched.
     """
-    for key in _CACHE_KEYS:
-        cache.delete(key)  # delete old entrie, if exist
+    COUNTER.reset()
 
-    if COUNT_FETCH_FROM_CACHE:
-        # Count in FetchFromCacheMiddleware is enabled
-        LOCAL_CACHE_INFO["requests"] = 0
-        LOCAL_CACHE_INFO["request hits"] = 0
-        if COUNT_IN_CACHE:
-            # Count in cache is enabled
-            cache.set(CACHE_REQUESTS, 0)
-            cache.set(CACHE_REQUEST_HITS, 0)
-
-    if COUNT_UPDATE_CACHE:
-        # Count in UpdateCacheMiddleware is enabled
-        LOCAL_CACHE_INFO["responses"] = 0
-        LOCAL_CACHE_INFO["response hits"] = 0
-        if COUNT_IN_CACHE:
-            # Count in cache is enabled
-            cache.set(CACHE_RESPONSES, 0)
-            cache.set(CACHE_RESPONSE_HITS, 0)
+    if COUNT_IN_CACHE:
+        keys = []
+        if COUNT_FETCH_FROM_CACHE:
+            keys += [CACHE_REQUESTS, CACHE_REQUEST_HITS]
+        if COUNT_UPDATE_CACHE:
+            keys += [CACHE_RESPONSES, CACHE_RESPONSE_HITS]
+        for key in keys:
+            cache.add(key, 0, timeout=None)
 
 
 init_cache_counting()
 
 
+def reset_cache_counting():
+    """
+    Reset the counts of all processes: Delete the counter in cache and start from 0.
+    """
+    cache.delete_many(_CACHE_KEYS)
+    init_cache_counting()
+
+
+def get_global_counts():
+    """
+    return the counts of all processes from the cache and the hit ratios.
+    The counts of the current process are transferred into the cache before.
+    """
+    if COUNT_IN_CACHE:
+        COUNTER.flush(cache)
+    values = cache.get_many(_CACHE_KEYS)
+    counts = {name: values.get(key) for name, key in COUNTER.cache_keys.items()}
+
+    for total_key, hits_key in (("requests", "request hits"), ("responses", "response hits")):
+        total, hits = counts[total_key], counts[hits_key]
+        counts[f"{hits_key} ratio"] = hits / total if total and hits is not None else None
+    return counts
+
+
 def build_cache_key(url, language_code, site_id):
     cache_key = f"{url}:{language_code}:{site_id}"
     if EXTRA_DEBUG:
@@ -95,6 +175,17 @@ def build_cache_key(url, language_code, site_id):
     return cache_key
 
 
+def get_policy(request):
+    """
+    return the CachePolicy for the request.path (looked up once per request)
+    """
+    try:
+        return request._cache_policy
+    except AttributeError:
+        policy = request._cache_policy = POLICY_TABLE.lookup(request.path)
+        return policy
+
+
 def get_cache_key(request):
     """
     Build the cache key based on the url and:
@@ -103,6 +194,8 @@ def get_cache_key(request):
         used language for gettext translation.
     * SITE_ID: request.path is the url without the domain name. So the same
         url in site A and B would result in a collision.
+    * the request headers from the "vary" of the cache policy
+    * the generations of the path segments (with CACHE_MIDDLEWARE_PREFIX_INVALIDATION)
     """
     url = request.get_full_path()
 
@@ -115,16 +208,291 @@ def get_cache_key(request):
 
     site_id = settings.SITE_ID
     cache_key = build_cache_key(url, language_code, site_id)
+
+    vary = get_policy(request).vary
+    if vary:
+        values = "\n".join(request.headers.get(header, "") for header in vary)
+        cache_key = f"{cache_key}:vary-{md5(values.encode(), usedforsecurity=False).hexdigest()}"
+
+    if CACHE_MIDDLEWARE_PREFIX_INVALIDATION:
+        try:
+            generation = request._cache_generation  # Fetch the generations once per request
+        except AttributeError:
+            generation = request._cache_generation = get_generations([request.path], site_id)[request.path]
+        cache_key = f"{cache_key}:{generation}"
     return cache_key
 
 
+def get_meta_key(cache_key):
+    """
+    The small metadata record for conditional requests is stored next to the response.
+
+    >>> get_meta_key('/foo/:en:1')
+    '/foo/:en:1:meta'
+    """
+    return f"{cache_key}:meta"
+
+
 def delete_cache_item(url, language_code, site_id=None):
     if site_id is None:
         site_id = settings.SITE_ID
 
     cache_key = build_cache_key(url, language_code, site_id)
+    if CACHE_MIDDLEWARE_PREFIX_INVALIDATION:
+        path = url.split("?", 1)[0]
+        cache_key = f"{cache_key}:{get_generations([path], site_id)[path]}"
     logger.debug(f"delete from cache: {cache_key!r}")
-    cache.delete(cache_key)
+    cache.delete_many([cache_key, get_meta_key(cache_key)])
+
+
+def delete_cache_items(urls, language_codes, site_id=None):
+    """
+    Delete all combinations of the given urls and language codes with one cache call
+    (and one more to fetch the generations, with CACHE_MIDDLEWARE_PREFIX_INVALIDATION).
+    Note: Doesn't delete the variants from the "vary" of a cache policy, use delete_cache_prefix() for them.
+    """
+    if site_id is None:
+        site_id = settings.SITE_ID
+
+    paths = {url: url.split("?", 1)[0] for url in urls}
+    if CACHE_MIDDLEWARE_PREFIX_INVALIDATION:
+        generations = get_generations(paths.values(), site_id)
+
+    keys = []
+    for url, path in paths.items():
+        for language_code in language_codes:
+            cache_key = build_cache_key(url, language_code, site_id)
+            if CACHE_MIDDLEWARE_PREFIX_INVALIDATION:
+                cache_key = f"{cache_key}:{generations[path]}"
+            keys += [cache_key, get_meta_key(cache_key)]
+    logger.debug(f"delete {len(keys) // 2} pages from cache")
+    cache.delete_many(keys)
+
+
+GENERATION_KEY_PREFIX = "DJANGOTOOLS_SITE_CACHE_GENERATION"
+
+
+def get_path_levels(path):
+    """
+    return the path of every segment level, used for the generations.
+
+    >>> get_path_levels('/blog/2026/foo/')
+    ['/', '/blog/', '/blog/2026/', '/blog/2026/foo/']
+    >>> get_path_levels('/blog')
+    ['/', '/blog/']
+    >>> get_path_levels('/')
+    ['/']
+    """
+    levels = ["/"]
+    for segment in path.split("/"):
+        if segment:
+            levels.append(f"{levels[-1]}{segment}/")
+    return levels
+
+
+def get_generation_key(site_id, level):
+    """
+    >>> get_generation_key(1, '/blog/')
+    'DJANGOTOOLS_SITE_CACHE_GENERATION:1:/blog/'
+    """
+    return f"{GENERATION_KEY_PREFIX}:{site_id}:{level}"
+
+
+def get_generations(paths, site_id):
+    """
+    return {path: generation} for the cache keys of the given paths, with one get_many() call.
+    The generation contains the counters of all segment levels of the path, so
+    delete_cache_prefix() invalidates all pages below a level with one incr() call.
+
+    A missing counter starts with the current time in nanoseconds, not with 0: Pages
+    stored with a counter that the backend evicted are never used again.
+    """
+    keys = {path: [get_generation_key(site_id, level) for level in get_path_levels(path)] for path in paths}
+    all_keys = list(dict.fromkeys(key for path_keys in keys.values() for key in path_keys))
+    counters = cache.get_many(all_keys)
+    for key in all_keys:
+        if key not in counters:
+            counter = time.time_ns()
+            if not cache.add(key, counter, timeout=None):
+                counter = cache.get(key, counter)  # Added by a other request in the meantime
+            counters[key] = counter
+
+    generations = {}
+    for path, path_keys in keys.items():
+        counters_info = ".".join(str(counters[key]) for key in path_keys)
+        generations[path] = f"gen-{md5(counters_info.encode(), usedforsecurity=False).hexdigest()}"
+    return generations
+
+
+def delete_cache_prefix(prefix, site_id=None):
+    """
+    Invalidate all cached pages (all languages, query strings and "vary" variants)
+    below the given path prefix with one cache.incr() call.
+    Needs CACHE_MIDDLEWARE_PREFIX_INVALIDATION = True
+
+    The prefix is matched per complete path segment: "/blog/" (or "/blog") matches
+    "/blog/" and "/blog/2026/foo/", but not "/blogger/". "/" invalidates all pages of the site.
+    The pages are not deleted: They are not found anymore and expire as usual.
+    """
+    if site_id is None:
+        site_id = settings.SITE_ID
+
+    key = get_generation_key(site_id, get_path_levels(prefix)[-1])
+    try:
+        cache.incr(key)
+    except ValueError:
+        # The counter doesn't exist (anymore): get_generations() will start a new one,
+        # so no cached page below this prefix will be used again.
+        pass
+    logger.debug(f"Invalidate all pages with prefix {prefix!r}")
+
+
+def get_lock_key(cache_key):
+    """
+    >>> get_lock_key('/foo/:en:1')
+    '/foo/:en:1:lock'
+    """
+    return f"{cache_key}:lock"
+
+
+def acquire_lock(request, cache_key):
+    """
+    Try to get the single-flight lock for the given page.
+    The lock is released by UpdateCacheMiddleware, after the page is stored.
+    """
+    lock = (get_lock_key(cache_key), uuid.uuid4().hex)
+    if cache.add(*lock, timeout=CACHE_MIDDLEWARE_LOCK_TIMEOUT):
+        request._cache_lock = lock
+        return True
+    return False
+
+
+def release_lock(lock):
+    if lock is None:
+        return
+    lock_key, token = lock
+    if cache.get(lock_key) == token:  # The lock may be expired and taken by a other request
+        cache.delete(lock_key)
+
+
+def unpack_entry(entry):
+    """
+    return the cache entry and if it's expired.
+    With CACHE_MIDDLEWARE_STALE_TIME the entry is stored with the expire time.
+    """
+    if isinstance(entry, tuple):
+        expires, entry = entry
+        return entry, expires <= time.time()
+    return entry, False
+
+
+def wait_for_entry(cache_key):
+    """
+    Wait until the request with the lock has stored the page.
+    return None, if CACHE_MIDDLEWARE_LOCK_WAIT is over or the lock is released without a new page.
+    """
+    lock_key = get_lock_key(cache_key)
+    deadline = time.monotonic() + CACHE_MIDDLEWARE_LOCK_WAIT
+    delay = 0.01
+    while time.monotonic() < deadline:
+        time.sleep(delay)
+        delay = min(delay * 2, 0.2)
+
+        values = cache.get_many([cache_key, lock_key])
+        entry, expired = unpack_entry(values.get(cache_key))
+        if entry is not None and not expired:
+            return entry
+        if lock_key not in values:
+            logger.debug(f"Lock for {cache_key!r} released, without a new entry")
+            return None
+
+    logger.debug(f"Waiting for {cache_key!r} timed out")
+    return None
+
+
+# Headers of the cached response that are also send with a "304 Not Modified" (RFC 9110 Section 15.4.5)
+NOT_MODIFIED_HEADERS = ("Cache-Control", "ETag", "Expires", "Last-Modified", "Vary")
+
+
+def build_meta(response, timeout):
+    """
+    Build the metadata record of the response that will be put into the cache.
+    """
+    return {
+        "expires": time.time() + timeout,
+        "etag": response["ETag"],
+        "last_modified": parse_http_date_safe(response["Last-Modified"]),
+        "length": len(response.content),
+        "headers": {header: response[header] for header in NOT_MODIFIED_HEADERS if response.has_header(header)},
+    }
+
+
+def is_not_modified(request, meta):
+    """
+    Check the conditional request headers against the metadata record.
+    "If-Modified-Since" is only used without "If-None-Match" (RFC 9110 Section 13.2.2)
+    """
+    if_none_match = request.META.get("HTTP_IF_NONE_MATCH")
+    if if_none_match:
+        etags = parse_etags(if_none_match)
+        if "*" in etags:
+            return True
+        # weak comparison: a compressed response has a weak ETag
+        etag = meta["etag"].removeprefix("W/")
+        return any(client_etag.removeprefix("W/") == etag for client_etag in etags)
+
+    if_modified_since = parse_http_date_safe(request.META.get("HTTP_IF_MODIFIED_SINCE", ""))
+    if if_modified_since is None or meta["last_modified"] is None:
+        return False
+    return meta["last_modified"] <= if_modified_since
+
+
+def compress_page(response, content):
+    """
+    Build the cache entry with the pre-compressed content for every
+    encoding in CACHE_MIDDLEWARE_COMPRESSION.
+    Small or not compressible content is stored uncompressed.
+    """
+    bodies = {}
+    if len(content) >= compression.MIN_SIZE:
+        for encoding in compression.get_available_encodings(CACHE_MIDDLEWARE_COMPRESSION):
+            compressed_content = compression.compress(encoding, content)
+            if len(compressed_content) < len(content):
+                bodies[encoding] = compressed_content
+
+    if not bodies:
+        bodies[compression.IDENTITY] = content
+
+    return {
+        "headers": dict(response.items()),
+        "bodies": bodies,
+    }
+
+
+def decompress_page(request, page):
+    """
+    Create the HttpResponse from a cache entry build by compress_page():
+    The compressed content is used as it is, if the client accepts the encoding.
+    """
+    bodies = page["bodies"]
+    if compression.IDENTITY in bodies:
+        return HttpResponse(bodies[compression.IDENTITY], headers=page["headers"])
+
+    encoding = compression.choose_encoding(request.META.get("HTTP_ACCEPT_ENCODING", ""), tuple(bodies))
+    if encoding is None:
+        # The client accepts none of the stored encodings
+        encoding, content = next(iter(bodies.items()))
+        response = HttpResponse(compression.decompress(encoding, content), headers=page["headers"])
+    else:
+        response = HttpResponse(bodies[encoding], headers=page["headers"])
+        response["Content-Encoding"] = encoding
+        if response.has_header("ETag") and not response["ETag"].startswith("W/"):
+            # The encoded content is not byte-for-byte the same
+            response["ETag"] = f"W/{response['ETag']}"
+
+    response["Content-Length"] = str(len(response.content))
+    patch_vary_headers(response, ("Accept-Encoding",))
+    return response
 
 
 class CacheMiddlewareBase:
@@ -133,6 +501,12 @@ class CacheMiddlewareBase:
             logger.debug(f"Don't cache {request.method!r} ({request.get_full_path()})")
             return False
 
+        policy = get_policy(request)
+        if not policy.cache:
+            if EXTRA_DEBUG:
+                logger.debug(f"Don't cache {request.path!r}: disabled by {policy!r}")
+            return False
+
         if RUN_WITH_DEV_SERVER and request.path.startswith(settings.STATIC_URL):
             if EXTRA_DEBUG:
                 logger.debug("Don't cache static files in dev server")
@@ -169,26 +543,17 @@ class CacheMiddlewareBase:
         return True
 
 
-def save_incr(key, default=1):
-    try:
-        cache.incr(key)
-    except ValueError:  # Doesn't exist, yet.
-        cache.set(key, default)
-
-
 class FetchFromCacheMiddleware(CacheMiddlewareBase):
     def _count_requests(self, request):
         if RUN_WITH_DEV_SERVER and request.path.startswith(settings.STATIC_URL):
             return
 
-        LOCAL_CACHE_INFO["requests"] += 1
+        COUNTER.incr("requests")
         if COUNT_IN_CACHE:
-            save_incr(CACHE_REQUESTS)
+            COUNTER.flush_if_due(cache)
 
     def _count_hit(self):
-        LOCAL_CACHE_INFO["request hits"] += 1
-        if COUNT_IN_CACHE:
-            save_incr(CACHE_REQUEST_HITS)
+        COUNTER.incr("request hits")
 
     def process_request(self, request):
         """
@@ -203,15 +568,52 @@ class FetchFromCacheMiddleware(CacheMiddlewareBase):
             return
 
         cache_key = get_cache_key(request)
-        response = cache.get(cache_key)
-        if response is None:
+        if "HTTP_IF_NONE_MATCH" in request.META or "HTTP_IF_MODIFIED_SINCE" in request.META:
+            # Answer conditional requests without fetching and unpickling the content
+            meta = cache.get(get_meta_key(cache_key))
+            if meta is not None and meta["expires"] > time.time() and is_not_modified(request, meta):
+                logger.debug(f"Not modified: {cache_key!r}")
+                if COUNT_FETCH_FROM_CACHE:
+                    self._count_hit()
+                response = HttpResponseNotModified(headers=meta["headers"])
+                response._from_cache = True
+                return response
+
+        entry, expired = unpack_entry(cache.get(cache_key))
+        if expired or entry is None:
+            if CACHE_MIDDLEWARE_LOCK_TIMEOUT:
+                entry = self._single_flight(request, cache_key, stale_entry=entry)
+            else:
+                entry = None
+
+        if entry is None:
             logger.debug(f"Not found in cache: {cache_key!r}")
+            return
+
+        logger.debug(f"Use {cache_key!r} from cache!")
+        if isinstance(entry, dict):
+            response = decompress_page(request, entry)
         else:
-            logger.debug(f"Use {cache_key!r} from cache!")
-            if COUNT_FETCH_FROM_CACHE:
-                self._count_hit()
-            response._from_cache = True
-            return response
+            response = entry
+        if COUNT_FETCH_FROM_CACHE:
+            self._count_hit()
+        response._from_cache = True
+        return response
+
+    def _single_flight(self, request, cache_key, stale_entry):
+        """
+        Only the first request for a missing page renders it.
+        Concurrent requests get the stale page (if retained) or wait for the new one.
+        """
+        if acquire_lock(request, cache_key):
+            logger.debug(f"Lock {cache_key!r}: render the page")
+            return None
+
+        if stale_entry is not None:
+            logger.debug(f"Use stale {cache_key!r}: page is rendered in a other request")
+            return stale_entry
+
+        return wait_for_entry(cache_key)
 
 
 class UpdateCacheMiddleware(CacheMiddlewareBase):
@@ -219,15 +621,21 @@ class UpdateCacheMiddleware(CacheMiddlewareBase):
         if RUN_WITH_DEV_SERVER and request.path.startswith(settings.STATIC_URL):
             return
 
-        LOCAL_CACHE_INFO["responses"] += 1
+        COUNTER.incr("responses")
         if COUNT_IN_CACHE:
-            save_incr(CACHE_RESPONSES)
+            COUNTER.flush_if_due(cache)
 
     def _count_hit(self):
-        LOCAL_CACHE_INFO["response hits"] += 1
-        save_incr(CACHE_RESPONSE_HITS)
+        COUNTER.incr("response hits")
 
     def process_response(self, request, response):
+        try:
+            return self._process_response(request, response)
+        finally:
+            # Release the single-flight lock, if the page is not cached (streaming: after the last chunk)
+            release_lock(request.__dict__.pop("_cache_lock", None))
+
+    def _process_response(self, request, response):
         if COUNT_UPDATE_CACHE:
             self._count_response(request)
 
@@ -247,34 +655,130 @@ class UpdateCacheMiddleware(CacheMiddlewareBase):
 
         # get the timeout from the "max-age" section of the "Cache-Control" header
         timeout = get_max_age(response)
+        policy = get_policy(request)
         if timeout is None:
-            # use default cache_timeout
-            timeout = settings.CACHE_MIDDLEWARE_SECONDS
-        elif timeout == 0:
+            # use the timeout from the cache policy or the default cache_timeout
+            timeout = settings.CACHE_MIDDLEWARE_SECONDS if policy.timeout is None else policy.timeout
+        if timeout == 0:
             logger.debug("Don't cache this page (timeout == 0)")
             return response
 
+        cache_key = get_cache_key(request)
+        check_csrf = settings.DEBUG or RUN_WITH_DEV_SERVER or request.META.get('REMOTE_ADDR') in settings.INTERNAL_IPS
+        store = functools.partial(self._store, response, cache_key=cache_key, timeout=timeout, policy=policy)
+
+        if response.streaming:
+            # Tee the chunks into the cache, while they are send to the client
+            lock = request.__dict__.pop("_cache_lock", None)
+            if response.is_async:
+                response.streaming_content = self._atee(response.streaming_content, cache_key, check_csrf, lock, store)
+            else:
+                response.streaming_content = self._tee(response.streaming_content, cache_key, check_csrf, lock, store)
+            return response
+
+        content = response.content
+        if check_csrf and b"csrfmiddlewaretoken" in content:
+            # We store a {% csrf_token %} into the cache, this should never happen!
+            raise AssertionError(f"csrf_token would be put into the cache! content: {content!r}")
+
+        store(content)
+        return response
+
+    def _tee(self, streaming_content, cache_key, check_csrf, lock, store):
+        try:
+            chunks = []
+            size = 0
+            for chunk in streaming_content:
+                if chunks is not None:
+                    size += len(chunk)
+                    if size > CACHE_MIDDLEWARE_MAX_SIZE:
+                        logger.debug(f"Don't cache streaming {cache_key!r}: more than CACHE_MIDDLEWARE_MAX_SIZE")
+                        chunks = None
+                    else:
+                        chunks.append(chunk)
+                yield chunk
+
+            if chunks is not None:
+                self._store_streamed(b"".join(chunks), cache_key, check_csrf, store)
+        finally:
+            release_lock(lock)
+
+    async def _atee(self, streaming_content, cache_key, check_csrf, lock, store):
+        try:
+            chunks = []
+            size = 0
+            async for chunk in streaming_content:
+                if chunks is not None:
+                    size += len(chunk)
+                    if size > CACHE_MIDDLEWARE_MAX_SIZE:
+                        logger.debug(f"Don't cache streaming {cache_key!r}: more than CACHE_MIDDLEWARE_MAX_SIZE")
+                        chunks = None
+                    else:
+                        chunks.append(chunk)
+                yield chunk
+
+            if chunks is not None:
+                await sync_to_async(self._store_streamed)(b"".join(chunks), cache_key, check_csrf, store)
+        finally:
+            await sync_to_async(release_lock)(lock)
+
+    def _store_streamed(self, content, cache_key, check_csrf, store):
+        if check_csrf and b"csrfmiddlewaretoken" in content:
+            # The content is already send -> don't raise a error here
+            logger.error(f"Don't cache {cache_key!r}: csrf_token would be put into the cache!")
+            return
+        store(content)
+
+    def _store(self, response, content, cache_key, timeout, policy):
+        """
+        Put a new HttpResponse into the cache. It contains the content as one bytes object,
+        so a cache hit doesn't have to join the chunks.
+        """
         # Create a new HttpResponse for the cache, so we can skip existing
         # cookies and attributes like response.csrf_processing_done
         response2 = HttpResponse(
-            content=response._container,
+            content=content,
             status=200,
             content_type=response['Content-Type'],
         )
         if response.has_header("Content-Language"):
             response2['Content-Language'] = response['Content-Language']
 
-        if settings.DEBUG or RUN_WITH_DEV_SERVER or request.META.get('REMOTE_ADDR') in settings.INTERNAL_IPS:
-            # Check if we store a {% csrf_token %} into the cache, this should never happen!
-            for content in response._container:
-                if "csrfmiddlewaretoken" in content:
-                    raise AssertionError(f"csrf_token would be put into the cache! content: {content!r}")
-
-        # Adds ETag, Last-Modified, Expires and Cache-Control headers
+        # Adds Expires and Cache-Control headers
         patch_response_headers(response2, timeout)
-
-        cache_key = get_cache_key(request)
-        cache.set(cache_key, response2, timeout)
-
+        if policy.vary:
+            patch_vary_headers(response2, policy.vary)
+
+        # Validators for conditional requests, answered from the metadata record:
+        for header in ("ETag", "Last-Modified"):
+            if response.has_header(header):
+                response2[header] = response[header]
+        if not response2.has_header("ETag"):
+            set_response_etag(response2)
+        if not response2.has_header("Last-Modified"):
+            response2["Last-Modified"] = http_date()
+
+        compress = False
+        if response.has_header("Content-Encoding"):
+            # e.g.: compressed by GZipMiddleware
+            response2["Content-Encoding"] = response["Content-Encoding"]
+            patch_vary_headers(response2, ("Accept-Encoding",))
+        elif CACHE_MIDDLEWARE_COMPRESSION:
+            compress = True
+            if len(content) >= compression.MIN_SIZE:
+                patch_vary_headers(response2, ("Accept-Encoding",))  # Send with "304 Not Modified", too.
+
+        meta = build_meta(response2, timeout)
+        if compress:
+            response2 = compress_page(response2, content)
+
+        stale_time = CACHE_MIDDLEWARE_STALE_TIME if policy.stale_time is None else policy.stale_time
+        if stale_time:
+            # Retain the expired page for the single-flight
+            cache.set_many(
+                {cache_key: (meta["expires"], response2), get_meta_key(cache_key): meta},
+                timeout + stale_time,
+            )
+        else:
+            cache.set_many({cache_key: response2, get_meta_key(cache_key): meta}, timeout)
         logger.debug(f"Put to cache: {cache_key!r}")
-        return response
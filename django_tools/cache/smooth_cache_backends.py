@@ -8,16 +8,27 @@
     :license: GNU GPL v3 or above, see LICENSE for more details.
 """
 
+import asyncio
 import logging
-import os
+import pickle
+import struct
+import threading
 import time
+from collections import OrderedDict
 
+from asgiref.sync import sync_to_async
 from bx_py_utils.error_handling import exception2str
 from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
 from django.core.cache.backends.db import DatabaseCache
 from django.core.cache.backends.filebased import FileBasedCache
 from django.core.cache.backends.locmem import LocMemCache
 from django.core.cache.backends.memcached import PyLibMCCache, PyMemcacheCache
+from django.core.exceptions import ImproperlyConfigured
+
+from django_tools.cache.file_index import FileCacheIndexMixin
+from django_tools.cache.pressure import DEFAULT_PRESSURE_PROVIDER, get_pressure_provider
 
 
 logger = logging.getLogger(__name__)
@@ -25,6 +36,10 @@ logger = logging.getLogger(__name__)
 
 SMOOTH_CACHE_CHANGE_TIME = getattr(settings, "SMOOTH_CACHE_CHANGE_TIME", "DJANGO_TOOLS_SMOOTH_CACHE_CHANGE_TIME")
 SMOOTH_CACHE_UPDATE_TIMESTAMP = getattr(settings, "SMOOTH_CACHE_UPDATE_TIMESTAMP", 10)
+SMOOTH_CACHE_LOAD_INTERVAL = getattr(settings, "SMOOTH_CACHE_LOAD_INTERVAL", 1)
+SMOOTH_CACHE_STALE_WHILE_REVALIDATE = getattr(settings, "SMOOTH_CACHE_STALE_WHILE_REVALIDATE", False)
+SMOOTH_CACHE_REFRESH_LOCK_TIMEOUT = getattr(settings, "SMOOTH_CACHE_REFRESH_LOCK_TIMEOUT", 30)
+SMOOTH_CACHE_PRESSURE_PROVIDER = getattr(settings, "SMOOTH_CACHE_PRESSURE_PROVIDER", DEFAULT_PRESSURE_PROVIDER)
 SMOOTH_CACHE_TIMES = getattr(settings, "SMOOTH_CACHE_TIMES", (
     # load value, max age in sec.
     (0, 5),  # < 0.1 ->  5sec
@@ -67,110 +82,721 @@ class SmoothCacheTime(int):
         return i
 
 
-class _SmoothCache:
-    __CHANGE_TIME = None  # Timestamp of the "last update"
-    __NEXT_SYNC = None  # Point in the future to update the __CHANGE_TIME
+# Binary envelope of a cache entry: magic, format version and create time, followed by the pickled value.
+# Entries with tags have a other version and the tags are stored between the header and the value.
+# If the expire time is stored, the version has the SMOOTH_ENVELOPE_EXPIRES_FLAG and the time follows the header.
+SMOOTH_ENVELOPE_MAGIC = b"SC"
+SMOOTH_ENVELOPE_VERSION = 1
+SMOOTH_ENVELOPE_TAGS_VERSION = 2
+SMOOTH_ENVELOPE_EXPIRES_FLAG = 0x80
+_ENVELOPE_HEADER = struct.Struct(">2sBQ")
+_EXPIRES_HEADER = struct.Struct(">Q")  # 0 == never expires
+_TAGS_HEADER = struct.Struct(">H")
 
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        self._smooth_clear = None
 
-    def __get_change_time(self):
+def get_tag_key(tag):
+    """
+    return the cache key of the "last change" timestamp of the given tag.
+
+    >>> get_tag_key("blog")
+    'DJANGO_TOOLS_SMOOTH_CACHE_CHANGE_TIME:blog'
+    """
+    return f"{SMOOTH_CACHE_CHANGE_TIME}:{tag}"
+
+
+def pack_entry(value, create_time=None, tags=None, expires=None):
+    """
+    return the cache entry as bytes: a fixed-width header + the pickled value.
+    expires is the absolute expire time of the entry (0 == never), if known.
+
+    >>> entry = pack_entry("foo", create_time=1)
+    >>> entry[:2], len(entry) - _ENVELOPE_HEADER.size == len(pickle.dumps("foo", pickle.HIGHEST_PROTOCOL))
+    (b'SC', True)
+    """
+    if create_time is None:
+        create_time = int(time.time())
+    version = SMOOTH_ENVELOPE_TAGS_VERSION if tags else SMOOTH_ENVELOPE_VERSION
+    if expires is None:
+        header = _ENVELOPE_HEADER.pack(SMOOTH_ENVELOPE_MAGIC, version, create_time)
+    else:
+        header = _ENVELOPE_HEADER.pack(
+            SMOOTH_ENVELOPE_MAGIC, version | SMOOTH_ENVELOPE_EXPIRES_FLAG, create_time
+        ) + _EXPIRES_HEADER.pack(int(expires))
+    if tags:
+        if any("\n" in tag for tag in tags):
+            raise ValueError(f"Invalid tags: {tags!r}")
+        tags_data = "\n".join(tags).encode()
+        header += _TAGS_HEADER.pack(len(tags_data)) + tags_data
+    return header + pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+
+def get_entry_expires(entry):
+    """
+    return the absolute expire time stored in the cache entry (0 == never expires)
+    or None, if the entry doesn't contain it (e.g.: old entries).
+
+    >>> get_entry_expires(pack_entry("foo", create_time=123, expires=423))
+    423
+    >>> get_entry_expires(pack_entry("foo", create_time=123)) is None
+    True
+    """
+    if isinstance(entry, bytes) and entry[:2] == SMOOTH_ENVELOPE_MAGIC:
+        _, version, _ = _ENVELOPE_HEADER.unpack_from(entry)
+        if version & SMOOTH_ENVELOPE_EXPIRES_FLAG:
+            (expires,) = _EXPIRES_HEADER.unpack_from(entry, _ENVELOPE_HEADER.size)
+            return expires
+    return None
+
+
+def unpack_tagged_entry(entry):
+    """
+    return (create_time, tags, value) from a cache entry.
+    Entries in the old (SmoothCacheTime, value) tuple format are supported, too.
+    Raise TypeError or ValueError for invalid entries.
+
+    >>> unpack_tagged_entry(pack_entry("foo", create_time=123, tags=["blog", "news"]))
+    (123, ('blog', 'news'), 'foo')
+    >>> unpack_tagged_entry(pack_entry("foo", create_time=123, tags=["blog"], expires=456))
+    (123, ('blog',), 'foo')
+    >>> unpack_tagged_entry(pack_entry("foo", create_time=123))
+    (123, (), 'foo')
+    """
+    if isinstance(entry, bytes) and entry[:2] == SMOOTH_ENVELOPE_MAGIC:
+        _, version, create_time = _ENVELOPE_HEADER.unpack_from(entry)
+        offset = _ENVELOPE_HEADER.size
+        if version & SMOOTH_ENVELOPE_EXPIRES_FLAG:
+            version &= ~SMOOTH_ENVELOPE_EXPIRES_FLAG
+            offset += _EXPIRES_HEADER.size
+        if version == SMOOTH_ENVELOPE_VERSION:
+            tags = ()
+        elif version == SMOOTH_ENVELOPE_TAGS_VERSION:
+            (length,) = _TAGS_HEADER.unpack_from(entry, offset)
+            offset += _TAGS_HEADER.size
+            tags = tuple(entry[offset : offset + length].decode().split("\n"))
+            offset += length
+        else:
+            raise ValueError(f"Unknown envelope version: {version!r}")
+        return create_time, tags, pickle.loads(memoryview(entry)[offset:])
+
+    # Old format, e.g.: entry was saved with a older django-tools version
+    create_time, value = entry
+    if not isinstance(create_time, SmoothCacheTime):
+        raise TypeError(f"create_time is not SmoothCacheTime instance, it's: {type(create_time)}")
+    return create_time, (), value
+
+
+def unpack_entry(entry):
+    """
+    return (create_time, value) from a cache entry.
+
+    >>> unpack_entry(pack_entry("foo", create_time=123))
+    (123, 'foo')
+    >>> unpack_entry((SmoothCacheTime(456), "bar"))
+    (456, 'bar')
+    """
+    create_time, _tags, value = unpack_tagged_entry(entry)
+    return create_time, value
+
+
+class SmoothCacheEngine:
+    """
+    Per process state of one smooth cache.
+
+    Holds the "last change" timestamps (global and per tag) and the max age for
+    the current system pressure (see pressure.py). These values are refreshed only once per "tick"
+    (every SMOOTH_CACHE_LOAD_INTERVAL seconds), so the check of a cache hit is
+    just a comparison of integers.
+    """
+
+    def __init__(self, pressure_provider=None):
+        if pressure_provider is None:
+            pressure_provider = get_pressure_provider(SMOOTH_CACHE_PRESSURE_PROVIDER)
+        self.pressure_provider = pressure_provider
+
+        self.change_time = None  # Timestamp of the "last update"
+        self.next_sync = 0  # Point in the future to fetch the change_time from cache
+        self.next_tick = 0  # Point in the future (monotonic clock) to sample the system pressure
+
+        self.load_average = None
+        self.max_age = None
+
+        # All cache entries created at or before this timestamp are out-dated:
+        self.outdated_until = -1
+
+        # Same as change_time/outdated_until, but for every known tag:
+        self.tag_change_times = {}
+        self.tag_outdated_until = {}
+
+        # Statistics:
+        self.timestamp_fetches = 0  # How often the shared change time was fetched from cache
+        self.load_evictions = 0  # How often out-dated entries was evicted by load
+        self.stale_hits = 0  # How often out-dated entries was served while a other caller refreshes it
+
+        self.refresh_task = None  # Background task of atick()
+
+    def _calc_outdated_until(self, change_time, now):
+        if now - change_time > self.max_age:
+            return change_time
+        else:
+            # Keep all entries by load
+            return -1
+
+    def tick(self, cache):
         """
-        return current "last change" timestamp.
-        To save cache access, update the timestamp only in
+        Sample the system pressure and recalculate the max age.
+        To save cache access, the "last change" timestamps would be only fetched in
         SMOOTH_CACHE_UPDATE_TIMESTAMP frequency from cache.
         """
         now = time.time()
-        if now > self.__NEXT_SYNC or self.__CHANGE_TIME is None:
-            # Update timestamp we must look for a new change time from cache:
-            self.__NEXT_SYNC = now + SMOOTH_CACHE_UPDATE_TIMESTAMP
+        if self.change_time is None or now >= self.next_sync:
+            self.next_sync = now + SMOOTH_CACHE_UPDATE_TIMESTAMP
+            self.timestamp_fetches += 1
 
+            # Fetch the global and all known tag timestamps with one lookup.
             # use raw method, otherwise: end in a endless-loop ;)
-            change_time = self.get(SMOOTH_CACHE_CHANGE_TIME, raw=True)
-            if change_time is None:
-                logger.debug("CHANGE_TIME is None")
-                self.smooth_update()  # save change time into cache
-            elif change_time > self.__CHANGE_TIME:
-                self.__CHANGE_TIME = change_time
-                logger.debug(f"update change time to: {change_time!r}")
-#        else:
-#            logger.debug("Use old CHANGE_TIME %r" % self.__CHANGE_TIME)
+            tag_keys = {get_tag_key(tag): tag for tag in self.tag_change_times}
+            data = cache.get_many([SMOOTH_CACHE_CHANGE_TIME, *tag_keys], raw=True)
+            if not self._update_timestamps(tag_keys, data):
+                cache.smooth_update()  # save change time into cache
 
-        return self.__CHANGE_TIME
+        self._recalculate(now)
 
-    def __must_updated(self, key, create_time):
+    async def atick(self, cache):
         """
-        return True if given cache create time is older than the "last change"
-        time, but only if the additional time from system load allows it.
+        Same as tick(), but the "last change" timestamps would be refreshed in a
+        background task. Until the task is done, the known timestamps are used.
+        Only the very first fetch must be awaited.
         """
-        last_change_time = self.__get_change_time()
-        if last_change_time < create_time:
-            # Item was added to the cache after the last clear() time.
-            logger.debug(
-                f"{key!r} not out-dated: added {create_time - last_change_time}sec before clear()")
+        now = time.time()
+        if self.change_time is None:
+            self.next_sync = now + SMOOTH_CACHE_UPDATE_TIMESTAMP
+            await self._afetch_timestamps(cache)
+            if self.change_time is None:
+                # Fetch failed -> keep the entries and try again with the next call
+                return
+        elif now >= self.next_sync:
+            self.next_sync = now + SMOOTH_CACHE_UPDATE_TIMESTAMP
+            # Hold a reference to the task, otherwise it may be garbage collected:
+            self.refresh_task = asyncio.get_running_loop().create_task(self._afetch_timestamps(cache))
+
+        self._recalculate(now)
+
+    async def _afetch_timestamps(self, cache):
+        self.timestamp_fetches += 1
+        tag_keys = {get_tag_key(tag): tag for tag in self.tag_change_times}
+        try:
+            data = await cache.aget_many([SMOOTH_CACHE_CHANGE_TIME, *tag_keys], raw=True)
+        except Exception:
+            logger.exception("Can't fetch the change time")
+            self.next_sync = 0  # try again with the next tick
+            return
+
+        if not self._update_timestamps(tag_keys, data):
+            await cache.asmooth_update()  # save change time into cache
+        self.next_tick = 0  # recalculate with the new timestamps
+
+    def _update_timestamps(self, tag_keys, data):
+        """
+        Take over the fetched timestamps.
+        return False, if the global change time doesn't exist in cache.
+        """
+        for tag_key, tag in tag_keys.items():
+            self.tag_change_times[tag] = data.get(tag_key, 0)
+
+        change_time = data.get(SMOOTH_CACHE_CHANGE_TIME)
+        if change_time is None:
+            logger.debug("CHANGE_TIME is None")
             return False
+        elif self.change_time is None or change_time > self.change_time:
+            self.change_time = change_time
+            logger.debug(f"update change time to: {change_time!r}")
+        return True
 
-        outdate_age = time.time() - last_change_time
-        load_average = os.getloadavg()[0]  # load over last minute
-        max_age = get_max_age(load_average)
-        if outdate_age > max_age:
-            logger.debug(
-                f"Out-dated {key!r}"
-                f" (added {last_change_time - create_time}sec after clear()"
-                f" - age: {outdate_age}, max age: {max_age}, load: {load_average})"
-            )
+    def _recalculate(self, now):
+        self.load_average = self.pressure_provider.get_pressure()
+        self.max_age = get_max_age(self.load_average)
+
+        self.outdated_until = self._calc_outdated_until(self.change_time, now)
+        self.tag_outdated_until = {
+            tag: self._calc_outdated_until(tag_change_time, now)
+            for tag, tag_change_time in self.tag_change_times.items()
+        }
+
+        self.next_tick = time.monotonic() + SMOOTH_CACHE_LOAD_INTERVAL
+
+    def fetch_tags(self, cache, tags):
+        """
+        Fetch the "last change" timestamps of the given (unknown) tags with one lookup.
+        """
+        tag_keys = {get_tag_key(tag): tag for tag in tags}
+        self._update_tags(tag_keys, cache.get_many(list(tag_keys), raw=True))
+
+    async def afetch_tags(self, cache, tags):
+        tag_keys = {get_tag_key(tag): tag for tag in tags}
+        self._update_tags(tag_keys, await cache.aget_many(list(tag_keys), raw=True))
+
+    def _update_tags(self, tag_keys, data):
+        now = time.time()
+        for tag_key, tag in tag_keys.items():
+            tag_change_time = data.get(tag_key, 0)
+            self.tag_change_times[tag] = tag_change_time
+            self.tag_outdated_until[tag] = self._calc_outdated_until(tag_change_time, now)
+
+    def is_outdated(self, cache, create_time, tags=()):
+        """
+        return True if given cache create time is older than the "last change"
+        time (global or of one of the tags), but only if the additional time
+        from system load allows it.
+        """
+        if time.monotonic() >= self.next_tick:
+            self.tick(cache)
+        if create_time <= self.outdated_until:
+            return True
+
+        if tags:
+            unknown_tags = [tag for tag in tags if tag not in self.tag_outdated_until]
+            if unknown_tags:
+                self.fetch_tags(cache, unknown_tags)
+            return self._tags_outdated(create_time, tags)
+
+        return False
+
+    async def ais_outdated(self, cache, create_time, tags=()):
+        if time.monotonic() >= self.next_tick:
+            await self.atick(cache)
+        if create_time <= self.outdated_until:
             return True
+
+        if tags:
+            unknown_tags = [tag for tag in tags if tag not in self.tag_outdated_until]
+            if unknown_tags:
+                await self.afetch_tags(cache, unknown_tags)
+            return self._tags_outdated(create_time, tags)
+
+        return False
+
+    def _tags_outdated(self, create_time, tags):
+        tag_outdated_until = self.tag_outdated_until
+        return any(create_time <= tag_outdated_until[tag] for tag in tags)
+
+    def reset(self, change_time):
+        """
+        Set a new "last change" timestamp and force a new tick.
+        """
+        self.change_time = change_time
+        self.next_tick = 0
+        self.outdated_until = -1
+
+    def reset_tags(self, tags, change_time):
+        """
+        Set a new "last change" timestamp for the given tags.
+        """
+        for tag in tags:
+            self.tag_change_times[tag] = change_time
+            self.tag_outdated_until[tag] = -1
+
+    def get_info(self):
+        return {
+            "change_time": self.change_time,
+            "tag_change_times": dict(self.tag_change_times),
+            "load_average": self.load_average,
+            "max_age": self.max_age,
+            "timestamp_fetches": self.timestamp_fetches,
+            "load_evictions": self.load_evictions,
+            "stale_hits": self.stale_hits,
+        }
+
+
+# All SmoothCacheEngine instances of the current process:
+_ENGINES = {}
+
+
+def get_smooth_engine(engine_key):
+    """
+    return the SmoothCacheEngine for the given key.
+    Django creates one cache backend instance per thread, but all of them
+    should share the same state in the current process.
+    """
+    try:
+        return _ENGINES[engine_key]
+    except KeyError:
+        return _ENGINES.setdefault(engine_key, SmoothCacheEngine())
+
+
+# Returned by _SmoothCache._unwrap() if the caller should refresh a out-dated entry:
+_REFRESH = object()
+
+
+class _SmoothCache:
+    stale_while_revalidate = SMOOTH_CACHE_STALE_WHILE_REVALIDATE
+    blocking_io = True  # Run the backend calls of the async methods in a thread?
+
+    def __init__(self, location, params):
+        super().__init__(location, params)
+        self._smooth_clear = None
+        self.smooth_engine = get_smooth_engine(f"{self.__class__.__name__}:{location!r}:{self.key_prefix}")
+
+    def smooth_update(self, tags=None):
+        """
+        save the "last change" timestamp to renew the cache entries in
+        the SmoothCacheEngine of this process and in cache.
+        If tags are given: Renew only the entries with one of these tags.
+        """
+        now = int(time.time())
+        if tags:
+            self.smooth_engine.reset_tags(tags, now)
+            self.set_many({get_tag_key(tag): now for tag in tags}, timeout=None, raw=True)
+            logger.debug(f"Set CHANGE_TIME of {tags!r} to {now!r}")
+        else:
+            self.smooth_engine.reset(now)
+            self.set(SMOOTH_CACHE_CHANGE_TIME, now, timeout=None, raw=True)  # will be get via get(raw=True)
+            logger.debug(f"Set CHANGE_TIME to {now!r}")
+
+    async def asmooth_update(self, tags=None):
+        now = int(time.time())
+        if tags:
+            self.smooth_engine.reset_tags(tags, now)
+            await self.aset_many({get_tag_key(tag): now for tag in tags}, timeout=None, raw=True)
+            logger.debug(f"Set CHANGE_TIME of {tags!r} to {now!r}")
         else:
+            self.smooth_engine.reset(now)
+            await self.aset(SMOOTH_CACHE_CHANGE_TIME, now, timeout=None, raw=True)
+            logger.debug(f"Set CHANGE_TIME to {now!r}")
+
+    # --------------------------------------------------------------------------
+    # Access to the origin backend methods.
+    # The Django backends call some public methods internally, e.g.:
+    # BaseCache.get_many() calls self.get() and BaseCache.set_many() calls self.set()
+    # These methods must not wrap/unwrap the values a second time.
+
+    def _raw_get(self, key, default, version):
+        return super().get(key, default, version)
+
+    def _raw_get_many(self, keys, version):
+        backend_get_many = super().get_many
+        if backend_get_many.__func__ is BaseCache.get_many:
+            # Backend has no batched get_many() -> fetch the entries one by one
+            result = {}
+            for key in keys:
+                value = self._raw_get(key, self._missing_key, version)
+                if value is not self._missing_key:
+                    result[key] = value
+            return result
+        return backend_get_many(keys, version)
+
+    def _raw_set_many(self, data, timeout, version):
+        backend_set_many = super().set_many
+        if backend_set_many.__func__ is BaseCache.set_many:
+            # Backend has no batched set_many() -> store the entries one by one
+            for key, value in data.items():
+                super().set(key, value, timeout, version)
+            return []
+        return backend_set_many(data, timeout, version)
+
+    async def _araw(self, func, *args, **kwargs):
+        """
+        Call a sync backend method from async code.
+        The Django backends have no native async support: BaseCache.aget() etc. just
+        call the sync methods via sync_to_async(). The backend I/O is done in the same
+        way here, but the smooth expiry logic runs in the event loop.
+        Backends without blocking I/O are called directly, without the thread pool.
+        """
+        if self.blocking_io:
+            return await sync_to_async(func, thread_sensitive=True)(*args, **kwargs)
+        return func(*args, **kwargs)
+
+    def _acquire_refresh_lock(self, key, create_time, version):
+        """
+        return True if the current caller should refresh the given out-dated entry.
+        The lock key contains the create time of the entry, so every refreshed
+        entry can be refreshed again after the next smooth_update().
+        """
+        lock_key = f"{key}:smooth-refresh:{create_time}"
+        return self.add(lock_key, True, SMOOTH_CACHE_REFRESH_LOCK_TIMEOUT, version, raw=True)
+
+    async def _aacquire_refresh_lock(self, key, create_time, version):
+        lock_key = f"{key}:smooth-refresh:{create_time}"
+        return await self._araw(self.add, lock_key, True, SMOOTH_CACHE_REFRESH_LOCK_TIMEOUT, version, raw=True)
+
+    def get_expires(self, timeout=DEFAULT_TIMEOUT):
+        """
+        return the absolute expire time for the envelope (0 == never expires)
+        """
+        if timeout is DEFAULT_TIMEOUT:
+            timeout = self.default_timeout
+        if timeout is None:
+            return 0
+        return int(time.time() + timeout)
+
+    def _unpack(self, key, value):
+        """
+        return (create_time, tags, value) of a packed cache entry or None, if the entry is invalid.
+        """
+        try:
+            return unpack_tagged_entry(value)
+        except (TypeError, ValueError, pickle.UnpicklingError) as err:
+            # e.g: entry is saved before smooth cache used.
+            logger.error(f"Can't get 'create_time' from: {exception2str(err)} (Maybe {key!r} is a old cache entry?)")
+            return None
+
+    def _evict(self, key, create_time):
+        # is too old -> the item must be deleted
+        self.smooth_engine.load_evictions += 1
+        if logger.isEnabledFor(logging.DEBUG):
+            engine = self.smooth_engine
             logger.debug(
-                f"Keep {key!r} by load"
-                f" (out-dated age: {outdate_age:.1f}sec, max age: {max_age}, load: {load_average})"
+                f"Out-dated {key!r}"
+                f" (added {engine.change_time - create_time}sec before clear()"
+                f" - max age: {engine.max_age}, load: {engine.load_average})"
             )
-            return False
+        return self._missing_key
 
-    def smooth_update(self):
+    def _stale_or_refresh(self, key, value, refresh_locked):
+        if not refresh_locked:
+            # Another caller refreshes this entry -> use the stale value
+            self.smooth_engine.stale_hits += 1
+            return value
+
+        logger.debug(f"Refresh out-dated {key!r}")
+        return _REFRESH
+
+    def _unwrap(self, key, value, version, allow_stale=True):
         """
-        save the "last change" timestamp to renew the cache entries in
-        self.__CHANGE_TIME and in cache.
+        return the value of a packed cache entry
+        or self._missing_key, if the entry is invalid or out-dated.
+
+        In "stale while revalidate" mode, a out-dated entry would be returned,
+        while exactly one caller get _REFRESH to refresh the entry.
+        With allow_stale=False a out-dated entry is always a miss and the
+        refresh lock is not touched.
         """
-        now = int(time.time())
-        self.__CHANGE_TIME = now
-        self.set(SMOOTH_CACHE_CHANGE_TIME, now, raw=True)  # will be get via __origin_get()
-        logger.debug(f"Set CHANGE_TIME to {now!r}")
+        entry = self._unpack(key, value)
+        if entry is None:
+            return self._missing_key
+
+        create_time, tags, value = entry
+        if not self.smooth_engine.is_outdated(self, create_time, tags):
+            return value
+
+        if allow_stale and self.stale_while_revalidate:
+            refresh_locked = self._acquire_refresh_lock(key, create_time, version)
+            return self._stale_or_refresh(key, value, refresh_locked)
+
+        return self._evict(key, create_time)
+
+    async def _aunwrap(self, key, value, version, allow_stale=True):
+        entry = self._unpack(key, value)
+        if entry is None:
+            return self._missing_key
+
+        create_time, tags, value = entry
+        if not await self.smooth_engine.ais_outdated(self, create_time, tags):
+            return value
+
+        if allow_stale and self.stale_while_revalidate:
+            refresh_locked = await self._aacquire_refresh_lock(key, create_time, version)
+            return self._stale_or_refresh(key, value, refresh_locked)
+
+        return self._evict(key, create_time)
 
     # --------------------------------------------------------------------------
 
     def get(self, key, default=None, version=None, raw=False):
-        value = super().get(key, default, version)
+        value = self._raw_get(key, default, version)
         if raw:
             return value
         if value is None or value is default:
             # Item not in cache
             return value
 
-        try:
-            create_time, value = value
-        except (TypeError, ValueError) as err:
-            # e.g: entry is saved before smooth cache used.
-            logger.error(f"Can't get 'create_time' from: {exception2str(err)} (Maybe {key!r} is a old cache entry?)")
+        value = self._unwrap(key, value, version)
+        if value is self._missing_key:
             self.delete(key, version)
             return default
+        elif value is _REFRESH:
+            return default
 
-        assert isinstance(create_time, SmoothCacheTime), (
-            f"create_time is not SmoothCacheTime instance, it's: {type(create_time)}"
-        )
+        return value
 
-        if self.__must_updated(key, create_time):
-            # is too old -> delete the item
-            self.delete(key, version)
+    def get_many(self, keys, version=None, raw=False):
+        """
+        Fetch all entries with one backend call (if the backend supports it)
+        and delete all invalid/out-dated entries with one delete_many() call.
+        """
+        data = self._raw_get_many(keys, version)
+        if raw:
+            return data
+
+        result = {}
+        outdated_keys = []
+        for key, value in data.items():
+            value = self._unwrap(key, value, version)
+            if value is self._missing_key:
+                outdated_keys.append(key)
+            elif value is not _REFRESH:
+                result[key] = value
+
+        if outdated_keys:
+            self.delete_many(outdated_keys, version)
+
+        return result
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None, raw=False, tags=None):
+        if not raw:
+            value = pack_entry(value, tags=tags, expires=self.get_expires(timeout))
+        super().set(key, value, timeout, version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None, raw=False, tags=None):
+        if not raw:
+            create_time = int(time.time())
+            expires = self.get_expires(timeout)
+            data = {key: pack_entry(value, create_time, tags, expires) for key, value in data.items()}
+        return self._raw_set_many(data, timeout, version)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None, raw=False, tags=None):
+        if not raw:
+            value = pack_entry(value, tags=tags, expires=self.get_expires(timeout))
+        return super().add(key, value, timeout, version)
+
+    def get_or_set(self, key, default, timeout=DEFAULT_TIMEOUT, version=None, tags=None):
+        value = self.get(key, self._missing_key, version=version)
+        if value is self._missing_key:
+            if callable(default):
+                default = default()
+            if self.stale_while_revalidate:
+                # We hold the refresh lock and a stale entry may exist
+                self.set(key, default, timeout=timeout, version=version, tags=tags)
+                return default
+            if self.add(key, default, timeout=timeout, version=version, tags=tags):
+                return default
+
+            # Another caller added a value between get() and add()
+            return self.get(key, default, version=version)
+        return value
+
+    # --------------------------------------------------------------------------
+    # Async variants: Same smooth expiry logic, but the "last change" timestamps
+    # would be refreshed without blocking the event loop.
+
+    async def aget(self, key, default=None, version=None, raw=False):
+        value = await self._araw(self._raw_get, key, default, version)
+        if raw:
+            return value
+        if value is None or value is default:
+            # Item not in cache
+            return value
+
+        value = await self._aunwrap(key, value, version)
+        if value is self._missing_key:
+            await self._araw(self.delete, key, version)
+            return default
+        elif value is _REFRESH:
             return default
 
         return value
 
-    def set(self, key, value, timeout=None, version=None, raw=False):
+    async def aget_many(self, keys, version=None, raw=False):
+        data = await self._araw(self._raw_get_many, keys, version)
+        if raw:
+            return data
+
+        result = {}
+        outdated_keys = []
+        for key, value in data.items():
+            value = await self._aunwrap(key, value, version)
+            if value is self._missing_key:
+                outdated_keys.append(key)
+            elif value is not _REFRESH:
+                result[key] = value
+
+        if outdated_keys:
+            await self._araw(self.delete_many, outdated_keys, version)
+
+        return result
+
+    async def aset(self, key, value, timeout=DEFAULT_TIMEOUT, version=None, raw=False, tags=None):
         if not raw:
-            value = (SmoothCacheTime(), value)
-        super().set(key, value, timeout, version)
+            value = pack_entry(value, tags=tags, expires=self.get_expires(timeout))
+        await self._araw(self.set, key, value, timeout, version, raw=True)
+
+    async def aset_many(self, data, timeout=DEFAULT_TIMEOUT, version=None, raw=False, tags=None):
+        if not raw:
+            create_time = int(time.time())
+            expires = self.get_expires(timeout)
+            data = {key: pack_entry(value, create_time, tags, expires) for key, value in data.items()}
+        return await self._araw(self._raw_set_many, data, timeout, version)
+
+    async def aadd(self, key, value, timeout=DEFAULT_TIMEOUT, version=None, raw=False, tags=None):
+        if not raw:
+            value = pack_entry(value, tags=tags, expires=self.get_expires(timeout))
+        return await self._araw(self.add, key, value, timeout, version, raw=True)
+
+    async def aget_or_set(self, key, default, timeout=DEFAULT_TIMEOUT, version=None, tags=None):
+        value = await self.aget(key, self._missing_key, version=version)
+        if value is self._missing_key:
+            if callable(default):
+                default = default()
+            if self.stale_while_revalidate:
+                # We hold the refresh lock and a stale entry may exist
+                await self.aset(key, default, timeout=timeout, version=version, tags=tags)
+                return default
+            if await self.aadd(key, default, timeout=timeout, version=version, tags=tags):
+                return default
+
+            # Another caller added a value between aget() and aadd()
+            return await self.aget(key, default, version=version)
+        return value
+
+    # --------------------------------------------------------------------------
+
+    def incr(self, key, delta=1, version=None):
+        """
+        Increment the value and keep the create time and the expire time of the entry.
+        Note: The backend atomic incr can't be used, because the value is wrapped.
+        """
+        entry = self._raw_get(key, self._missing_key, version)
+        if entry is not self._missing_key:
+            try:
+                create_time, tags, value = unpack_tagged_entry(entry)
+            except (TypeError, ValueError, pickle.UnpicklingError):
+                create_time = None
+
+            expires = get_entry_expires(entry)
+            if expires is None:
+                timeout = DEFAULT_TIMEOUT  # e.g.: old entry without expire time
+            elif expires == 0:
+                timeout = None
+            else:
+                timeout = expires - int(time.time())  # The remaining time of the entry
+
+            if (
+                create_time is None
+                or (expires and timeout <= 0)
+                or self.smooth_engine.is_outdated(self, create_time, tags)
+            ):
+                self.delete(key, version)
+            else:
+                new_value = value + delta
+                super().set(key, pack_entry(new_value, create_time, tags, expires), timeout, version)
+                return new_value
+        raise ValueError(f"Key '{key}' not found")
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        """
+        Set a new expiration and store it in the entry, too (used by incr())
+        """
+        entry = self._raw_get(key, self._missing_key, version)
+        if entry is self._missing_key:
+            return False
+        if get_entry_expires(entry) is None:
+            # Not a packed entry with expire time
+            return super().touch(key, timeout, version)
+        try:
+            create_time, tags, value = unpack_tagged_entry(entry)
+        except (TypeError, ValueError, pickle.UnpicklingError):
+            return super().touch(key, timeout, version)
+        super().set(key, pack_entry(value, create_time, tags, self.get_expires(timeout)), timeout, version)
+        return True
 
     def clear(self):
         logger.debug("SmoothCache clear called!")
@@ -178,16 +804,44 @@ class _SmoothCache:
         self.smooth_update()
 
 
-class SmoothFileBasedCache(_SmoothCache, FileBasedCache):
-    pass
+class SmoothFileBasedCache(_SmoothCache, FileCacheIndexMixin, FileBasedCache):
+    def get(self, key, default=None, version=None, raw=False):
+        if not raw and self._outdated_by_index(key, version):
+            return default
+        return super().get(key, default, version, raw)
+
+    def _outdated_by_index(self, key, version):
+        """
+        Check the mtime from the index (if activated), so that out-dated entries are
+        deleted without opening the entry file. The tags are stored in the entry itself,
+        so tagged entries are checked as usual after loading.
+        """
+        if self.stale_while_revalidate:
+            return False
+        fname = self._key_to_file(key, version)
+        entry = self._index_lookup(fname)
+        if entry is None or not self.smooth_engine.is_outdated(self, int(entry.mtime)):
+            return False
+        self._evict(key, int(entry.mtime))
+        self._delete(fname)
+        return True
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None, raw=False, tags=None):
+        # FileBasedCache.add() calls self.set() -> don't wrap the value here
+        if self.has_key(key, version):
+            return False
+        self.set(key, value, timeout, version, raw=raw, tags=tags)
+        return True
 
 
 class SmoothDatabaseCache(_SmoothCache, DatabaseCache):
-    pass
+    def _raw_get(self, key, default, version):
+        # DatabaseCache.get() calls self.get_many()
+        return self._raw_get_many([key], version).get(key, default)
 
 
 class SmoothLocMemCache(_SmoothCache, LocMemCache):
-    pass
+    blocking_io = False
 
 
 class SmoothMemcachedCache(_SmoothCache, PyMemcacheCache):
@@ -196,3 +850,269 @@ class SmoothMemcachedCache(_SmoothCache, PyMemcacheCache):
 
 class SmoothPyLibMCCache(_SmoothCache, PyLibMCCache):
     pass
+
+
+class LocalTier:
+    """
+    Bounded in-process store of packed cache entries, used by SmoothTwoTierCache.
+    All backend instances (one per thread) with the same LOCATION and options share one LocalTier.
+    """
+
+    EVICTION_POLICIES = ("LRU", "FIFO")
+
+    def __init__(self, max_entries, timeout, eviction):
+        if eviction not in self.EVICTION_POLICIES:
+            raise ImproperlyConfigured(f"Unknown eviction policy {eviction!r}, use one of: {self.EVICTION_POLICIES}")
+        self.max_entries = max_entries
+        self.timeout = timeout  # max. seconds that a entry lives in the local tier
+        self.lru = eviction == "LRU"
+
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.change_time = None  # "last change" timestamp of the shared cache, when the tier was filled
+
+        # Statistics:
+        self.local_hits = 0
+        self.local_misses = 0
+        self.shared_hits = 0
+        self.shared_misses = 0
+        self.evictions = 0  # Entries removed because of max_entries
+        self.drops = 0  # How often the complete tier was dropped, because the shared change time changed
+
+    def check_change_time(self, change_time):
+        """
+        Drop all entries if the "last change" timestamp of the shared cache changed.
+        """
+        if change_time != self.change_time:
+            with self.lock:
+                if self.change_time is not None:
+                    self.drops += 1
+                    logger.debug(f"Drop local tier: change time {self.change_time!r} -> {change_time!r}")
+                self.entries.clear()
+                self.change_time = change_time
+
+    def get(self, key):
+        with self.lock:
+            try:
+                expires, entry = self.entries[key]
+            except KeyError:
+                return None
+            if expires < time.monotonic():
+                del self.entries[key]
+                return None
+            if self.lru:
+                self.entries.move_to_end(key)
+            return entry
+
+    def put(self, key, entry):
+        with self.lock:
+            self.entries[key] = (time.monotonic() + self.timeout, entry)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def pop(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def get_stats(self):
+        return {
+            "entries": len(self.entries),
+            "max_entries": self.max_entries,
+            "local_hits": self.local_hits,
+            "local_misses": self.local_misses,
+            "shared_hits": self.shared_hits,
+            "shared_misses": self.shared_misses,
+            "evictions": self.evictions,
+            "drops": self.drops,
+        }
+
+
+# All LocalTier instances of the current process, by (location, max entries, timeout, eviction):
+_LOCAL_TIERS = {}
+_LOCAL_TIERS_LOCK = threading.Lock()
+
+
+class SmoothTwoTierCache(BaseCache):
+    """
+    A bounded in-process tier in front of a shared smooth cache backend.
+    LOCATION is the alias of the shared cache in settings.CACHES.
+
+    Hot keys are answered from process memory. Every local hit is checked
+    with the SmoothCacheEngine of the shared cache, so the smooth expiry and
+    tags work as usual. A new "last change" timestamp of the shared cache
+    drops the complete local tier.
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        self._shared_alias = location
+
+        options = params.get("OPTIONS", {})
+        timeout = options.get("LOCAL_TIMEOUT", SMOOTH_CACHE_UPDATE_TIMESTAMP)
+        eviction = options.get("EVICTION", "LRU")
+
+        # Django creates a instance per thread: They share one tier. But aliases
+        # with other options in front of the same shared cache need their own tier.
+        tier_key = (location, self._max_entries, timeout, eviction)
+        with _LOCAL_TIERS_LOCK:
+            try:
+                self.local_tier = _LOCAL_TIERS[tier_key]
+            except KeyError:
+                self.local_tier = _LOCAL_TIERS[tier_key] = LocalTier(self._max_entries, timeout, eviction)
+
+    @property
+    def shared(self):
+        shared = caches[self._shared_alias]
+        if not isinstance(shared, _SmoothCache):
+            raise ImproperlyConfigured(f"Cache {self._shared_alias!r} is not a smooth cache backend: {shared!r}")
+        return shared
+
+    def _get_local_tier(self, shared):
+        local_tier = self.local_tier
+        local_tier.check_change_time(shared.smooth_engine.change_time)
+        return local_tier
+
+    def _get_local(self, shared, key, version):
+        local_tier = self._get_local_tier(shared)
+        local_key = shared.make_key(key, version=version)
+        return local_tier, local_key, local_tier.get(local_key)
+
+    def get(self, key, default=None, version=None):
+        shared = self.shared
+        value = self._get_from_local_tier(shared, key, version)
+        if value is not self._missing_key:
+            return value
+
+        local_tier = self.local_tier
+        entry = shared.get(key, version=version, raw=True)
+        if entry is None:
+            local_tier.shared_misses += 1
+            return default
+        local_tier.shared_hits += 1
+
+        value = shared._unwrap(key, entry, version)
+        if value is shared._missing_key:
+            shared.delete(key, version)
+            return default
+        elif value is _REFRESH:
+            return default
+
+        # _unwrap() may have fetched a new change time -> check the local tier again:
+        self._get_local_tier(shared).put(shared.make_key(key, version=version), entry)
+        return value
+
+    def get_many(self, keys, version=None):
+        shared = self.shared
+        result = {}
+        missing_keys = []
+        for key in keys:
+            value = self._get_from_local_tier(shared, key, version)
+            if value is self._missing_key:
+                missing_keys.append(key)
+            else:
+                result[key] = value
+
+        if missing_keys:
+            entries = shared.get_many(missing_keys, version=version, raw=True)
+            local_tier = self._get_local_tier(shared)
+            local_tier.shared_hits += len(entries)
+            local_tier.shared_misses += len(missing_keys) - len(entries)
+
+            outdated_keys = []
+            for key, entry in entries.items():
+                value = shared._unwrap(key, entry, version)
+                if value is shared._missing_key:
+                    outdated_keys.append(key)
+                elif value is not _REFRESH:
+                    local_tier.put(shared.make_key(key, version=version), entry)
+                    result[key] = value
+            if outdated_keys:
+                shared.delete_many(outdated_keys, version)
+
+        return result
+
+    def _get_from_local_tier(self, shared, key, version):
+        """
+        return the value from the local tier or self._missing_key.
+        A out-dated local entry is only removed from the local tier:
+        The shared cache may contain a newer entry.
+        """
+        local_tier, local_key, entry = self._get_local(shared, key, version)
+        if entry is None:
+            local_tier.local_misses += 1
+            return self._missing_key
+
+        local_tier.local_hits += 1
+        # Don't take the refresh lock here: The caller that gets the lock must
+        # refresh the entry, but this caller asks the shared cache next.
+        value = shared._unwrap(key, entry, version, allow_stale=False)
+        if value is shared._missing_key:
+            local_tier.pop(local_key)
+            return self._missing_key
+        return value
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None, tags=None):
+        shared = self.shared
+        entry = pack_entry(value, tags=tags, expires=shared.get_expires(timeout))
+        shared.set(key, entry, timeout, version, raw=True)
+        self._get_local_tier(shared).put(shared.make_key(key, version=version), entry)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None, tags=None):
+        shared = self.shared
+        create_time = int(time.time())
+        expires = shared.get_expires(timeout)
+        entries = {key: pack_entry(value, create_time, tags, expires) for key, value in data.items()}
+        failed_keys = shared.set_many(entries, timeout, version, raw=True)
+        local_tier = self._get_local_tier(shared)
+        for key, entry in entries.items():
+            if key not in failed_keys:
+                local_tier.put(shared.make_key(key, version=version), entry)
+        return failed_keys
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None, tags=None):
+        shared = self.shared
+        entry = pack_entry(value, tags=tags, expires=shared.get_expires(timeout))
+        if shared.add(key, entry, timeout, version, raw=True):
+            self._get_local_tier(shared).put(shared.make_key(key, version=version), entry)
+            return True
+        return False
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        shared = self.shared
+        self.local_tier.pop(shared.make_key(key, version=version))
+        return shared.touch(key, timeout, version)
+
+    def incr(self, key, delta=1, version=None):
+        shared = self.shared
+        self.local_tier.pop(shared.make_key(key, version=version))
+        return shared.incr(key, delta, version)
+
+    def delete(self, key, version=None):
+        shared = self.shared
+        self.local_tier.pop(shared.make_key(key, version=version))
+        return shared.delete(key, version)
+
+    def delete_many(self, keys, version=None):
+        shared = self.shared
+        for key in keys:
+            self.local_tier.pop(shared.make_key(key, version=version))
+        shared.delete_many(keys, version)
+
+    def clear(self):
+        self.local_tier.clear()
+        self.shared.clear()
+
+    def smooth_update(self, tags=None):
+        self.shared.smooth_update(tags=tags)
+        if not tags:
+            # Other processes drop the local tier, if they see the new change time
+            self.local_tier.clear()
+
+    def get_stats(self):
+        return self.local_tier.get_stats()
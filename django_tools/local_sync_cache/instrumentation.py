@@ -0,0 +1,141 @@
+"""
+    Local sync cache instrumentation
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Helper to decide which LocalSyncCache earn their memory:
+
+    * estimate the memory of the entries (sampled, so it stays cheap)
+    * format LocalSyncCache.get_metrics() as Prometheus text
+
+    The hit/miss counters and the time spent in check_state() are only collected
+    with LOCAL_SYNC_CACHE_INSTRUMENTATION = True in settings, e.g.:
+
+        from django_tools.local_sync_cache.instrumentation import format_prometheus
+        from django_tools.local_sync_cache.local_sync_cache import LocalSyncCache
+
+        def local_sync_cache_metrics(request):
+            text = format_prometheus(LocalSyncCache.get_metrics())
+            return HttpResponse(text, content_type='text/plain; version=0.0.4')
+
+    :copyleft: 2026 by the django-tools team, see AUTHORS for more details.
+    :license: GNU GPL v3 or above, see LICENSE for more details.
+"""
+
+import random
+import sys
+import types
+
+from django.conf import settings
+
+
+# Number of entries used to estimate the memory of one cache:
+LOCAL_SYNC_CACHE_MEMORY_SAMPLES = getattr(settings, 'LOCAL_SYNC_CACHE_MEMORY_SAMPLES', 100)
+
+_ATOMIC_TYPES = (str, bytes, bytearray, int, float, complex, bool, type(None))
+_SKIP_TYPES = (type, types.ModuleType, types.FunctionType, types.BuiltinFunctionType, types.MethodType)
+
+
+def get_deep_size(obj, seen=None, max_depth=8):
+    """
+    return the size in bytes of the given object and all objects it contains.
+    Shared objects are counted once (via seen), classes/modules/functions are not counted.
+
+    >>> get_deep_size('foo') == sys.getsizeof('foo')
+    True
+    >>> get_deep_size(['x' * 1000]) > 1000
+    True
+    >>> data = 'x' * 1000
+    >>> get_deep_size([data, data]) < 1200
+    True
+    """
+    if seen is None:
+        seen = set()
+    if id(obj) in seen or isinstance(obj, _SKIP_TYPES):
+        return 0
+    seen.add(id(obj))
+
+    size = sys.getsizeof(obj, 0)
+    if isinstance(obj, _ATOMIC_TYPES) or max_depth <= 0:
+        return size
+
+    max_depth -= 1
+    if isinstance(obj, dict):
+        for key, value in obj.items():
+            size += get_deep_size(key, seen, max_depth) + get_deep_size(value, seen, max_depth)
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        for item in obj:
+            size += get_deep_size(item, seen, max_depth)
+    else:
+        if hasattr(obj, '__dict__'):
+            size += get_deep_size(vars(obj), seen, max_depth)
+        for name in getattr(type(obj), '__slots__', ()):
+            size += get_deep_size(getattr(obj, name, None), seen, max_depth)
+    return size
+
+
+def estimate_memory(data, samples=LOCAL_SYNC_CACHE_MEMORY_SAMPLES):
+    """
+    Estimate the memory in bytes of the given dict with all keys and values:
+    Only the given number of random entries are measured.
+
+    >>> estimate_memory({}) == sys.getsizeof({})
+    True
+    >>> data = {no: f'{no:04}' * 250 for no in range(1000)}
+    >>> 1_000_000 < estimate_memory(data, samples=10) < 1_200_000
+    True
+    """
+    size = sys.getsizeof(data)
+    count = len(data)
+    if not count:
+        return size
+
+    items = list(data.items())
+    if count > samples:
+        items = random.sample(items, samples)
+
+    seen = set()
+    sampled_size = sum(get_deep_size(key, seen) + get_deep_size(value, seen) for key, value in items)
+    return size + round(sampled_size / len(items) * count)
+
+
+# key in get_metrics() -> (metric name, type, help text)
+PROMETHEUS_METRICS = {
+    'entries': ('entries', 'gauge', 'Number of entries'),
+    'memory_bytes': ('memory_bytes', 'gauge', 'Estimated memory of all entries'),
+    'hits': ('hits_total', 'counter', 'Lookups that found a entry'),
+    'misses': ('misses_total', 'counter', 'Lookups that found no entry'),
+    'evictions': ('evictions_total', 'counter', 'Entries removed because of the size limit or timeout'),
+    'checks': ('checks_total', 'counter', 'Number of state checks'),
+    'check_state_seconds': ('check_state_seconds_total', 'counter', 'Time spent in the state checks'),
+    'own_clears': ('own_clears_total', 'counter', 'clear() calls in this process'),
+    'ext_clears': ('ext_clears_total', 'counter', 'Resets because of clear() in other threads/processes'),
+}
+
+
+def escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_prometheus(metrics, prefix='django_tools_local_sync_cache'):
+    """
+    Format the result of LocalSyncCache.get_metrics() in the Prometheus text format.
+
+    >>> print(format_prometheus({'foo': {'entries': 2, 'hits': 5}}), end='')
+    # HELP django_tools_local_sync_cache_entries Number of entries
+    # TYPE django_tools_local_sync_cache_entries gauge
+    django_tools_local_sync_cache_entries{id="foo"} 2
+    # HELP django_tools_local_sync_cache_hits_total Lookups that found a entry
+    # TYPE django_tools_local_sync_cache_hits_total counter
+    django_tools_local_sync_cache_hits_total{id="foo"} 5
+    """
+    lines = []
+    for key, (name, metric_type, help_text) in PROMETHEUS_METRICS.items():
+        samples = [(cache_id, values[key]) for cache_id, values in metrics.items() if values.get(key) is not None]
+        if not samples:
+            continue
+        lines.extend((
+            f'# HELP {prefix}_{name} {help_text}',
+            f'# TYPE {prefix}_{name} {metric_type}',
+        ))
+        lines.extend(f'{prefix}_{name}{{id="{escape_label(cache_id)}"}} {value}' for cache_id, value in samples)
+    return ''.join(f'{line}\n' for line in lines)  # The exposition format needs a line feed after every line
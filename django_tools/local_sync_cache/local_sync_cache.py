@@ -18,6 +18,19 @@
     * On every request the LocalSyncCacheMiddleware called all existing cache dict
       in the current threads to look into the shared django cache, if they
       are outdatet or not. If they are outdated, the dict would be cleaned.
+    * Optional: A transport pushes every clear() to all processes, so the
+      dicts are cleared immediately, see transports.py
+    * All instances are shared by the threads of one process: The state changes
+      (clear/reset) are serialized by a lock, but readers never block.
+      Iterating over the cache (or keys(), values(), items()) uses a copy
+      of the entries (see snapshot()), so it's safe while other threads
+      clear the cache. Lookups stay plain dict operations.
+    * Optional instrumentation: hits, misses, memory and time of the checks,
+      see instrumentation.py
+    * The reset times of all cache dicts are fetched with one get_many() call
+      and at most every LOCAL_SYNC_CACHE_CHECK_INTERVAL seconds, so a burst of
+      requests shares one check. (A clear() in the current process forces a
+      check on the next request)
 
 
     usage
@@ -44,6 +57,8 @@
             slug = models.SlugField()
 
             _url_cache = LocalSyncCache(id="PageTree_absolute_url") # <<<---
+            # or with a size limit:
+            # _url_cache = BoundedLocalSyncCache(id="PageTree_absolute_url", max_entries=5000)
             def get_absolute_url(self):
                 if self.pk in self._url_cache:
                     return self._url_cache[self.pk]
@@ -79,22 +94,44 @@
 """
 
 
+import contextlib
 import datetime
 import logging
+import os
 import sys
+import threading
 import time
+from collections import OrderedDict
 from typing import ClassVar
 
 from django.conf import settings
 from django.core.cache import caches
 from django.utils import timezone
 
+from django_tools.local_sync_cache.instrumentation import estimate_memory
+from django_tools.utils.importlib import get_attr_from_string
+
 
 logger = logging.getLogger(__name__)
 
 
 LOCAL_SYNC_CACHE_BACKEND = getattr(settings, "LOCAL_SYNC_CACHE_BACKEND", "local_sync_cache")
 
+# Min. time in seconds between two checks of all reset times in the django cache:
+LOCAL_SYNC_CACHE_CHECK_INTERVAL = getattr(settings, "LOCAL_SYNC_CACHE_CHECK_INTERVAL", 0.1)
+
+# Class path of the transport that pushes clear() events to all processes, e.g.:
+# "django_tools.local_sync_cache.transports.UnixSocketTransport"
+LOCAL_SYNC_CACHE_TRANSPORT = getattr(settings, "LOCAL_SYNC_CACHE_TRANSPORT", None)
+
+# Count hits/misses and the time spent in check_state() of every LocalSyncCache:
+LOCAL_SYNC_CACHE_INSTRUMENTATION = getattr(settings, "LOCAL_SYNC_CACHE_INSTRUMENTATION", False)
+
+_TRANSPORT_LOCK = threading.Lock()
+
+# Serialize the changes of CACHES, INIT_COUNTER and _OWN_RESET_TIMES:
+_REGISTRY_LOCK = threading.RLock()
+
 
 def _get_cache():
     """
@@ -122,37 +159,93 @@ def _get_cache():
     return django_cache
 
 
+class _LookupCounter:
+    """
+    Count the hits and misses, mixed in if LOCAL_SYNC_CACHE_INSTRUMENTATION is enabled.
+    """
+
+    counts_lookups = True
+
+    def __getitem__(self, key):
+        try:
+            value = dict.__getitem__(self, key)
+        except KeyError:
+            self.misses += 1
+            raise
+        self.hits += 1
+        return value
+
+    def __contains__(self, key):
+        if dict.__contains__(self, key):
+            return True
+        self.misses += 1
+        return False
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+
+# LocalSyncCache class -> class with _LookupCounter
+_COUNTING_CLASSES = {}
+
+
 class LocalSyncCache(dict):
+    counts_lookups = False  # Are hits/misses counted by the class itself?
+
     INIT_COUNTER: ClassVar = {}  # Counts how often __init__ used, should always be 1!
 
     # Stores all existing instance, used in middleware to call check_state()
+    # Never changed in place (copy-on-write), so it can be iterated without a lock.
     CACHES: ClassVar = []
 
     # Store the last reset times secondary in this local thread.
     _OWN_RESET_TIMES: ClassVar = {}
 
+    # Point in the future (monotonic clock) for the next check in check_all_states()
+    _NEXT_CHECK: ClassVar = 0
+
+    # The started transport of the current process, see get_transport()
+    _TRANSPORT: ClassVar = None
+
+    def __new__(cls, *args, **kwargs):
+        instance_class = cls
+        if LOCAL_SYNC_CACHE_INSTRUMENTATION and not cls.counts_lookups:
+            # Use a subclass with _LookupCounter, so the lookups without instrumentation
+            # stay plain dict operations.
+            try:
+                instance_class = _COUNTING_CLASSES[cls]
+            except KeyError:
+                instance_class = _COUNTING_CLASSES.setdefault(cls, type(cls.__name__, (_LookupCounter, cls), {}))
+        return super().__new__(instance_class)
+
     def __init__(self, id=None, unique_ids=True):
         if id is None:
             raise AssertionError("LocalSyncCache must take a id as argument.")
 
-        if unique_ids:
-            for existing_cache in self.CACHES:
-                if id == existing_cache.id:
-                    logger.error(
-                        f"ID {id!r} was already used! It must be unique!"
-                        f" (Existing ids are: {[i.id for i in self.CACHES]!r})"
-                    )
-
         self.id = id
         self.django_cache = _get_cache()
         self.last_reset = time.time()  # Save last creation/reset time
-        self.CACHES.append(self)
+        self._state_lock = threading.Lock()  # Serialize clear() and the reset in _sync_state()
 
-        if self.id not in self.INIT_COUNTER:
-            self.INIT_COUNTER[self.id] = 1
-        else:
-            logger.error(f"Error: __init__ for {self.id} was called to often!")
-            self.INIT_COUNTER[self.id] += 1
+        with _REGISTRY_LOCK:
+            if unique_ids:
+                for existing_cache in LocalSyncCache.CACHES:
+                    if id == existing_cache.id:
+                        logger.error(
+                            f"ID {id!r} was already used! It must be unique!"
+                            f" (Existing ids are: {[i.id for i in LocalSyncCache.CACHES]!r})"
+                        )
+
+            LocalSyncCache.CACHES = [*LocalSyncCache.CACHES, self]
+
+            if self.id not in self.INIT_COUNTER:
+                self.INIT_COUNTER[self.id] = 1
+            else:
+                logger.error(f"Error: __init__ for {self.id} was called to often!")
+                self.INIT_COUNTER[self.id] += 1
 
         # Counts how often check_state called (Normally one time per request):
         self.request_counter = 0
@@ -160,38 +253,169 @@ class LocalSyncCache(dict):
         self.own_clear_counter = 0  # Counts how often clear called in this thread
         self.ext_clear_counter = 0  # Counts how often clears from external thread
 
+        # Only counted with LOCAL_SYNC_CACHE_INSTRUMENTATION (or by BoundedLocalSyncCache):
+        self.hits = 0
+        self.misses = 0
+        self.check_state_seconds = 0.0
+
+        self.get_transport()  # Start receiving the clear() events
+
         logger.debug(f"{id!r} __init__")
 
+    def unregister(self):
+        """
+        Remove this instance from CACHES, e.g.: for a temporary cache.
+        """
+        with _REGISTRY_LOCK:
+            LocalSyncCache.CACHES = [instance for instance in LocalSyncCache.CACHES if instance is not self]
+            if self.id in self.INIT_COUNTER:
+                self.INIT_COUNTER[self.id] -= 1
+                if not self.INIT_COUNTER[self.id]:
+                    del self.INIT_COUNTER[self.id]
+                    self._OWN_RESET_TIMES.pop(self.id, None)
+
+    def snapshot(self):
+        """
+        return a copy of the current entries. Safe to iterate, also if a other thread clears the cache.
+        """
+        while True:
+            try:
+                # Copied in C while holding the GIL. Not dict.copy(): It would call our keys()
+                return dict(dict.items(self))
+            except RuntimeError:
+                # "dictionary changed size during iteration": Very rare, only if e.g. the
+                # garbage collector runs Python code in between and a other thread gets the GIL.
+                continue
+
+    def __iter__(self):
+        return iter(self.snapshot())
+
+    def keys(self):
+        return self.snapshot().keys()
+
+    def values(self):
+        return self.snapshot().values()
+
+    def items(self):
+        return self.snapshot().items()
+
+    @staticmethod
+    def get_transport():
+        """
+        return the started transport or None, if LOCAL_SYNC_CACHE_TRANSPORT is not set.
+        """
+        if LOCAL_SYNC_CACHE_TRANSPORT is None:
+            return None
+        if LocalSyncCache._TRANSPORT is None:
+            with _TRANSPORT_LOCK:
+                if LocalSyncCache._TRANSPORT is None:
+                    transport_class = get_attr_from_string(LOCAL_SYNC_CACHE_TRANSPORT, "LocalSyncCache transport")
+                    transport = transport_class()
+                    transport.start(LocalSyncCache.receive_reset)
+                    LocalSyncCache._TRANSPORT = transport
+        return LocalSyncCache._TRANSPORT
+
+    @staticmethod
+    def receive_reset(cache_id, reset_time):
+        """
+        Called by the transport for every clear() in all processes.
+        """
+        for instance in LocalSyncCache.CACHES:
+            if instance.id == cache_id:
+                instance._sync_state(reset_time)
+
     def check_state(self):
         """
         Check if we are out-dated or not.
         Should be called at the start of a request. e.g.: by middleware
         """
         self.request_counter += 1
-        global_update_time = self.django_cache.get(self.id)
+        if LOCAL_SYNC_CACHE_INSTRUMENTATION:
+            start_time = time.perf_counter()
+            self._sync_state(self.django_cache.get(self.id))
+            self.check_state_seconds += time.perf_counter() - start_time
+        else:
+            self._sync_state(self.django_cache.get(self.id))
 
+    @classmethod
+    def check_all_states(cls):
+        """
+        Check all existing instances with one get_many() call, but skip the check,
+        if the last one was less than LOCAL_SYNC_CACHE_CHECK_INTERVAL seconds ago.
+        Should be called at the start of a request. e.g.: by middleware
+        """
+        now = time.monotonic()
+        if now < cls._NEXT_CHECK or not cls.CACHES:
+            return
+        LocalSyncCache._NEXT_CHECK = now + LOCAL_SYNC_CACHE_CHECK_INTERVAL
+
+        start_time = time.perf_counter()
+        instances = LocalSyncCache.CACHES
+        ids = list(dict.fromkeys(instance.id for instance in instances))
+        global_update_times = instances[0].django_cache.get_many(ids)
+        for instance in instances:
+            instance.request_counter += 1
+            instance._sync_state(global_update_times.get(instance.id))
+
+        if LOCAL_SYNC_CACHE_INSTRUMENTATION:
+            # Every instance gets the same share of the time:
+            duration = (time.perf_counter() - start_time) / len(instances)
+            for instance in instances:
+                instance.check_state_seconds += duration
+
+    def _sync_state(self, global_update_time):
+        """
+        Clear the dict, if the given reset time from the django cache is newer.
+        """
         if global_update_time is None:
-            if self.id in self._OWN_RESET_TIMES:
+            own_reset_time = self._OWN_RESET_TIMES.get(self.id)
+            if own_reset_time is not None:
                 # clear() was called in the past in this thread and it
                 # is not stored in the django cache -> resave it
                 logger.info(f"Resave {self.id!r} last reset time in cache")
-                self.django_cache.set(self.id, self._OWN_RESET_TIMES[self.id])
+                self.django_cache.set(self.id, own_reset_time)
         elif self.last_reset < global_update_time:
-            # We have out-dated data -> reset dict
-            self.ext_clear_counter += 1
-            logger.info(
-                f"{self.id!r} out-dated data -> reset"
-                f" (global_update_time: {global_update_time!r}"
-                f" - self.last_reset: {self.last_reset!r})"
-            )
-            dict.clear(self)
-            self.last_reset = time.time()
+            with self._state_lock:
+                if self.last_reset >= global_update_time:
+                    return  # reset by a other thread in the meantime
+
+                # We have out-dated data -> reset dict
+                self.ext_clear_counter += 1
+                logger.info(
+                    f"{self.id!r} out-dated data -> reset"
+                    f" (global_update_time: {global_update_time!r}"
+                    f" - self.last_reset: {self.last_reset!r})"
+                )
+                self._clear_local()
+
+                # Use the global time and not "now": A clear() in a other process
+                # since the global time was fetched must not be lost.
+                self.last_reset = global_update_time
+
+                if self._OWN_RESET_TIMES.pop(self.id, None) is not None:
+                    # In this thread clear() was called in the past and now in
+                    # a other thread clear() was called.
+                    logger.debug(f"remove {self.id!r} from _OWN_RESET_TIMES")
+
+    def _clear_local(self):
+        """
+        Clear only the dict in this thread.
+        """
+        dict.clear(self)
 
-            if self.id in self._OWN_RESET_TIMES:
-                # In this thread clear() was called in the past and now in
-                # a other thread clear() was called.
-                del self._OWN_RESET_TIMES[self.id]
-                logger.debug(f"remove {self.id!r} from _OWN_RESET_TIMES")
+    def get_stats(self):
+        """
+        Additional information for get_cache_information()
+        """
+        if not self.counts_lookups:
+            return {}
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else None,
+            "check_state_seconds": self.check_state_seconds,
+        }
 
     def clear(self):
         """
@@ -199,19 +423,33 @@ class LocalSyncCache(dict):
             * Clear the dict
             * Save clear time in django cache and in self._OWN_RESET_TIMES
         """
-        self.own_clear_counter += 1
-        dict.clear(self)
-        self.last_reset = time.time()
-        self.django_cache.set(self.id, self.last_reset)
-        logger.info(f"{self.id!r} - dict.clear - Set global_update_time to {self.last_reset!r}")
+        with self._state_lock:
+            self.own_clear_counter += 1
+            self._clear_local()
+            reset_time = self.last_reset = time.time()
+
+        self.django_cache.set(self.id, reset_time)
+        logger.info(f"{self.id!r} - dict.clear - Set global_update_time to {reset_time!r}")
 
         # Save reset time in this thread for re-adding it to cache in check_state()
-        self._OWN_RESET_TIMES[self.id] = self.last_reset
+        self._OWN_RESET_TIMES[self.id] = reset_time
+
+        # Other instances with the same id should be cleared on the next request:
+        LocalSyncCache._NEXT_CHECK = 0
+
+        transport = self.get_transport()
+        if transport is not None:
+            try:
+                transport.publish(self.id, reset_time)
+            except Exception:
+                # The polling via check_state() is the fallback
+                logger.exception(f"Can't publish clear() of {self.id!r}")
 
         # Check if cache worked
+        # (A other thread/process may have stored a newer time in the meantime)
         cached_value = self.django_cache.get(self.id)
-        if cached_value != self.last_reset:
-            logger.error(f"Cache seems not to work: {cached_value!r} != {self.last_reset!r}")
+        if cached_value is None or cached_value < reset_time:
+            logger.error(f"Cache seems not to work: {cached_value!r} != {reset_time!r}")
 
     @staticmethod
     def get_cache_information():
@@ -239,14 +477,51 @@ class LocalSyncCache(dict):
                 "instance": instance,
                 "length": len(instance),
                 "size": instance_size,
+                "memory": estimate_memory(instance.snapshot()),  # incl. keys and values
                 "cleared": cleared,
                 "global_update_time": global_update_time,
                 "global_update_datetime": global_update_datetime,
                 "last_reset_datetime": last_reset_datetime,
                 "init_counter": LocalSyncCache.INIT_COUNTER[id],
+                **instance.get_stats(),
             })
         return cache_information
 
+    @staticmethod
+    def get_metrics():
+        """
+        return the metrics of all instances as dict (id -> metrics).
+        The values of instances with the same id are summed up.
+        Format it with instrumentation.format_prometheus() for Prometheus.
+        """
+        metrics = {}
+        for instance in LocalSyncCache.CACHES:
+            values = metrics.setdefault(instance.id, {
+                "entries": 0,
+                "memory_bytes": 0,
+                "hits": 0,
+                "misses": 0,
+                "evictions": 0,
+                "checks": 0,
+                "check_state_seconds": 0.0,
+                "own_clears": 0,
+                "ext_clears": 0,
+            })
+            values["entries"] += len(instance)
+            values["memory_bytes"] += estimate_memory(instance.snapshot())
+            values["hits"] += instance.hits
+            values["misses"] += instance.misses
+            values["evictions"] += getattr(instance, "evictions", 0) + getattr(instance, "expirations", 0)
+            values["checks"] += instance.request_counter
+            values["check_state_seconds"] += instance.check_state_seconds
+            values["own_clears"] += instance.own_clear_counter
+            values["ext_clears"] += instance.ext_clear_counter
+
+        for values in metrics.values():
+            lookups = values["hits"] + values["misses"]
+            values["hit_ratio"] = values["hits"] / lookups if lookups else None
+        return metrics
+
     @staticmethod
     def pformat_cache_information():
         output = []
@@ -265,3 +540,129 @@ class LocalSyncCache(dict):
                 output.append(f"{key:>22}: {value!r}")
 
         return "\n".join(output)
+
+
+class BoundedLocalSyncCache(LocalSyncCache):
+    """
+    LocalSyncCache with a max. number of entries (least recently used are evicted)
+    and a optional timeout in seconds per entry. e.g.:
+
+        _url_cache = BoundedLocalSyncCache(id="PageTree_absolute_url", max_entries=5000, timeout=3600)
+
+    Misses are counted in "key in cache", cache.get() and cache[key]; hits in cache.get() and cache[key]
+    So the usual "if key in cache: return cache[key]" pattern counts every lookup once.
+
+    Writers hold a lock, to keep the entries and the LRU order in sync. Readers don't block,
+    only the removal of a expired entry takes the lock.
+    """
+
+    counts_lookups = True
+
+    def __init__(self, id=None, max_entries=1000, timeout=None, unique_ids=True):
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self._expires = OrderedDict()  # key -> expire time (monotonic clock) in LRU order
+        self._write_lock = threading.RLock()
+        self.evictions = 0  # removed because of max_entries
+        self.expirations = 0  # removed because of the timeout
+        super().__init__(id=id, unique_ids=unique_ids)
+
+    def _is_expired(self, key):
+        expires = self._expires.get(key)
+        if expires is None or expires >= time.monotonic():
+            return False  # The fast path without the lock
+
+        with self._write_lock:
+            # Check again: The key may be set again by a other thread in the meantime
+            expires = self._expires.get(key)
+            if expires is None or expires >= time.monotonic():
+                return key not in dict.keys(self)  # Removed by a other thread?
+            self.expirations += 1
+            del self._expires[key]
+            dict.pop(self, key, None)
+            return True
+
+    def __setitem__(self, key, value):
+        with self._write_lock:
+            dict.__setitem__(self, key, value)
+            self._expires[key] = None if self.timeout is None else time.monotonic() + self.timeout
+            self._expires.move_to_end(key)
+            while len(self._expires) > self.max_entries:
+                oldest_key, _ = self._expires.popitem(last=False)
+                dict.pop(self, oldest_key, None)
+                self.evictions += 1
+
+    def __getitem__(self, key):
+        try:
+            value = dict.__getitem__(self, key)
+        except KeyError:
+            self.misses += 1
+            raise
+        if self._is_expired(key):
+            self.misses += 1
+            raise KeyError(key)
+        self.hits += 1
+        with contextlib.suppress(KeyError):  # evicted by a other thread in the meantime
+            self._expires.move_to_end(key)
+        return value
+
+    def __contains__(self, key):
+        if not dict.__contains__(self, key) or self._is_expired(key):
+            self.misses += 1
+            return False
+        return True
+
+    def __delitem__(self, key):
+        with self._write_lock:
+            dict.__delitem__(self, key)
+            self._expires.pop(key, None)
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def setdefault(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            self[key] = default
+            return default
+
+    def update(self, *args, **kwargs):
+        for key, value in dict(*args, **kwargs).items():
+            self[key] = value
+
+    def pop(self, key, *args):
+        with self._write_lock:
+            self._expires.pop(key, None)
+            return dict.pop(self, key, *args)
+
+    def popitem(self):
+        with self._write_lock:
+            key, value = dict.popitem(self)
+            self._expires.pop(key, None)
+            return key, value
+
+    def _clear_local(self):
+        with self._write_lock:
+            dict.clear(self)
+            self._expires.clear()
+
+    def get_stats(self):
+        return {
+            "max_entries": self.max_entries,
+            "timeout": self.timeout,
+            **super().get_stats(),
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+def _reset_transport():
+    # A forked child must start a own transport (the receiver thread is not forked)
+    LocalSyncCache._TRANSPORT = None
+
+
+os.register_at_fork(after_in_child=_reset_transport)
@@ -3,6 +3,7 @@
     ~~~~~~~~~~~~~~~~~~~~~~~~~~~
 
     Calls check_state() in every existing LocalSyncCache instance.
+    All reset times are fetched with one cache call, see LocalSyncCache.check_all_states()
 
     For more information look into DocString in local_sync_cache.py !
 
@@ -16,5 +17,4 @@ from django_tools.local_sync_cache.local_sync_cache import LocalSyncCache
 
 class LocalSyncCacheMiddleware:
     def process_request(self, request):
-        for cache in LocalSyncCache.CACHES:
-            cache.check_state()
+        LocalSyncCache.check_all_states()
@@ -0,0 +1,236 @@
+"""
+    Local sync cache notification transports
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Without a transport, a clear() in a other process is only seen on the next
+    request, via the LocalSyncCacheMiddleware polling the django cache. So stale
+    data can survive long-running requests and background workers.
+
+    A transport pushes every clear() to all processes and the affected dicts are
+    cleared immediately. The polling stays as fallback (e.g. lost events or
+    processes without a working transport).
+
+    Activate it in settings, e.g.:
+
+        LOCAL_SYNC_CACHE_TRANSPORT = 'django_tools.local_sync_cache.transports.UnixSocketTransport'
+
+    Existing transports:
+
+    * UnixSocketTransport - datagram UNIX-domain sockets, for all processes on the same host
+    * PostgresTransport - LISTEN/NOTIFY of the PostgreSQL database, across hosts (needs psycopg v3)
+    * LocalTransport - in-process stand-in for tests
+
+    :copyleft: 2026 by the django-tools team, see AUTHORS for more details.
+    :license: GNU GPL v3 or above, see LICENSE for more details.
+"""
+
+import atexit
+import contextlib
+import json
+import logging
+import os
+import socket
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import ClassVar
+
+from django.conf import settings
+from django.db import DatabaseError, connections
+
+
+try:
+    from psycopg import Error as PsycopgError
+except ImportError:  # Only needed for the PostgresTransport
+    PsycopgError = DatabaseError
+
+
+logger = logging.getLogger(__name__)
+
+
+# Directory for the sockets of the UnixSocketTransport, must be the same for all processes:
+LOCAL_SYNC_CACHE_SOCKET_DIR = getattr(
+    settings, 'LOCAL_SYNC_CACHE_SOCKET_DIR', os.path.join(tempfile.gettempdir(), 'django_tools_local_sync_cache')
+)
+
+# Database alias used by the PostgresTransport:
+LOCAL_SYNC_CACHE_DATABASE = getattr(settings, 'LOCAL_SYNC_CACHE_DATABASE', 'default')
+
+
+class BaseTransport:
+    """
+    Base class of all transports.
+    start() must call self.dispatch() for every received event (in a other thread).
+    """
+
+    def __init__(self):
+        self.callback = None
+
+    def start(self, callback):
+        """
+        Start receiving events: callback(cache_id, reset_time) is called for every
+        clear() in all processes (also in the own process)
+        """
+        self.callback = callback
+
+    def publish(self, cache_id, reset_time):
+        raise NotImplementedError
+
+    def stop(self):
+        self.callback = None
+
+    def encode(self, cache_id, reset_time):
+        """
+        >>> BaseTransport().encode('PageTree_absolute_url', 1234.5)
+        b'["PageTree_absolute_url", 1234.5]'
+        """
+        return json.dumps([cache_id, reset_time]).encode()
+
+    def dispatch(self, data):
+        try:
+            cache_id, reset_time = json.loads(data)
+        except (TypeError, ValueError) as err:
+            logger.error(f'Ignore invalid event {data!r}: {err}')
+            return
+
+        callback = self.callback
+        if callback is not None:
+            callback(cache_id, reset_time)
+
+
+class LocalTransport(BaseTransport):
+    """
+    In-process stand-in for tests: Every started instance acts like a own process.
+    """
+
+    SUBSCRIBERS: ClassVar = []
+
+    def start(self, callback):
+        super().start(callback)
+        self.SUBSCRIBERS.append(self)
+
+    def publish(self, cache_id, reset_time):
+        data = self.encode(cache_id, reset_time)
+        for transport in list(self.SUBSCRIBERS):
+            transport.dispatch(data)
+
+    def stop(self):
+        with contextlib.suppress(ValueError):
+            self.SUBSCRIBERS.remove(self)
+        super().stop()
+
+
+class UnixSocketTransport(BaseTransport):
+    """
+    Every process binds a datagram socket in LOCAL_SYNC_CACHE_SOCKET_DIR and
+    publish() sends the event to all sockets in this directory.
+    Sockets of dead processes are removed on the next publish() call.
+    """
+
+    directory = LOCAL_SYNC_CACHE_SOCKET_DIR
+
+    def __init__(self):
+        super().__init__()
+        self.path = None
+        self.sock = None
+
+    def start(self, callback):
+        super().start(callback)
+        directory = Path(self.directory)
+        directory.mkdir(mode=0o700, parents=True, exist_ok=True)
+
+        self.path = directory / f'{os.getpid()}-{id(self)}.sock'
+        self.path.unlink(missing_ok=True)  # e.g.: left over from a dead process with the same pid
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self.sock.bind(str(self.path))
+        atexit.register(self.stop)
+
+        thread = threading.Thread(target=self._receive, args=(self.sock,), name='LocalSyncCache receiver', daemon=True)
+        thread.start()
+        logger.debug(f'Listen on {self.path}')
+
+    def _receive(self, sock):
+        while True:
+            try:
+                data = sock.recv(4096)
+            except OSError:
+                return  # socket closed by stop()
+            self.dispatch(data)
+
+    def publish(self, cache_id, reset_time):
+        data = self.encode(cache_id, reset_time)
+        with socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM) as sock:
+            sock.setblocking(False)  # Never wait for a slow receiver, the polling is the fallback
+            for path in Path(self.directory).glob('*.sock'):
+                try:
+                    sock.sendto(data, str(path))
+                except (ConnectionRefusedError, FileNotFoundError):
+                    # The process is gone
+                    logger.debug(f'Remove stale socket {path}')
+                    path.unlink(missing_ok=True)
+                except OSError as err:
+                    logger.warning(f'Can not send event to {path}: {err}')
+
+    def stop(self):
+        super().stop()
+        if self.sock is not None:
+            atexit.unregister(self.stop)
+            self.sock.close()
+            self.sock = None
+            self.path.unlink(missing_ok=True)
+
+
+class PostgresTransport(BaseTransport):
+    """
+    LISTEN/NOTIFY of the PostgreSQL database. Works across hosts.
+    The listener needs a own database connection and psycopg v3.
+    If clear() is called in a transaction, the event is send on commit.
+    """
+
+    database_alias = LOCAL_SYNC_CACHE_DATABASE
+    channel = 'django_tools_local_sync_cache'
+    reconnect_delay = 5  # seconds
+
+    def __init__(self):
+        super().__init__()
+        self.connection = None
+        self.thread = None
+        self.stopped = False
+
+    def start(self, callback):
+        super().start(callback)
+        self.thread = threading.Thread(target=self._listen, name='LocalSyncCache listener', daemon=True)
+        self.thread.start()
+
+    def _connect(self):
+        database = connections[self.database_alias]
+        connection = database.get_new_connection(database.get_connection_params())
+        connection.autocommit = True
+        connection.execute(f'LISTEN {self.channel}')
+        return connection
+
+    def _listen(self):
+        while not self.stopped:
+            try:
+                self.connection = self._connect()
+                for notify in self.connection.notifies():
+                    self.dispatch(notify.payload)
+            except (PsycopgError, DatabaseError, OSError):
+                # Lost/refused database connection: Events are missed until the
+                # reconnect, the polling of the LocalSyncCacheMiddleware covers them.
+                if self.stopped:
+                    return
+                logger.exception(f'Listen on {self.channel!r} failed (retry in {self.reconnect_delay} sec.)')
+                time.sleep(self.reconnect_delay)
+
+    def publish(self, cache_id, reset_time):
+        payload = self.encode(cache_id, reset_time).decode()
+        with connections[self.database_alias].cursor() as cursor:
+            cursor.execute('SELECT pg_notify(%s, %s)', [self.channel, payload])
+
+    def stop(self):
+        self.stopped = True
+        super().stop()
+        if self.connection is not None:
+            self.connection.close()
@@ -0,0 +1,98 @@
+"""
+    'profiling stats' manage command
+
+    Aggregate the files written by the ProfilingMiddleware into hot-function tables.
+
+
+    setup:
+
+        INSTALLED_APPS = [
+            ...
+            'django_tools',
+            ...
+        ]
+
+
+    usage:
+
+        $ ./manage.py profiling_stats
+        $ ./manage.py profiling_stats --sort cumulative --limit 50
+
+
+    :copyleft: 2026 by the django-tools team, see AUTHORS for more details.
+    :license: GNU GPL v3 or above, see LICENSE for more details.
+"""
+
+import collections
+import io
+import pstats
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+
+from django_tools.middlewares import profiling
+
+
+def aggregate_stacks(paths):
+    """
+    return the number of all samples and two Counters: the samples in which a
+    function is on the top of the stack ("self") and anywhere in the stack ("total").
+    """
+    total_samples = 0
+    self_counts = collections.Counter()
+    total_counts = collections.Counter()
+    for path in paths:
+        for line in Path(path).read_text().splitlines():
+            stack, _, count = line.rpartition(' ')
+            if not stack:
+                continue
+            count = int(count)
+            functions = stack.split(';')
+            total_samples += count
+            self_counts[functions[-1]] += count
+            for function in set(functions):  # count recursive functions only once
+                total_counts[function] += count
+    return total_samples, self_counts, total_counts
+
+
+class Command(BaseCommand):
+    help = "Aggregate the data of the ProfilingMiddleware into hot-function tables."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--directory', default=profiling.PROFILING_DIR, help='Profiling directory (default: %(default)s)'
+        )
+        parser.add_argument(
+            '--sort',
+            default='tottime',
+            choices=('tottime', 'cumulative', 'calls'),
+            help='Sort the cProfile table by (default: %(default)s)',
+        )
+        parser.add_argument('--limit', type=int, default=30, help='Number of functions (default: %(default)s)')
+
+    def handle(self, *args, **options):
+        directory = Path(options['directory'])
+        limit = options['limit']
+
+        profile_files = sorted(directory.glob(f'*{profiling.PROFILE_SUFFIX}'))
+        stacks_files = sorted(directory.glob(f'*{profiling.STACKS_SUFFIX}'))
+        if not profile_files and not stacks_files:
+            self.stdout.write(f'No profiling data in {directory}')
+            return
+
+        if profile_files:
+            self.stdout.write(f'\ncProfile of {len(profile_files)} sampled requests:\n')
+            # pstats writes every row in pieces, but self.stdout adds a line ending to every write()
+            buffer = io.StringIO()
+            stats = pstats.Stats(*(str(path) for path in profile_files), stream=buffer)
+            stats.strip_dirs().sort_stats(options['sort']).print_stats(limit)
+            self.stdout.write(buffer.getvalue(), ending='')
+
+        if stacks_files:
+            total_samples, self_counts, total_counts = aggregate_stacks(stacks_files)
+            self.stdout.write(f'\nStack samples of {len(stacks_files)} slow requests ({total_samples} samples):\n')
+            self.stdout.write(f'{"self":>7} {"total":>7}  function')
+            for function, count in self_counts.most_common(limit):
+                self.stdout.write(
+                    f'{count / total_samples:>7.1%} {total_counts[function] / total_samples:>7.1%}  {function}'
+                )
@@ -0,0 +1,62 @@
+"""
+    'site cache info' manage command
+
+    Display the request/response counts and hit ratios of the per-site cache
+    middleware, merged from all processes.
+
+    setup:
+
+        INSTALLED_APPS = [
+            ...
+            'django_tools',
+            ...
+        ]
+
+        COUNT_FETCH_FROM_CACHE = True
+        COUNT_UPDATE_CACHE = True
+        COUNT_IN_CACHE = True
+
+
+    usage:
+
+        $ ./manage.py site_cache_info
+        $ ./manage.py site_cache_info --reset
+
+
+    :copyleft: 2026 by the django-tools team, see AUTHORS for more details.
+    :license: GNU GPL v3 or above, see LICENSE for more details.
+"""
+
+from django.core.management.base import BaseCommand
+
+from django_tools.cache import site_cache_middleware
+
+
+class Command(BaseCommand):
+    help = "Display the counts and hit ratios of the per-site cache middleware from all processes."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--reset", action="store_true", help="Reset the counts of all processes after displaying them"
+        )
+
+    def handle(self, *args, **options):
+        if not site_cache_middleware.COUNT_IN_CACHE:
+            self.stderr.write("Counting in cache is disabled: set COUNT_IN_CACHE = True in settings!")
+
+        counts = site_cache_middleware.get_global_counts()
+        self.stdout.write("\nPer-site cache middleware counts:\n")
+        for name, value in counts.items():
+            if value is None:
+                value = "-"
+            elif isinstance(value, float):
+                value = f"{value:.1%}"
+            self.stdout.write(f"\t{name:<20} {value}\n")
+
+        self.stdout.write(
+            f"\n(Counts of the last {site_cache_middleware.COUNT_FLUSH_INTERVAL} sec. may be missing)\n"
+        )
+
+        if options["reset"]:
+            site_cache_middleware.reset_cache_counting()
+            self.stdout.write("Counts reset.\n")
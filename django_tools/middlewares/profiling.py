@@ -0,0 +1,215 @@
+"""
+    Sampling profiling middleware
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Measure requests in production:
+
+    * every request is timed with time.perf_counter_ns() (slow requests are logged)
+    * every PROFILING_SAMPLE_RATE request runs under cProfile -> "*.prof" file
+    * requests slower than PROFILING_SLOW_THRESHOLD are sampled by a stack sampler
+      thread (started only if a request needs it) -> "*.stacks" file
+
+    The files are written into PROFILING_DIR, only the newest PROFILING_MAX_FILES are kept.
+    Aggregate them into hot-function tables with:
+
+        $ ./manage.py profiling_stats
+
+    Put this into your settings:
+
+        MIDDLEWARE = (
+            'django_tools.middlewares.profiling.ProfilingMiddleware',
+            ...
+        )
+
+    :copyleft: 2026 by the django-tools team, see AUTHORS for more details.
+    :license: GNU GPL v3 or above, see LICENSE for more details.
+"""
+
+import collections
+import cProfile
+import itertools
+import logging
+import os
+import re
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from django.conf import settings
+
+
+logger = logging.getLogger(__name__)
+
+
+# Profile one of N requests with cProfile (0 == disabled):
+PROFILING_SAMPLE_RATE = getattr(settings, 'PROFILING_SAMPLE_RATE', 1000)
+
+# Sample the stacks of requests that take longer than this seconds (None == disabled):
+PROFILING_SLOW_THRESHOLD = getattr(settings, 'PROFILING_SLOW_THRESHOLD', 1.0)
+
+# Seconds between two stack samples:
+PROFILING_SAMPLE_INTERVAL = getattr(settings, 'PROFILING_SAMPLE_INTERVAL', 0.005)
+
+PROFILING_DIR = getattr(settings, 'PROFILING_DIR', os.path.join(tempfile.gettempdir(), 'django_tools_profiling'))
+
+# Delete the oldest files, if there are more in PROFILING_DIR:
+PROFILING_MAX_FILES = getattr(settings, 'PROFILING_MAX_FILES', 200)
+
+PROFILE_SUFFIX = '.prof'
+STACKS_SUFFIX = '.stacks'
+
+
+def get_filename(path, suffix):
+    """
+    >>> get_filename('/foo/bar.html', '.prof').split('-', 2)[2]
+    'foo_bar.html.prof'
+    """
+    slug = re.sub(r'[^\w.-]+', '_', path).strip('_')[:60] or 'root'
+    return f'{time.time_ns()}-{os.getpid()}-{slug}{suffix}'
+
+
+def rotate_files(directory, max_files=None):
+    """
+    Delete the oldest profiling files, if there are more than max_files
+    """
+    if max_files is None:
+        max_files = PROFILING_MAX_FILES
+    files = sorted(
+        path for path in Path(directory).iterdir() if path.suffix in (PROFILE_SUFFIX, STACKS_SUFFIX)
+    )  # The names start with the time
+    for path in files[:-max_files]:
+        path.unlink(missing_ok=True)
+
+
+def format_stack(frame):
+    """
+    return the stack of the frame in the "collapsed" format: outermost;...;innermost
+    """
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f'{code.co_name} ({code.co_filename}:{code.co_firstlineno})')
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+class StackSampler:
+    """
+    One thread that samples the stacks of all slow requests of this process.
+    The thread stops, if no request was in flight for idle_timeout seconds.
+    """
+
+    idle_timeout = 1
+
+    def __init__(self, threshold_ns, interval):
+        self.threshold_ns = threshold_ns
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.requests = {}  # thread id -> [start time, Counter of collapsed stacks]
+        self.thread = None
+
+    def start_request(self, start_ns):
+        thread_id = threading.get_ident()
+        with self.lock:
+            self.requests[thread_id] = [start_ns, collections.Counter()]
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self._run, name='ProfilingMiddleware sampler', daemon=True)
+                self.thread.start()
+
+    def finish_request(self):
+        """
+        return the collected stack samples of the current request
+        """
+        with self.lock:
+            samples = self.requests.pop(threading.get_ident())[1]
+        return dict(samples)  # The sampler thread may still add a last sample
+
+    def sample(self):
+        """
+        Take one sample of all requests, that are running longer than the threshold.
+        """
+        now = time.perf_counter_ns()
+        with self.lock:
+            slow = [
+                (thread_id, samples)
+                for thread_id, (start_ns, samples) in self.requests.items()
+                if now - start_ns >= self.threshold_ns
+            ]
+        if not slow:
+            return
+
+        frames = sys._current_frames()
+        for thread_id, samples in slow:
+            frame = frames.get(thread_id)
+            if frame is not None:
+                samples[format_stack(frame)] += 1
+
+    def _run(self):
+        idle_since = None
+        while True:
+            with self.lock:
+                if self.requests:
+                    idle_since = None
+                elif idle_since is None:
+                    idle_since = time.monotonic()
+                elif time.monotonic() - idle_since > self.idle_timeout:
+                    self.thread = None
+                    return
+            self.sample()
+            time.sleep(self.interval)
+
+
+class ProfilingMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.counter = itertools.count(1)
+        self.directory = Path(PROFILING_DIR)
+
+        if PROFILING_SLOW_THRESHOLD is None:
+            self.threshold_ns = None
+            self.sampler = None
+        else:
+            self.threshold_ns = int(PROFILING_SLOW_THRESHOLD * 1_000_000_000)
+            self.sampler = StackSampler(self.threshold_ns, PROFILING_SAMPLE_INTERVAL)
+
+    def __call__(self, request):
+        profiler = None
+        if PROFILING_SAMPLE_RATE and next(self.counter) % PROFILING_SAMPLE_RATE == 0:
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+            except ValueError as err:  # e.g.: a other profiler is active
+                logger.warning(f'Can not profile {request.path!r}: {err}')
+                profiler = None
+
+        start_ns = time.perf_counter_ns()
+        if self.sampler is not None:
+            self.sampler.start_request(start_ns)
+        try:
+            return self.get_response(request)
+        finally:
+            duration_ns = time.perf_counter_ns() - start_ns
+            if profiler is not None:
+                profiler.disable()
+            samples = self.sampler.finish_request() if self.sampler is not None else None
+            self._finish(request, duration_ns, profiler, samples)
+
+    def _finish(self, request, duration_ns, profiler, samples):
+        slow = self.threshold_ns is not None and duration_ns >= self.threshold_ns
+        if slow:
+            logger.warning(f'Slow request {request.method} {request.path!r}: {duration_ns / 1_000_000:.1f} ms')
+        if profiler is None and not samples:
+            return
+
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            if profiler is not None:
+                profiler.dump_stats(self.directory / get_filename(request.path, PROFILE_SUFFIX))
+            if samples:
+                path = self.directory / get_filename(request.path, STACKS_SUFFIX)
+                path.write_text(''.join(f'{stack} {count}\n' for stack, count in samples.items()))
+            rotate_files(self.directory)
+        except OSError as err:
+            logger.error(f'Can not write profiling data into {self.directory}: {err}')
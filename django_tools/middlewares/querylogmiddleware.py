@@ -1,34 +1,151 @@
 """
-Print the query log to standard out.
+    Query log middleware
+    ~~~~~~~~~~~~~~~~~~~~
 
-Useful for optimizing database calls.
+    Aggregate the database queries of every request, also with DEBUG = False:
+    All queries of all databases are recorded via connection.execute_wrapper()
+    and grouped by their fingerprint (SQL with stripped literals).
 
-Inspired by the method at: <http://www.djangosnippets.org/snippets/344/>
+    A warning is logged (with the data in the "querylog" attribute of the log record)
+    only if the request exceeds one of the thresholds:
+
+        QUERYLOG_MAX_QUERIES - number of queries
+        QUERYLOG_MAX_TIME - seconds of all queries
+        QUERYLOG_MAX_REPEATS - the same statement is executed this often (a N+1 pattern)
+
+    Set QUERYLOG_HEADER to a header name (e.g. 'X-Query-Log') to add the numbers
+    also to these responses.
+
+    Queries of a streaming response content are not recorded.
+
+    Put this into your settings:
+
+        MIDDLEWARE = (
+            ...
+            'django_tools.middlewares.querylogmiddleware.QueryLogMiddleware',
+            ...
+        )
+
+    :copyleft: 2026 by the django-tools team, see AUTHORS for more details.
+    :license: GNU GPL v3 or above, see LICENSE for more details.
 """
-try:
-    from django.utils.deprecation import MiddlewareMixin
-except ImportError:
-    MiddlewareMixin = object  # fallback for Django < 1.10
-
-
-class QueryLogMiddleware(MiddlewareMixin):
-
-    def process_response(self, request, response):
-        from django.conf import settings
-        from django.db import connection
-
-        if settings.DEBUG:
-            queries = {}
-            for query in connection.queries:
-                sql = query["sql"]
-                queries.setdefault(sql, 0)
-                queries[sql] += 1
-            duplicates = sum(count - 1 for count in list(queries.values()))
-            print("------------------------------------------------------")
-            print(f"Total Queries:     {len(queries)}")
-            print(f"Duplicate Queries: {duplicates}")
-            print()
-            for query, count in list(queries.items()):
-                print(f"{count} x {query}")
-            print("------------------------------------------------------")
+
+import contextlib
+import logging
+import time
+
+from django.conf import settings
+from django.db import connections
+
+from django_tools.utils.sql import get_sql_fingerprint
+
+
+logger = logging.getLogger(__name__)
+
+
+# Thresholds (None == disabled):
+QUERYLOG_MAX_QUERIES = getattr(settings, 'QUERYLOG_MAX_QUERIES', 50)
+QUERYLOG_MAX_TIME = getattr(settings, 'QUERYLOG_MAX_TIME', 0.5)
+QUERYLOG_MAX_REPEATS = getattr(settings, 'QUERYLOG_MAX_REPEATS', 10)
+
+# Response header name for requests over a threshold (None == disabled):
+QUERYLOG_HEADER = getattr(settings, 'QUERYLOG_HEADER', None)
+
+# Number of the most repeated statements in the log:
+QUERYLOG_MAX_STATEMENTS = 5
+
+
+class QueryStats:
+    """
+    execute wrapper that counts and times all queries, grouped by fingerprint.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.duration_ns = 0
+        self.fingerprints = {}  # fingerprint -> [count, duration_ns]
+
+    def __call__(self, execute, sql, params, many, context):
+        start_ns = time.perf_counter_ns()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration_ns = time.perf_counter_ns() - start_ns
+            self.count += 1
+            self.duration_ns += duration_ns
+
+            fingerprint = get_sql_fingerprint(sql)
+            try:
+                entry = self.fingerprints[fingerprint]
+            except KeyError:
+                self.fingerprints[fingerprint] = [1, duration_ns]
+            else:
+                entry[0] += 1
+                entry[1] += duration_ns
+
+    def get_repeated(self, min_count=2):
+        """
+        return [(fingerprint, count, duration_ns), ...] of all statements that are
+        executed at least min_count times, the most repeated first.
+        """
+        repeated = [
+            (fingerprint, count, duration_ns)
+            for fingerprint, (count, duration_ns) in self.fingerprints.items()
+            if count >= min_count
+        ]
+        repeated.sort(key=lambda item: item[1], reverse=True)
+        return repeated
+
+
+def get_exceeded(stats):
+    """
+    return the names of the exceeded thresholds
+    """
+    exceeded = []
+    if QUERYLOG_MAX_QUERIES is not None and stats.count > QUERYLOG_MAX_QUERIES:
+        exceeded.append('queries')
+    if QUERYLOG_MAX_TIME is not None and stats.duration_ns > QUERYLOG_MAX_TIME * 1_000_000_000:
+        exceeded.append('time')
+    if QUERYLOG_MAX_REPEATS is not None and stats.get_repeated(min_count=QUERYLOG_MAX_REPEATS + 1):
+        exceeded.append('repeats')
+    return exceeded
+
+
+class QueryLogMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        stats = QueryStats()
+        with contextlib.ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(stats))
+            response = self.get_response(request)
+
+        exceeded = get_exceeded(stats)
+        if exceeded:
+            self.report(request, response, stats, exceeded)
         return response
+
+    def report(self, request, response, stats, exceeded):
+        time_ms = stats.duration_ns / 1_000_000
+        repeated = stats.get_repeated()
+        data = {
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'exceeded': exceeded,
+            'queries': stats.count,
+            'time_ms': round(time_ms, 3),
+            'repeated': [
+                {'sql': fingerprint, 'count': count, 'time_ms': round(duration_ns / 1_000_000, 3)}
+                for fingerprint, count, duration_ns in repeated[:QUERYLOG_MAX_STATEMENTS]
+            ],
+        }
+        logger.warning(
+            f'{request.method} {request.path!r} exceeds query thresholds ({", ".join(exceeded)}):'
+            f' {stats.count} queries in {time_ms:.1f} ms, {len(repeated)} repeated statements',
+            extra={'querylog': data},
+        )
+        if QUERYLOG_HEADER:
+            response[QUERYLOG_HEADER] = f'queries={stats.count}; time={time_ms:.1f}ms; repeated={len(repeated)}'
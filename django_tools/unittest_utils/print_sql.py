@@ -10,6 +10,8 @@ from django.db import DEFAULT_DB_ALIAS, connections
 from django.test.utils import CaptureQueriesContext
 from django.utils.encoding import smart_str
 
+from django_tools.utils.sql import get_sql_fingerprint
+
 
 PFORMAT_SQL_KEYWORDS = ("FROM", "WHERE", "ORDER BY", "VALUES")
 
@@ -75,3 +77,98 @@ class PrintQueries(CaptureQueriesContext):
             msg = smart_str(f"{no:d} - {sql}\n")
             print(msg)
         print("-" * 79)
+
+
+class AssertQueryBudget(PrintQueries):
+    """
+    with context manager that fails if the queries exceed a budget:
+
+        max_queries - number of queries
+        max_time - seconds of all queries
+        max_repeats - how often the same statement may be executed (use 1 to catch N+1 queries)
+
+    Statements are compared by their fingerprint (SQL without literals), so
+    e.g. "SELECT ... WHERE id = 1" and "SELECT ... WHERE id = 2" are repeated.
+    usage e.g.:
+    ---------------------------------------------------------------------------
+
+    from django_tools.unittest_utils.print_sql import AssertQueryBudget
+
+    class MyTests(TestCase):
+        def test_foobar(self):
+            with AssertQueryBudget("FooBar list view", max_queries=5, max_repeats=1):
+                self.client.get("/foobar/")
+
+    the AssertionError is like:
+    ___________________________________________________________________________
+     *** FooBar list view ***
+    Query budget exceeded: 12 queries (max: 5), a statement executed 10 times (max: 1)
+    10 x 0.004 sec.: SELECT ... FROM "foobar_item" WHERE "foobar_item"."id" = ? <-- repeated
+     1 x 0.001 sec.: SELECT ... FROM "foobar"
+     1 x 0.000 sec.: SELECT COUNT(*) AS "__count" FROM "foobar"
+    ---------------------------------------------------------------------------
+
+    Use verbose=True to print all queries, like PrintQueries.
+    """
+
+    def __init__(self, headline=None, max_queries=None, max_time=None, max_repeats=None, verbose=False, **kwargs):
+        self.max_queries = max_queries
+        self.max_time = max_time
+        self.max_repeats = max_repeats
+        self.verbose = verbose
+        super().__init__(headline, **kwargs)
+
+    def get_fingerprints(self):
+        """
+        return {fingerprint: [count, seconds], ...} of the captured queries, the most executed first.
+        """
+        fingerprints = {}
+        for query in self.captured_queries:
+            fingerprint = get_sql_fingerprint(query["sql"])
+            entry = fingerprints.setdefault(fingerprint, [0, 0.0])
+            entry[0] += 1
+            entry[1] += float(query["time"])
+        return dict(sorted(fingerprints.items(), key=lambda item: item[1][0], reverse=True))
+
+    def get_exceeded(self, fingerprints):
+        exceeded = []
+        count = len(self.captured_queries)
+        if self.max_queries is not None and count > self.max_queries:
+            exceeded.append(f"{count} queries (max: {self.max_queries})")
+
+        total_time = sum(seconds for _, seconds in fingerprints.values())
+        if self.max_time is not None and total_time > self.max_time:
+            exceeded.append(f"{total_time:.3f} sec. (max: {self.max_time})")
+
+        if self.max_repeats is not None:
+            repeats = max((count for count, _ in fingerprints.values()), default=0)
+            if repeats > self.max_repeats:
+                exceeded.append(f"a statement executed {repeats} times (max: {self.max_repeats})")
+        return exceeded
+
+    def get_report(self, exceeded, fingerprints):
+        lines = ["", "_" * 79]
+        if self.headline:
+            lines.append(f" *** {self.headline} ***")
+        lines.append(f"Query budget exceeded: {', '.join(exceeded)}")
+        width = len(str(max((count for count, _ in fingerprints.values()), default=0)))
+        for fingerprint, (count, seconds) in fingerprints.items():
+            line = f"{count:>{width}} x {seconds:.3f} sec.: {fingerprint}"
+            if count > 1:
+                line += " <-- repeated"
+            lines.append(line)
+        lines.append("-" * 79)
+        return "\n".join(lines)
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self.verbose:
+            super().__exit__(exc_type, exc_value, traceback)
+        else:
+            CaptureQueriesContext.__exit__(self, exc_type, exc_value, traceback)
+        if exc_type is not None:
+            return
+
+        fingerprints = self.get_fingerprints()
+        exceeded = self.get_exceeded(fingerprints)
+        if exceeded:
+            raise AssertionError(self.get_report(exceeded, fingerprints))
@@ -0,0 +1,44 @@
+"""
+    some utils around SQL
+    ~~~~~~~~~~~~~~~~~~~~~
+
+    :copyleft: 2026 by the django-tools team, see AUTHORS for more details.
+    :license: GNU GPL v3 or above, see LICENSE for more details.
+"""
+
+import functools
+import re
+
+
+STRING_LITERAL_RE = re.compile(r"'(?:[^']|'')*'")
+WHITESPACE_RE = re.compile(r'\s+')
+VALUE_RE = re.compile(
+    r'%\(\w+\)s'  # named placeholder
+    r'|%s'  # placeholder
+    r'|\$\d+'  # numbered placeholder
+    r'|\b\d+(?:\.\d+)?\b'  # number, but not digits in identifiers like "table1"
+)
+IN_LIST_RE = re.compile(r'\bIN \((?:\?, ?)*\?\)', re.IGNORECASE)
+VALUES_LIST_RE = re.compile(r'\bVALUES \((?:\?, ?)*\?\)(?:, ?\((?:\?, ?)*\?\))*', re.IGNORECASE)
+
+
+@functools.lru_cache(maxsize=1024)
+def get_sql_fingerprint(sql):
+    r"""
+    Normalize a SQL statement: All literals and placeholders are replaced with "?",
+    so all statements with the same "shape" have the same fingerprint.
+    IN (...) and VALUES (...) lists are collapsed, so their length doesn't matter.
+
+    >>> get_sql_fingerprint('SELECT "foo"."id" FROM "foo" WHERE "foo"."id" = %s')
+    'SELECT "foo"."id" FROM "foo" WHERE "foo"."id" = ?'
+    >>> get_sql_fingerprint("SELECT * FROM table1 WHERE name = 'it''s'\n  AND id IN (1, 2, 3) LIMIT 21")
+    'SELECT * FROM table1 WHERE name = ? AND id IN (...) LIMIT ?'
+    >>> get_sql_fingerprint('INSERT INTO "foo" ("a", "b") VALUES (%s, %s), (%s, %s) RETURNING "foo"."id"')
+    'INSERT INTO "foo" ("a", "b") VALUES (...) RETURNING "foo"."id"'
+    """
+    sql = STRING_LITERAL_RE.sub('?', sql)
+    sql = WHITESPACE_RE.sub(' ', sql).strip()
+    sql = VALUE_RE.sub('?', sql)
+    sql = IN_LIST_RE.sub('IN (...)', sql)
+    sql = VALUES_LIST_RE.sub('VALUES (...)', sql)
+    return sql
@@ -0,0 +1,10 @@
+"""
+    Benchmarks for django-tools
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Not part of the test suite. Run e.g.:
+
+        python -m django_tools_project.benchmarks.smooth_cache_envelope
+        python -m django_tools_project.benchmarks.caches --output results.json
+        python -m django_tools_project.benchmarks.caches --compare results.json
+"""
@@ -0,0 +1,270 @@
+"""
+    Benchmark the cache subsystems
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Measure the hot path of:
+
+    * SmoothLocMemCache, SmoothFileBasedCache and AutoUpdateFileBasedCache
+    * LocalSyncCache
+    * the per-site cache middleware
+
+    against the plain Django implementation as baseline.
+    Measured are: hit/miss latency, throughput with N threads and N processes
+    and the cost of smooth_update().
+
+    usage:
+
+        python -m django_tools_project.benchmarks.caches --output results.json
+        (change something)
+        python -m django_tools_project.benchmarks.caches --compare results.json
+
+    :copyleft: 2026 by the django-tools team, see AUTHORS for more details.
+    :license: GNU GPL v3 or above, see LICENSE for more details.
+"""
+
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import warnings
+from pathlib import Path
+from unittest import mock
+
+from django_tools_project.benchmarks.runner import (
+    compare_results,
+    format_result,
+    load_results,
+    measure_latency,
+    measure_processes,
+    measure_threads,
+    save_results,
+)
+
+
+# name -> (backend class path, file based?)
+CACHE_BACKENDS = {
+    'LocMemCache': ('django.core.cache.backends.locmem.LocMemCache', False),
+    'SmoothLocMemCache': ('django_tools.cache.smooth_cache_backends.SmoothLocMemCache', False),
+    'FileBasedCache': ('django.core.cache.backends.filebased.FileBasedCache', True),
+    'SmoothFileBasedCache': ('django_tools.cache.smooth_cache_backends.SmoothFileBasedCache', True),
+    'AutoUpdateFileBasedCache': ('django_tools.auto_update_cache.filebased.AutoUpdateFileBasedCache', True),
+}
+
+
+def setup_django():
+    import django
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'django_tools_project.settings.tests')
+    django.setup()
+
+    # Don't measure the log output:
+    logging.disable(logging.CRITICAL)
+
+
+def get_value():
+    return {f'key{no}': {'pk': no, 'title': f'Title {no}', 'url': f'/page/{no}/'} for no in range(20)}
+
+
+def create_cache(name, temp_dir):
+    from django.utils.module_loading import import_string
+
+    path, file_based = CACHE_BACKENDS[name]
+    location = str(Path(temp_dir, name)) if file_based else f'benchmark-{name}'
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', DeprecationWarning)  # AutoUpdateFileBasedCache
+        return import_string(path)(location, {})
+
+
+def process_worker(name, temp_dir, iterations):
+    """
+    Get one cache entry in a new process. Returns (ops, seconds) of the loop.
+    """
+    import time
+
+    setup_django()
+    cache = create_cache(name, temp_dir)
+    cache.set('hit', get_value())
+    cache.get('hit')  # Fetch the smooth change time
+
+    start_time = time.perf_counter()
+    for _ in range(iterations):
+        cache.get('hit')
+    return iterations, time.perf_counter() - start_time
+
+
+def benchmark_cache_backends(iterations, threads, processes, temp_dir):
+    results = {}
+    value = get_value()
+    for name in CACHE_BACKENDS:
+        cache = create_cache(name, temp_dir)
+        cache.clear()
+        cache.set('hit', value)
+        if cache.get('hit') != value:  # Also fetch the smooth change time
+            raise AssertionError(f'{name}: "get hit" would measure a cache miss!')
+
+        results[f'{name} get hit'] = measure_latency(lambda cache=cache: cache.get('hit'), iterations)
+        results[f'{name} get miss'] = measure_latency(lambda cache=cache: cache.get('miss'), iterations)
+        results[f'{name} set'] = measure_latency(lambda cache=cache: cache.set('set', value), iterations)
+
+        if hasattr(cache, 'smooth_update'):
+            results[f'{name} smooth_update'] = measure_latency(cache.smooth_update, iterations)
+        elif hasattr(cache, 'save_change_time'):
+            results[f'{name} save_change_time'] = measure_latency(cache.save_change_time, iterations)
+
+        if threads:
+            results[f'{name} get hit threads'] = measure_threads(
+                lambda cache=cache: cache.get('hit'), threads, iterations
+            )
+        if processes:
+            results[f'{name} get hit processes'] = measure_processes(
+                process_worker, (name, temp_dir, iterations), processes
+            )
+    return results
+
+
+def benchmark_local_sync_cache(iterations, threads):
+    from django_tools.local_sync_cache.local_sync_cache import LocalSyncCache
+
+    plain_dict = {'hit': get_value()}
+    local_sync_cache = LocalSyncCache(id='benchmark')
+    try:
+        local_sync_cache['hit'] = plain_dict['hit']
+
+        results = {
+            'dict get hit': measure_latency(lambda: plain_dict.get('hit'), iterations),
+            'LocalSyncCache get hit': measure_latency(lambda: local_sync_cache.get('hit'), iterations),
+            'LocalSyncCache check_state': measure_latency(local_sync_cache.check_state, iterations),
+            'LocalSyncCache check_all_states': measure_latency(LocalSyncCache.check_all_states, iterations),
+        }
+        if threads:
+            results['LocalSyncCache check_state threads'] = measure_threads(
+                local_sync_cache.check_state, threads, iterations
+            )
+        results['LocalSyncCache clear'] = measure_latency(local_sync_cache.clear, iterations)
+    finally:
+        local_sync_cache.unregister()
+    return results
+
+
+def benchmark_site_cache_middleware(iterations, threads):
+    from django.http import HttpResponse
+    from django.middleware import cache as django_cache_middleware
+    from django.middleware.gzip import GZipMiddleware
+    from django.test import RequestFactory
+
+    from django_tools.cache import site_cache_middleware
+
+    html = '<html><body>' + '<p>Lorem ipsum dolor sit amet.</p>' * 300 + '</body></html>'
+
+    def get_response(request):
+        return HttpResponse(html)
+
+    def get_request(path):
+        request = RequestFactory().get(path)
+        request.LANGUAGE_CODE = 'en'
+        return request
+
+    results = {}
+
+    # django-tools middleware:
+    fetch = site_cache_middleware.FetchFromCacheMiddleware()
+    update = site_cache_middleware.UpdateCacheMiddleware()
+    hit_request = get_request('/django-tools/hit/')
+    update.process_response(hit_request, get_response(hit_request))
+    miss_request = get_request('/django-tools/miss/')
+    not_modified_request = get_request('/django-tools/hit/')
+    not_modified_request.META['HTTP_IF_NONE_MATCH'] = fetch.process_request(hit_request)['ETag']
+    results['site cache middleware hit'] = measure_latency(lambda: fetch.process_request(hit_request), iterations)
+    results['site cache middleware miss'] = measure_latency(lambda: fetch.process_request(miss_request), iterations)
+    results['site cache middleware not modified'] = measure_latency(
+        lambda: fetch.process_request(not_modified_request), iterations
+    )
+    if threads:
+        results['site cache middleware hit threads'] = measure_threads(
+            lambda: fetch.process_request(hit_request), threads, iterations
+        )
+
+    # Pre-compressed content vs. GZipMiddleware on every hit:
+    gzip_request = get_request('/django-tools/gzip/')
+    gzip_request.META['HTTP_ACCEPT_ENCODING'] = 'gzip, deflate'
+    with mock.patch.object(site_cache_middleware, 'CACHE_MIDDLEWARE_COMPRESSION', ('gzip',)):
+        update.process_response(gzip_request, get_response(gzip_request))
+    results['site cache middleware compressed hit'] = measure_latency(
+        lambda: fetch.process_request(gzip_request), iterations
+    )
+    gzip_middleware = GZipMiddleware(get_response)
+    results['site cache middleware hit + GZipMiddleware'] = measure_latency(
+        lambda: gzip_middleware.process_response(gzip_request, fetch.process_request(hit_request)), iterations
+    )
+
+    # Django middleware as baseline:
+    fetch = django_cache_middleware.FetchFromCacheMiddleware(get_response)
+    update = django_cache_middleware.UpdateCacheMiddleware(get_response)
+    hit_request = get_request('/django/hit/')
+    fetch.process_request(hit_request)
+    update.process_response(hit_request, get_response(hit_request))
+    miss_request = get_request('/django/miss/')
+    results['django cache middleware hit'] = measure_latency(lambda: fetch.process_request(hit_request), iterations)
+    results['django cache middleware miss'] = measure_latency(lambda: fetch.process_request(miss_request), iterations)
+    if threads:
+        results['django cache middleware hit threads'] = measure_threads(
+            lambda: fetch.process_request(hit_request), threads, iterations
+        )
+    return results
+
+
+def run_benchmarks(iterations=1000, threads=4, processes=4):
+    with tempfile.TemporaryDirectory(prefix='django_tools_benchmark_') as temp_dir:
+        results = benchmark_cache_backends(iterations, threads, processes, temp_dir)
+    results.update(benchmark_local_sync_cache(iterations, threads))
+    results.update(benchmark_site_cache_middleware(iterations, threads))
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the django-tools cache subsystems')
+    parser.add_argument('--iterations', type=int, default=1000, help='Calls per measurement (default: %(default)s)')
+    parser.add_argument('--threads', type=int, default=4, help='Number of threads, 0 to skip (default: %(default)s)')
+    parser.add_argument(
+        '--processes', type=int, default=4, help='Number of processes, 0 to skip (default: %(default)s)'
+    )
+    parser.add_argument('--output', help='Store the results into this JSON file')
+    parser.add_argument('--compare', help='Compare with the results from this JSON file')
+    parser.add_argument(
+        '--threshold',
+        type=float,
+        default=0.1,
+        help='Mark changes above this ratio as regression (default: %(default)s)',
+    )
+    args = parser.parse_args(argv)
+
+    setup_django()
+    results = run_benchmarks(args.iterations, args.threads, args.processes)
+
+    for name, result in results.items():
+        print(f'{name:<50} {format_result(result)}')
+
+    if args.output:
+        save_results(results, args.output)
+        print(f'\nResults saved to: {args.output}')
+
+    if args.compare:
+        print(f'\nCompare with: {args.compare}')
+        regressions = 0
+        for name, metric, old_value, new_value, change, regression in compare_results(
+            load_results(args.compare), results, args.threshold
+        ):
+            marker = ' <<< regression' if regression else ''
+            if change is None:  # No relative change to a zero baseline
+                change_info = f'{new_value - old_value:>+8.0f}'
+            else:
+                change_info = f'{change:>+8.1%}'
+            print(f'{name:<50} {metric:<12} {old_value:>14.0f} -> {new_value:>14.0f} {change_info}{marker}')
+            regressions += regression
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,166 @@
+"""
+    Benchmark runner
+    ~~~~~~~~~~~~~~~~
+
+    Small helpers to measure the latency of single calls and the throughput
+    with N threads/processes. The results are plain dicts, so they can be
+    stored as JSON and compared with the results of a other commit.
+
+    :copyleft: 2026 by the django-tools team, see AUTHORS for more details.
+    :license: GNU GPL v3 or above, see LICENSE for more details.
+"""
+
+import json
+import multiprocessing
+import os
+import platform
+import statistics
+import subprocess
+import threading
+import time
+import timeit
+from pathlib import Path
+
+
+def get_environment():
+    """
+    Information about the current environment, to know if two results are comparable.
+    """
+    import django
+
+    try:
+        commit = subprocess.check_output(
+            ['git', 'rev-parse', 'HEAD'], cwd=Path(__file__).parent, stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+
+    return {
+        'commit': commit,
+        'python': f'{platform.python_implementation()} {platform.python_version()}',
+        'django': django.get_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+    }
+
+
+def measure_latency(func, iterations, repeat=5):
+    """
+    Call func() iterations x repeat times and return the time per call in nanoseconds.
+
+    >>> result = measure_latency(lambda: None, iterations=10, repeat=2)
+    >>> sorted(result)
+    ['best_ns', 'iterations', 'median_ns']
+    """
+    timings = timeit.repeat(func, number=iterations, repeat=repeat)
+    return {
+        'iterations': iterations * repeat,
+        'best_ns': min(timings) / iterations * 1_000_000_000,
+        'median_ns': statistics.median(timings) / iterations * 1_000_000_000,
+    }
+
+
+def measure_threads(func, threads, iterations):
+    """
+    Call func() in N threads, iterations times per thread, and return the throughput.
+    """
+    barrier = threading.Barrier(threads + 1)
+
+    def worker():
+        barrier.wait()
+        for _ in range(iterations):
+            func()
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    for thread in workers:
+        thread.start()
+
+    barrier.wait()
+    start_time = time.perf_counter()
+    for thread in workers:
+        thread.join()
+    duration = time.perf_counter() - start_time
+
+    ops = threads * iterations
+    return {
+        'threads': threads,
+        'ops': ops,
+        'seconds': duration,
+        'ops_per_sec': ops / duration,
+    }
+
+
+def measure_processes(worker, args, processes):
+    """
+    Call worker(*args) in N new processes. The worker must be a module level function
+    that returns (ops, seconds) of its own loop, so the process start is not measured.
+    """
+    context = multiprocessing.get_context('spawn')
+    with context.Pool(processes) as pool:
+        results = pool.starmap(worker, [args] * processes)
+
+    ops = sum(ops for ops, _ in results)
+    return {
+        'processes': processes,
+        'ops': ops,
+        'seconds': max(seconds for _, seconds in results),
+        'ops_per_sec': sum(ops / seconds for ops, seconds in results),
+    }
+
+
+def save_results(results, path):
+    data = {'environment': get_environment(), 'results': results}
+    Path(path).write_text(json.dumps(data, indent=4, sort_keys=True))
+
+
+def load_results(path):
+    return json.loads(Path(path).read_text())['results']
+
+
+def compare_results(old, new, threshold=0.1):
+    """
+    Compare two results and return a list of (name, metric, old value, new value, change, regression)
+    Latency: higher is worse; Throughput: lower is worse.
+    change is relative to the old value, or None if the old value is 0: Then every
+    change in the worse direction is a regression.
+
+    >>> old = {'get': {'median_ns': 100}, 'threads': {'ops_per_sec': 1000}, 'set': {'median_ns': 0}}
+    >>> new = {'get': {'median_ns': 150}, 'threads': {'ops_per_sec': 1050}, 'set': {'median_ns': 20}}
+    >>> for line in compare_results(old, new): print(line)
+    ('get', 'median_ns', 100, 150, 0.5, True)
+    ('threads', 'ops_per_sec', 1000, 1050, 0.05, False)
+    ('set', 'median_ns', 0, 20, None, True)
+    """
+    comparison = []
+    for name, new_result in new.items():
+        try:
+            old_result = old[name]
+        except KeyError:
+            continue
+
+        if 'median_ns' in new_result:
+            metric, higher_is_worse = 'median_ns', True
+        else:
+            metric, higher_is_worse = 'ops_per_sec', False
+
+        old_value = old_result[metric]
+        new_value = new_result[metric]
+        if old_value == 0:
+            change = None
+            regression = new_value > old_value if higher_is_worse else new_value < old_value
+        else:
+            change = round((new_value - old_value) / old_value, 4)
+            if higher_is_worse:
+                regression = change > threshold
+            else:
+                regression = change < -threshold
+        comparison.append((name, metric, old_value, new_value, change, regression))
+    return comparison
+
+
+def format_result(result):
+    if 'median_ns' in result:
+        return f'{result["median_ns"]:>12.0f} ns/call (best: {result["best_ns"]:.0f} ns)'
+    if 'threads' in result:
+        return f'{result["ops_per_sec"]:>12.0f} ops/sec ({result["threads"]} threads)'
+    return f'{result["ops_per_sec"]:>12.0f} ops/sec ({result["processes"]} processes)'
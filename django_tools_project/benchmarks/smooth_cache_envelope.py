@@ -0,0 +1,84 @@
+"""
+    Benchmark the smooth cache entry formats
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Compare the serialized size and the (de)serialization time of the
+    binary envelope against the old (SmoothCacheTime, value) tuple.
+
+    The cache backends pickle the entry again, so both formats are
+    measured as "pickle.dumps(entry)" / "pickle.loads(data)".
+
+    usage:
+
+        python -m django_tools_project.benchmarks.smooth_cache_envelope
+
+    :copyleft: 2026 by the django-tools team, see AUTHORS for more details.
+    :license: GNU GPL v3 or above, see LICENSE for more details.
+"""
+
+import os
+import pickle
+import timeit
+
+
+def get_typical_values():
+    from django.http import HttpResponse
+
+    html = '<html><body>' + '<p>Lorem ipsum dolor sit amet.</p>' * 300 + '</body></html>'
+    response = HttpResponse(content=html, content_type='text/html; charset=utf-8')
+    response['Content-Language'] = 'en'
+    return {
+        'short string': 'foo bar',
+        'int': 42,
+        'dict': {f'key{no}': {'pk': no, 'title': f'Title {no}', 'url': f'/page/{no}/'} for no in range(20)},
+        'HttpResponse': response,
+    }
+
+
+def benchmark_envelope(iterations=10_000):
+    from django_tools.cache.smooth_cache_backends import SmoothCacheTime, pack_entry, unpack_entry
+
+    def tuple_roundtrip(value):
+        return pickle.loads(pickle.dumps((SmoothCacheTime(), value), pickle.HIGHEST_PROTOCOL))[1]
+
+    def envelope_roundtrip(value):
+        return unpack_entry(pickle.loads(pickle.dumps(pack_entry(value), pickle.HIGHEST_PROTOCOL)))[1]
+
+    results = []
+    for name, value in get_typical_values().items():
+        tuple_data = pickle.dumps((SmoothCacheTime(), value), pickle.HIGHEST_PROTOCOL)
+        envelope_data = pickle.dumps(pack_entry(value), pickle.HIGHEST_PROTOCOL)
+
+        tuple_time = timeit.timeit(lambda value=value: tuple_roundtrip(value), number=iterations)
+        envelope_time = timeit.timeit(lambda value=value: envelope_roundtrip(value), number=iterations)
+        results.append(
+            {
+                'name': name,
+                'tuple size': len(tuple_data),
+                'envelope size': len(envelope_data),
+                'tuple time': tuple_time / iterations,
+                'envelope time': envelope_time / iterations,
+            }
+        )
+    return results
+
+
+def main():
+    import django
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'django_tools_project.settings.tests')
+    django.setup()
+
+    print(f'{"value":<15} {"tuple size":>11} {"envelope size":>14} {"tuple µs":>10} {"envelope µs":>12}')
+    for result in benchmark_envelope():
+        print(
+            f'{result["name"]:<15}'
+            f' {result["tuple size"]:>11}'
+            f' {result["envelope size"]:>14}'
+            f' {result["tuple time"] * 1_000_000:>10.2f}'
+            f' {result["envelope time"] * 1_000_000:>12.2f}'
+        )
+
+
+if __name__ == '__main__':
+    main()
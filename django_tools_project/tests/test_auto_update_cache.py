@@ -0,0 +1,42 @@
+"""
+    Test the AutoUpdateFileBasedCache
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    :copyleft: 2026 by the django-tools team, see AUTHORS for more details.
+    :license: GNU GPL v3 or above, see LICENSE for more details.
+"""
+
+import tempfile
+
+from django.core.cache.backends.filebased import FileBasedCache
+from django.test import SimpleTestCase
+
+from django_tools.auto_update_cache.filebased import AutoUpdateFileBasedCache
+
+
+class AutoUpdateFileBasedCacheTestCase(SimpleTestCase):
+    def setUp(self):
+        super().setUp()
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        with self.assertWarns(DeprecationWarning):
+            self.cache = AutoUpdateFileBasedCache(temp_dir.name, {'KEY_PREFIX': 'prefix'})
+
+    def test_get_set(self):
+        self.cache.set('foo', {'bar': 1})
+        self.assertEqual(self.cache.get('foo'), {'bar': 1})
+        self.assertEqual(self.cache.get('foo', version=2), None)
+
+        self.cache.set('foo', 'two', version=2)
+        self.assertEqual(self.cache.get('foo', version=2), 'two')
+        self.assertEqual(self.cache.get('missing', 'default'), 'default')
+
+    def test_read_django_entries(self):
+        # Same file format as the django FileBasedCache (zlib compressed pickle):
+        django_cache = FileBasedCache(self.cache._dir, {'KEY_PREFIX': 'prefix'})
+        django_cache.set('foo', 'bar')
+        self.assertEqual(self.cache.get('foo'), 'bar')
+
+    def test_without_timeout(self):
+        self.cache.set('foo', 'bar', timeout=None)
+        self.assertEqual(self.cache.get('foo'), 'bar')
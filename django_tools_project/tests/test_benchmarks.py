@@ -0,0 +1,41 @@
+"""
+    Test the benchmarks
+    ~~~~~~~~~~~~~~~~~~~
+
+    :copyleft: 2026 by the django-tools team, see AUTHORS for more details.
+    :license: GNU GPL v3 or above, see LICENSE for more details.
+"""
+
+import json
+import tempfile
+from pathlib import Path
+
+from django.test import SimpleTestCase
+
+from django_tools_project.benchmarks.caches import run_benchmarks
+from django_tools_project.benchmarks.runner import compare_results, load_results, save_results
+
+
+class CacheBenchmarksTestCase(SimpleTestCase):
+    def test_run_benchmarks(self):
+        results = run_benchmarks(iterations=1, threads=2, processes=0)
+        self.assertIn('SmoothLocMemCache get hit', results)
+        self.assertIn('AutoUpdateFileBasedCache save_change_time', results)
+        self.assertIn('LocalSyncCache check_state', results)
+        self.assertIn('site cache middleware hit threads', results)
+        self.assertIn('site cache middleware compressed hit', results)
+        self.assertIn('site cache middleware not modified', results)
+        self.assertEqual(results['LocMemCache get hit threads']['ops'], 2)
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = Path(temp_dir, 'results.json')
+            save_results(results, path)
+            data = json.loads(path.read_text())
+            self.assertEqual(sorted(data), ['environment', 'results'])
+            self.assertIn('django', data['environment'])
+
+            old_results = load_results(path)
+
+        comparison = compare_results(old_results, results)
+        self.assertEqual(len(comparison), len(results))
+        self.assertEqual({change for _, _, _, _, change, _ in comparison}, {0})
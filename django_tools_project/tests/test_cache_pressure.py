@@ -0,0 +1,131 @@
+"""
+    Test the pressure provider of the smooth cache backends
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    :copyleft: 2026 by the django-tools team, see AUTHORS for more details.
+    :license: GNU GPL v3 or above, see LICENSE for more details.
+"""
+
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase
+
+from django_tools.auto_update_cache import filebased
+from django_tools.cache import pressure, smooth_cache_backends
+from django_tools.cache.pressure import (
+    CgroupPressureProvider,
+    InFlightRequestsProvider,
+    PressureMiddleware,
+    PressureProvider,
+    RequestStats,
+    ResponseTimeP95Provider,
+    get_pressure_provider,
+)
+from django_tools.cache.smooth_cache_backends import SmoothCacheEngine, SmoothLocMemCache
+
+
+class FixedPressureProvider(PressureProvider):
+    pressure_value = 1.25
+
+    def measure(self):
+        return self.pressure_value
+
+
+class PressureTestCase(SimpleTestCase):
+    def setUp(self):
+        super().setUp()
+        pressure._PROVIDERS.clear()
+
+    def tearDown(self):
+        pressure._PROVIDERS.clear()
+        super().tearDown()
+
+
+class PressureProviderTestCase(PressureTestCase):
+    def test_sample_once_per_interval(self):
+        provider = FixedPressureProvider()
+        with mock.patch('time.monotonic', return_value=100), \
+                mock.patch.object(provider, 'measure', return_value=0.5) as measure:
+            self.assertEqual(provider.get_pressure(), 0.5)
+            self.assertEqual(provider.get_pressure(), 0.5)
+            self.assertEqual(measure.call_count, 1)
+
+        with mock.patch('time.monotonic', return_value=100 + provider.interval), \
+                mock.patch.object(provider, 'measure', return_value=2.0) as measure:
+            self.assertEqual(provider.get_pressure(), 2.0)
+            self.assertEqual(measure.call_count, 1)
+
+    def test_shared_provider(self):
+        path = 'django_tools_project.tests.test_cache_pressure.FixedPressureProvider'
+        provider = get_pressure_provider(path)
+        self.assertIsInstance(provider, FixedPressureProvider)
+        self.assertIs(get_pressure_provider(path), provider)
+
+    def test_cgroup_pressure(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = Path(temp_dir, 'cpu.pressure')
+            path.write_text(
+                'some avg10=50.00 avg60=10.00 avg300=1.00 total=123456\n'
+                'full avg10=25.00 avg60=5.00 avg300=0.50 total=654321\n'
+            )
+            provider = CgroupPressureProvider()
+            provider.path = path
+            self.assertEqual(provider.measure(), 2.0)
+
+            # Fallback to the load average:
+            provider.path = Path(temp_dir, 'missing')
+            with self.assertLogs('django_tools.cache.pressure', level='WARNING') as logs, \
+                    mock.patch('os.getloadavg', return_value=(0.75, 0, 0)):
+                self.assertEqual(provider.measure(), 0.75)
+                self.assertEqual(provider.measure(), 0.75)
+            self.assertEqual(len(logs.output), 1)
+
+    def test_request_providers(self):
+        request_stats = RequestStats(window=20)
+        in_flight = []
+
+        def get_response(request):
+            in_flight.append(InFlightRequestsProvider().measure())
+            return HttpResponse()
+
+        middleware = PressureMiddleware(get_response)
+        request = RequestFactory().get('/')
+        with mock.patch.object(pressure, 'request_stats', request_stats):
+            for no in range(20):
+                with mock.patch('time.perf_counter', side_effect=(0, no / 10)):
+                    middleware(request)
+
+            self.assertEqual(in_flight, [0.25] * 20)
+            self.assertEqual(request_stats.in_flight, 0)
+            self.assertEqual(InFlightRequestsProvider().measure(), 0)
+            self.assertEqual(ResponseTimeP95Provider().measure(), 1.8)
+
+
+class PressureCachesTestCase(PressureTestCase):
+    def test_smooth_cache_engine(self):
+        engine = SmoothCacheEngine(pressure_provider=FixedPressureProvider())
+        cache = SmoothLocMemCache('test-pressure', {})
+        cache.smooth_engine = engine
+        engine.tick(cache)
+        self.assertEqual(engine.load_average, 1.25)
+        self.assertEqual(engine.max_age, 60)
+
+    def test_smooth_cache_setting(self):
+        path = 'django_tools_project.tests.test_cache_pressure.FixedPressureProvider'
+        with mock.patch.object(smooth_cache_backends, 'SMOOTH_CACHE_PRESSURE_PROVIDER', path):
+            engine = SmoothCacheEngine()
+        self.assertIsInstance(engine.pressure_provider, FixedPressureProvider)
+
+    def test_auto_update_cache(self):
+        path = 'django_tools_project.tests.test_cache_pressure.FixedPressureProvider'
+        with tempfile.TemporaryDirectory() as temp_dir, \
+                mock.patch.object(filebased, 'AUTOUPDATECACHE_PRESSURE_PROVIDER', path):
+            with self.assertWarns(DeprecationWarning):
+                cache = filebased.AutoUpdateFileBasedCache(temp_dir, {})
+            with mock.patch('time.time', return_value=1000):
+                cache.save_change_time()
+                self.assertIs(cache.must_updated('foo', create_time=1000 - 59), False)  # max age: 60
+                self.assertIs(cache.must_updated('foo', create_time=1000 - 61), True)
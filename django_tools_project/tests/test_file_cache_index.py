@@ -0,0 +1,259 @@
+"""
+    Test the mmap index of the file based caches
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    :copyleft: 2026 by the django-tools team, see AUTHORS for more details.
+    :license: GNU GPL v3 or above, see LICENSE for more details.
+"""
+
+import math
+import os
+import tempfile
+import time
+from hashlib import md5
+from pathlib import Path
+from unittest import mock
+
+from django.core.cache.backends.filebased import FileBasedCache
+from django.test import SimpleTestCase
+
+from django_tools.auto_update_cache.filebased import AutoUpdateFileBasedCache
+from django_tools.cache import file_index, pressure, smooth_cache_backends
+from django_tools.cache.file_index import _VERSION, INDEX_FILENAME, FileCacheIndex, IndexMismatchError
+from django_tools.cache.smooth_cache_backends import SmoothFileBasedCache
+
+
+def get_digest(no):
+    return md5(str(no).encode()).digest()
+
+
+class FileCacheIndexTestCase(SimpleTestCase):
+    def setUp(self):
+        super().setUp()
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.temp_dir.name, INDEX_FILENAME)
+        self.index = FileCacheIndex(self.path, slot_count=64)
+
+    def tearDown(self):
+        self.index.close()
+        self.temp_dir.cleanup()
+        super().tearDown()
+
+    def test_store_lookup_remove(self):
+        self.assertIs(self.index.created, True)
+        self.assertIsNone(self.index.lookup(get_digest(1)))
+
+        self.index.store(get_digest(1), expiry=math.inf, mtime=100.5, size=123)
+        self.index.store(get_digest(2), expiry=200.0, mtime=101.5, size=456)
+        self.assertEqual(len(self.index), 2)
+
+        entry = self.index.lookup(get_digest(1))
+        self.assertEqual((entry.expiry, entry.mtime, entry.size), (math.inf, 100.5, 123))
+
+        # Overwrite a existing entry:
+        self.index.store(get_digest(2), expiry=300.0, mtime=102.5, size=789)
+        self.assertEqual(len(self.index), 2)
+        entry = self.index.lookup(get_digest(2))
+        self.assertEqual((entry.expiry, entry.mtime, entry.size), (300.0, 102.5, 789))
+
+        self.index.remove(get_digest(1))
+        self.assertIsNone(self.index.lookup(get_digest(1)))
+        self.assertEqual(len(self.index), 1)
+
+        # Shared with other processes via the file:
+        other_index = FileCacheIndex(self.path, slot_count=64)
+        try:
+            self.assertIs(other_index.created, False)
+            self.assertEqual(len(other_index), 1)
+            self.assertEqual(other_index.lookup(get_digest(2)).size, 789)
+        finally:
+            other_index.close()
+
+        # Never resized/reinitialized, if the slot count is different (other processes may have it mapped):
+        size = os.path.getsize(self.path)
+        with self.assertRaisesMessage(IndexMismatchError, f'{size} bytes, but '):
+            FileCacheIndex(self.path, slot_count=128)
+        self.assertEqual(os.path.getsize(self.path), size)
+        self.assertEqual(self.index.lookup(get_digest(2)).size, 789)
+
+    def test_header_mismatch(self):
+        self.index.store(get_digest(1), expiry=math.inf, mtime=1, size=1)
+        self.index.mmap[4:6] = (_VERSION + 1).to_bytes(2, 'little')  # e.g.: created by a other django-tools version
+        with self.assertRaisesMessage(IndexMismatchError, f'version {_VERSION + 1} with 64 slots'):
+            FileCacheIndex(self.path, slot_count=64)
+        self.assertEqual(self.index.lookup(get_digest(1)).size, 1)
+
+    def test_rebuild_deleted_slots(self):
+        for round_no in range(10):
+            for no in range(40):
+                self.index.store(get_digest(f'{round_no}-{no}'), expiry=math.inf, mtime=1, size=1)
+            for no in range(40):
+                self.index.remove(get_digest(f'{round_no}-{no}'))
+        self.assertEqual(len(self.index), 0)
+
+        used, deleted = self.index._get_counts()
+        self.assertLessEqual(used + deleted, 64 * 0.75)
+
+    def test_cull(self):
+        digests = {get_digest(no) for no in range(40)}
+        for digest in digests:
+            self.index.store(digest, expiry=math.inf, mtime=1, size=1)
+
+        culled = self.index.cull(10)
+        self.assertEqual(len(culled), 10)
+        self.assertLessEqual(set(culled), digests)
+        self.assertEqual(len(self.index), 30)
+        for digest in culled:
+            self.assertIsNone(self.index.lookup(digest))
+
+        self.assertEqual(len(self.index.cull(100)), 30)
+        self.assertEqual(len(self.index), 0)
+
+    def test_cull_with_wrong_used_count(self):
+        for no in range(5):
+            self.index.store(get_digest(no), expiry=math.inf, mtime=1, size=1)
+        self.index._set_counts(10, 0)  # e.g.: a writer crashed between the count and the slot update
+
+        with self.assertLogs('django_tools.cache.file_index', level='WARNING') as logs:
+            self.assertEqual(len(self.index.cull(100)), 5)
+        self.assertIn('Used count 5 of ', logs.output[0])
+        self.assertEqual(self.index._get_counts(), (0, 5))
+
+
+class IndexedCacheTestCase(SimpleTestCase):
+    def setUp(self):
+        super().setUp()
+        smooth_cache_backends._ENGINES.clear()
+        pressure._PROVIDERS.clear()
+        self.temp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        for index in file_index._INDEXES.values():
+            if index is not None:
+                index.close()
+        file_index._INDEXES.clear()
+        smooth_cache_backends._ENGINES.clear()
+        pressure._PROVIDERS.clear()
+        self.temp_dir.cleanup()
+        super().tearDown()
+
+    def get_params(self, **options):
+        return {'OPTIONS': {'MMAP_INDEX': True, **options}}
+
+    def test_index_maintained(self):
+        cache = SmoothFileBasedCache(self.temp_dir.name, self.get_params())
+        cache.set('foo', 'bar', timeout=None)
+        cache.set('timeout', 'value', timeout=60)
+
+        index = cache.file_index
+        self.assertTrue(Path(self.temp_dir.name, INDEX_FILENAME).is_file())
+        self.assertEqual(len(index), 2)
+        fname = cache._key_to_file('foo')
+        entry = cache._index_lookup(fname)
+        self.assertEqual(entry.expiry, math.inf)
+        self.assertEqual(entry.size, os.path.getsize(fname))
+        self.assertAlmostEqual(cache._index_lookup(cache._key_to_file('timeout')).expiry, time.time() + 60, delta=5)
+
+        self.assertIs(cache.touch('foo', timeout=30), True)
+        self.assertAlmostEqual(cache._index_lookup(fname).expiry, time.time() + 30, delta=5)
+
+        cache.delete('foo')
+        self.assertIsNone(cache._index_lookup(fname))
+        self.assertEqual(len(index), 1)
+
+        cache.clear()
+        self.assertEqual(len(index), 1)  # The new smooth change time
+
+    def test_fill_existing_cache(self):
+        cache = FileBasedCache(self.temp_dir.name, {})
+        for no in range(10):
+            cache.set(f'key{no}', no)
+
+        with self.assertWarns(DeprecationWarning):
+            cache = AutoUpdateFileBasedCache(self.temp_dir.name, self.get_params())
+        with self.assertLogs('django_tools.cache.file_index', level='INFO') as logs:
+            self.assertEqual(len(cache.file_index), 10)
+        self.assertEqual(
+            logs.output[0].split(':', 2)[2], f'Cache index {cache.file_index.path} created with 10 entries'
+        )
+        self.assertEqual(cache.get('key5'), 5)
+
+    def test_expired_without_open(self):
+        cache = SmoothFileBasedCache(self.temp_dir.name, self.get_params())
+        cache.set('foo', 'bar', timeout=60)
+        cache.set('bar', 'foo', timeout=60)
+        self.assertEqual(cache.get('foo'), 'bar')  # Fetch the smooth change time
+
+        with mock.patch('time.time', return_value=time.time() + 61), \
+                mock.patch('builtins.open', side_effect=AssertionError('Must not open the file')):
+            self.assertIsNone(cache.get('foo'))
+            self.assertIs(cache.has_key('bar'), False)
+        for key in ('foo', 'bar'):
+            fname = cache._key_to_file(key)
+            self.assertFalse(os.path.exists(fname))
+            self.assertIsNone(cache._index_lookup(fname))
+
+    def test_smooth_outdated_without_open(self):
+        cache = SmoothFileBasedCache(self.temp_dir.name, self.get_params())
+        cache.set('foo', 'bar')
+        self.assertEqual(cache.get('foo'), 'bar')
+
+        cache.smooth_engine.outdated_until = time.time() + 1
+        with mock.patch('builtins.open', side_effect=AssertionError('Must not open the file')):
+            self.assertIsNone(cache.get('foo'))
+        self.assertEqual(cache.smooth_engine.load_evictions, 1)
+        self.assertIsNone(cache._index_lookup(cache._key_to_file('foo')))
+
+    def test_auto_update_outdated_without_open(self):
+        with self.assertWarns(DeprecationWarning):
+            cache = AutoUpdateFileBasedCache(self.temp_dir.name, self.get_params())
+        cache.set('foo', 'bar')
+        fname = cache._key_to_file('foo')
+
+        with mock.patch.object(cache, 'must_updated', return_value=True), \
+                mock.patch('builtins.open', side_effect=AssertionError('Must not open the file')):
+            self.assertIsNone(cache.get('foo'))
+        self.assertFalse(os.path.exists(fname))
+
+    def test_cull_without_listing(self):
+        cache = SmoothFileBasedCache(self.temp_dir.name, self.get_params(MAX_ENTRIES=20, CULL_FREQUENCY=4))
+        self.assertEqual(len(cache.file_index), 0)  # Create the index: needs one directory listing
+        with mock.patch.object(FileBasedCache, '_list_cache_files') as list_cache_files:
+            for no in range(30):
+                cache.set(f'key{no}', no)
+        list_cache_files.assert_not_called()
+
+        files = list(Path(self.temp_dir.name).glob(f'*{cache.cache_suffix}'))
+        self.assertEqual(len(files), len(cache.file_index))
+        self.assertLessEqual(len(files), 20)
+        for path in files:
+            self.assertIsNotNone(cache._index_lookup(str(path)))
+
+    def test_index_with_other_settings(self):
+        cache = SmoothFileBasedCache(self.temp_dir.name, self.get_params(MAX_ENTRIES=20))
+        cache.set('foo', 'bar')
+        index = cache.file_index
+        size = os.path.getsize(index.path)
+
+        # e.g.: a other process with a bigger MAX_ENTRIES uses the same directory:
+        file_index._INDEXES.clear()
+        other_cache = SmoothFileBasedCache(self.temp_dir.name, self.get_params(MAX_ENTRIES=1000))
+        try:
+            with self.assertLogs('django_tools.cache.file_index', level='WARNING') as logs:
+                self.assertIsNone(other_cache.file_index)
+            self.assertIn(f'Cache index not used: {index.path} has {size} bytes', logs.output[0])
+
+            # The index of the first process is untouched:
+            self.assertEqual(os.path.getsize(index.path), size)
+            self.assertIsNotNone(index.lookup(cache._file_to_digest(cache._key_to_file('foo'))))
+            self.assertEqual(len(index), 1)
+        finally:
+            index.close()
+
+        # Works without the index and culls via directory listing:
+        self.assertEqual(other_cache.get('foo'), 'bar')
+        with mock.patch.object(other_cache, '_max_entries', 1), \
+                mock.patch.object(FileBasedCache, '_list_cache_files', return_value=[]) as list_cache_files:
+            other_cache.set('bar', 'foo')
+        list_cache_files.assert_called()
+        self.assertEqual(other_cache.get('bar'), 'foo')
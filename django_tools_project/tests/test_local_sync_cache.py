@@ -8,14 +8,25 @@
     :license: GNU GPL v3 or above, see LICENSE for more details.
 """
 
+import asyncio
+import json
+import socket
+import sys
+import tempfile
+import threading
 import time
 import unittest
+from pathlib import Path
+from unittest import mock
 
 from django.core.cache import cache
 
 # https://github.com/jedie/django-tools
-from django_tools.local_sync_cache.local_sync_cache import LocalSyncCache
+from django_tools.local_sync_cache import local_sync_cache, transports
+from django_tools.local_sync_cache.instrumentation import escape_label, estimate_memory, format_prometheus
+from django_tools.local_sync_cache.local_sync_cache import BoundedLocalSyncCache, LocalSyncCache
 from django_tools.local_sync_cache.localsynccachemiddleware import LocalSyncCacheMiddleware
+from django_tools.local_sync_cache.transports import LocalTransport, PostgresTransport, UnixSocketTransport
 from django_tools.unittest_utils.assertments import assert_in_logs, assert_pformat_equal
 
 
@@ -26,6 +37,7 @@ class LocalSyncCacheTest(unittest.TestCase):
         LocalSyncCache.CACHES = []
         LocalSyncCache.INIT_COUNTER = {}
         LocalSyncCache._OWN_RESET_TIMES = {}
+        LocalSyncCache._NEXT_CHECK = 0
         cache.clear()
 
     def testBasic(self):
@@ -41,6 +53,16 @@ class LocalSyncCacheTest(unittest.TestCase):
         cache_information = LocalSyncCache.get_cache_information()
         assert_pformat_equal(len(cache_information), 1)
 
+    def testIsDict(self):
+        c = LocalSyncCache(id="test1")
+        c["key1"] = "value1"
+        self.assertIsInstance(c, dict)
+        assert_pformat_equal(json.dumps(c), '{"key1": "value1"}')
+        assert_pformat_equal(c | {"key2": "value2"}, {"key1": "value1", "key2": "value2"})
+        assert_pformat_equal(list(c), ["key1"])
+        assert_pformat_equal(c.snapshot(), {"key1": "value1"})
+        self.assertIs(type(c.snapshot()), dict)
+
     def testUniqueID(self):
         LocalSyncCache(id="test1")
         with self.assertLogs(logger="django_tools.local_sync_cache") as logs:
@@ -94,6 +116,7 @@ class LocalSyncCacheTest(unittest.TestCase):
     #        for item in cache_information:
     #            print item["instance"].id, item
 
+    @mock.patch.object(local_sync_cache, "LOCAL_SYNC_CACHE_CHECK_INTERVAL", 0)
     def testLocalSyncCacheMiddleware(self):
         middleware = LocalSyncCacheMiddleware()
 
@@ -155,3 +178,390 @@ class LocalSyncCacheTest(unittest.TestCase):
                 assert_pformat_equal(instance.own_clear_counter, 1)
                 assert_pformat_equal(instance.ext_clear_counter, 1)
                 assert_pformat_equal(instance, {})
+
+    def testCheckAllStates(self):
+        caches = [LocalSyncCache(id=f"test{no}") for no in range(30)]
+        for no, c in enumerate(caches):
+            c["key"] = no
+        cache.set("test5", time.time() + 1)  # cleared in a other process
+
+        with mock.patch.object(cache, "get_many", wraps=cache.get_many) as get_many:
+            LocalSyncCache.check_all_states()
+        get_many.assert_called_once()
+        assert_pformat_equal(caches[5], {})
+        assert_pformat_equal(caches[6], {"key": 6})
+
+        # A burst of requests shares one check:
+        cache.set("test6", time.time() + 1)
+        LocalSyncCache.check_all_states()
+        assert_pformat_equal(caches[6], {"key": 6})
+        assert_pformat_equal(caches[6].request_counter, 1)
+
+        # ...but clear() in this process forces the next check:
+        caches[7].clear()
+        LocalSyncCache.check_all_states()
+        assert_pformat_equal(caches[6], {})
+        assert_pformat_equal(caches[6].request_counter, 2)
+
+        # ...and after the interval:
+        cache.set("test8", time.time() + 1)
+        with mock.patch("time.monotonic", return_value=time.monotonic() + 1):
+            LocalSyncCache.check_all_states()
+        assert_pformat_equal(caches[8], {})
+
+    def testBoundedMaxEntries(self):
+        c = BoundedLocalSyncCache(id="test1", max_entries=3)
+        c.update({1: "one", 2: "two", 3: "three"})
+        assert_pformat_equal(c[1], "one")  # 1 is now the most recently used
+        c[4] = "four"
+        assert_pformat_equal(c, {1: "one", 3: "three", 4: "four"})
+
+        assert_pformat_equal(2 in c, False)
+        assert_pformat_equal(c.get(2), None)
+        assert_pformat_equal(c.setdefault(5, "five"), "five")
+        assert_pformat_equal(c, {1: "one", 4: "four", 5: "five"})
+
+        # The cross-process reset semantic stays:
+        cache.set("test1", time.time() + 1)
+        c.check_state()
+        assert_pformat_equal(c, {})
+        c[6] = "six"
+        assert_pformat_equal(len(c._expires), 1)
+
+        info = LocalSyncCache.get_cache_information()[0]
+        assert_pformat_equal(info["evictions"], 2)
+        assert_pformat_equal(info["hits"], 1)
+        assert_pformat_equal(info["misses"], 3)
+        assert_pformat_equal(info["hit_ratio"], 0.25)
+        self.assertIn("hit_ratio: 0.25", LocalSyncCache.pformat_cache_information())
+
+    def testBoundedTimeout(self):
+        c = BoundedLocalSyncCache(id="test1", timeout=10)
+        with mock.patch("time.monotonic", return_value=1000):
+            c["key"] = "value"
+        with mock.patch("time.monotonic", return_value=1010):
+            assert_pformat_equal(c["key"], "value")
+        with mock.patch("time.monotonic", return_value=1011):
+            assert_pformat_equal("key" in c, False)
+        assert_pformat_equal(c, {})
+        assert_pformat_equal(c.get_stats()["expirations"], 1)
+
+    def testBoundedExpireWhileSet(self):
+        """
+        A reader finds a expired entry, but a other thread sets it again, before the reader gets the lock.
+        """
+        c = BoundedLocalSyncCache(id="test1", timeout=10)
+        write_lock = c._write_lock
+        reader_waits = threading.Event()
+
+        class SignalLock:
+            def __enter__(self):
+                reader_waits.set()
+                return write_lock.__enter__()
+
+            def __exit__(self, *exc_info):
+                return write_lock.__exit__(*exc_info)
+
+        results = []
+        with mock.patch("time.monotonic", return_value=1000):
+            c["key"] = "old"
+        with mock.patch("time.monotonic", return_value=1011):
+            with write_lock:
+                c._write_lock = SignalLock()
+                reader = threading.Thread(target=lambda: results.append("key" in c))
+                reader.start()
+                self.assertTrue(reader_waits.wait(timeout=5))
+                c["key"] = "new"  # The expire time is renewed
+            reader.join()
+
+            assert_pformat_equal(results, [True])
+            assert_pformat_equal(c["key"], "new")  # The new value is not deleted
+        assert_pformat_equal(c.get_stats()["expirations"], 0)
+
+    def testConcurrentThreads(self):
+        """
+        Many threads (and asyncio tasks) read, write, clear and check at the same time.
+        """
+        c1 = LocalSyncCache(id="stress")
+        c2 = LocalSyncCache(id="stress", unique_ids=False)
+        bounded = BoundedLocalSyncCache(id="bounded", max_entries=50, timeout=60)
+        instances = (c1, c2, bounded)
+        errors = []
+        stop = threading.Event()
+
+        def run(func):
+            def worker():
+                no = 0
+                try:
+                    while not stop.is_set():
+                        func(no)
+                        no += 1
+                except Exception as err:
+                    errors.append(err)
+                    raise
+            return worker
+
+        def read(no):
+            for instance in instances:
+                instance.get(no % 100)
+                _ = (no % 100) in instance
+                for key, value in instance.snapshot().items():
+                    assert key == value
+
+        def write(no):
+            for instance in instances:
+                instance[no % 100] = no % 100
+
+        def clear(no):
+            instances[no % 3].clear()
+            time.sleep(0.001)
+
+        def check(no):
+            c1.check_state()
+            LocalSyncCache.check_all_states()
+            LocalSyncCache.get_cache_information()
+
+        def register(no):
+            LocalSyncCache(id=f"temp-{threading.get_ident()}-{no}").unregister()
+
+        def run_tasks(no):
+            async def task(no):
+                read(no)
+                await asyncio.sleep(0)
+                write(no)
+
+            async def main():
+                await asyncio.gather(*(task(no + task_no) for task_no in range(10)))
+
+            asyncio.run(main())
+
+        funcs = [read] * 4 + [write] * 4 + [clear, check, check, register, run_tasks]
+        threads = [threading.Thread(target=run(func)) for func in funcs]
+        with mock.patch.object(local_sync_cache, "LOCAL_SYNC_CACHE_CHECK_INTERVAL", 0):
+            for thread in threads:
+                thread.start()
+            time.sleep(0.5)
+            stop.set()
+            for thread in threads:
+                thread.join()
+
+        assert_pformat_equal(errors, [])
+        assert_pformat_equal(LocalSyncCache.CACHES, [c1, c2, bounded])
+        self.assertLessEqual(len(bounded), 50)
+        assert_pformat_equal(set(bounded._expires), set(bounded))
+
+        # The last clear() is never lost:
+        c1["key"] = c2["key"] = "value"
+        c1.clear()
+        c2.check_state()
+        assert_pformat_equal(c2, {})
+
+    def testIterateWhileClearing(self):
+        """
+        Iterate over the cache itself, while other threads fill and clear it.
+        """
+        c = LocalSyncCache(id="iterate")
+        bounded = BoundedLocalSyncCache(id="iterate-bounded", max_entries=100)
+        errors = []
+        stop = threading.Event()
+
+        def fill_and_clear(instance):
+            while not stop.is_set():
+                for no in range(200):
+                    instance[no] = no
+                instance.clear()
+
+        def iterate(instance):
+            try:
+                while not stop.is_set():
+                    for key in instance:
+                        assert instance.get(key, key) == key  # may be cleared in the meantime
+                    for key, value in instance.items():
+                        assert key == value
+                    for value in instance.values():
+                        assert isinstance(value, int)
+            except Exception as err:
+                errors.append(err)
+                raise
+
+        threads = []
+        for instance in (c, bounded):
+            threads.append(threading.Thread(target=fill_and_clear, args=(instance,)))
+            threads += [threading.Thread(target=iterate, args=(instance,)) for _ in range(3)]
+
+        switch_interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)  # Switch threads very often, to provoke a conflict
+        try:
+            for thread in threads:
+                thread.start()
+            time.sleep(0.3)
+            stop.set()
+            for thread in threads:
+                thread.join()
+        finally:
+            sys.setswitchinterval(switch_interval)
+
+        assert_pformat_equal(errors, [])
+
+    def testInstrumentation(self):
+        c1 = LocalSyncCache(id="plain")
+        self.assertIs(type(c1), LocalSyncCache)  # No overhead without instrumentation
+
+        with mock.patch.object(local_sync_cache, "LOCAL_SYNC_CACHE_INSTRUMENTATION", True):
+            c2 = LocalSyncCache(id="instrumented")
+            bounded = BoundedLocalSyncCache(id="bounded", max_entries=1)
+            self.assertIsInstance(c2, LocalSyncCache)
+            self.assertIs(type(bounded), BoundedLocalSyncCache)  # counts itself
+
+            c2["key"] = "x" * 10000
+            assert_pformat_equal(c2["key"], "x" * 10000)
+            assert_pformat_equal(c2.get("key"), "x" * 10000)
+            assert_pformat_equal("other" in c2, False)
+            assert_pformat_equal(c2.get("other"), None)
+            bounded[1] = bounded[2] = "value"
+
+            c2.check_state()
+            LocalSyncCache.check_all_states()
+
+        self.assertGreater(c2.check_state_seconds, 0)
+        info = {item["instance"].id: item for item in LocalSyncCache.get_cache_information()}
+        assert_pformat_equal(info["instrumented"]["hits"], 2)
+        assert_pformat_equal(info["instrumented"]["hit_ratio"], 0.5)
+        self.assertGreater(info["instrumented"]["memory"], 10000)
+        self.assertNotIn("hits", info["plain"])
+
+        metrics = LocalSyncCache.get_metrics()
+        assert_pformat_equal(sorted(metrics), ["bounded", "instrumented", "plain"])
+        assert_pformat_equal(metrics["instrumented"]["entries"], 1)
+        assert_pformat_equal(metrics["instrumented"]["misses"], 2)
+        assert_pformat_equal(metrics["instrumented"]["checks"], 2)
+        assert_pformat_equal(metrics["bounded"]["evictions"], 1)
+        self.assertGreater(metrics["instrumented"]["memory_bytes"], 10000)
+
+        text = format_prometheus(metrics)
+        self.assertIn("# TYPE django_tools_local_sync_cache_hits_total counter", text)
+        self.assertIn('django_tools_local_sync_cache_hits_total{id="instrumented"} 2', text)
+        self.assertIn('django_tools_local_sync_cache_entries{id="plain"} 0', text)
+        self.assertTrue(text.endswith('\n'))
+        self.assertFalse(text.endswith('\n\n'))
+        assert_pformat_equal(escape_label('a "b" \\ c\n'), 'a \\"b\\" \\\\ c\\n')
+
+    def testEstimateMemory(self):
+        data = {no: {"title": f"title {no}", "tags": ["a", "b"]} for no in range(1000)}
+        exact = estimate_memory(data, samples=1000)
+        sampled = estimate_memory(data, samples=50)
+        self.assertGreater(exact, 100_000)
+        self.assertAlmostEqual(sampled, exact, delta=exact * 0.2)
+
+
+class LocalSyncCacheTransportTest(unittest.TestCase):
+    def setUp(self):
+        LocalSyncCache.CACHES = []
+        LocalSyncCache.INIT_COUNTER = {}
+        LocalSyncCache._OWN_RESET_TIMES = {}
+        LocalSyncCache._TRANSPORT = None
+        cache.clear()
+
+    def tearDown(self):
+        if LocalSyncCache._TRANSPORT is not None:
+            LocalSyncCache._TRANSPORT.stop()
+            LocalSyncCache._TRANSPORT = None
+
+    @mock.patch.object(
+        local_sync_cache, "LOCAL_SYNC_CACHE_TRANSPORT", "django_tools.local_sync_cache.transports.LocalTransport"
+    )
+    def testPushClear(self):
+        c1 = LocalSyncCache(id="test1")
+        c2 = LocalSyncCache(id="test2")
+        c1["key"] = c2["key"] = "value"
+        self.assertIsInstance(LocalSyncCache.get_transport(), LocalTransport)
+
+        # clear() in a other process:
+        received = []
+        other_process = LocalTransport()
+        other_process.start(lambda cache_id, reset_time: received.append(cache_id))
+        try:
+            other_process.publish("test1", time.time() + 1)
+            assert_pformat_equal(c1, {})  # cleared without check_state()
+            assert_pformat_equal(c2, {"key": "value"})
+
+            # clear() in this process:
+            c2.clear()
+            assert_pformat_equal(received, ["test1", "test2"])
+        finally:
+            other_process.stop()
+
+    def testUnixSocketTransport(self):
+        received = []
+        event = threading.Event()
+
+        def callback(cache_id, reset_time):
+            received.append((cache_id, reset_time))
+            event.set()
+
+        with tempfile.TemporaryDirectory() as temp_dir, \
+                mock.patch.object(UnixSocketTransport, "directory", temp_dir):
+            # Left over socket from a dead process:
+            stale_path = Path(temp_dir, "1-1.sock")
+            with socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM) as sock:
+                sock.bind(str(stale_path))
+
+            receiver = UnixSocketTransport()
+            receiver.start(callback)
+            sender = UnixSocketTransport()
+            sender.start(lambda cache_id, reset_time: None)
+            try:
+                sender.publish("test1", 1234.5)
+                self.assertTrue(event.wait(timeout=5))
+                assert_pformat_equal(received, [("test1", 1234.5)])
+                self.assertFalse(stale_path.exists())
+            finally:
+                receiver.stop()
+                sender.stop()
+            assert_pformat_equal(list(Path(temp_dir).iterdir()), [])
+
+    def testPostgresTransportListen(self):
+        received = []
+        event = threading.Event()
+
+        def callback(cache_id, reset_time):
+            received.append((cache_id, reset_time))
+            event.set()
+
+        class FakeConnection:
+            """
+            Yields one notify and blocks until close(), like a idle psycopg connection.
+            """
+
+            def __init__(self, payload):
+                self.payload = payload
+                self.closed = threading.Event()
+
+            def notifies(self):
+                yield mock.Mock(payload=self.payload)
+                self.closed.wait(timeout=5)
+                raise OSError('connection closed')
+
+            def close(self):
+                self.closed.set()
+
+        transport = PostgresTransport()
+        connection = FakeConnection(transport.encode("test1", 1234.5).decode())
+        connect = mock.Mock(side_effect=[OSError("connection refused"), connection])
+
+        with mock.patch.object(PostgresTransport, "_connect", connect), \
+                mock.patch.object(PostgresTransport, "reconnect_delay", 0), \
+                self.assertLogs(transports.logger, level="ERROR") as logs:
+            transport.start(callback)
+            try:
+                self.assertTrue(event.wait(timeout=5))
+            finally:
+                transport.stop()
+            transport.thread.join(timeout=5)
+
+        self.assertFalse(transport.thread.is_alive())
+        assert_pformat_equal(received, [("test1", 1234.5)])
+        assert_pformat_equal(connect.call_count, 2)
+        assert_pformat_equal(len(logs.records), 1)
+        self.assertIn("Listen on 'django_tools_local_sync_cache' failed (retry in 0 sec.)", logs.output[0])
+        self.assertIn("OSError: connection refused", logs.output[0])
@@ -0,0 +1,111 @@
+"""
+    Test the sampling profiling middleware
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    :copyleft: 2026 by the django-tools team, see AUTHORS for more details.
+    :license: GNU GPL v3 or above, see LICENSE for more details.
+"""
+
+import io
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+from django.core.management import call_command
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase
+
+from django_tools.management.commands.profiling_stats import aggregate_stacks
+from django_tools.middlewares import profiling
+from django_tools.middlewares.profiling import ProfilingMiddleware, rotate_files
+
+
+def hot_function():
+    return sum(range(1000))
+
+
+class ProfilingMiddlewareTestCase(SimpleTestCase):
+    def setUp(self):
+        super().setUp()
+        temp_dir = tempfile.TemporaryDirectory(prefix='test_profiling_')
+        self.addCleanup(temp_dir.cleanup)
+        self.directory = Path(temp_dir.name)
+
+    def get_middleware(self, view, slow_threshold=None):
+        with mock.patch.multiple(profiling, PROFILING_DIR=str(self.directory), PROFILING_SLOW_THRESHOLD=slow_threshold):
+            return ProfilingMiddleware(view)
+
+    def test_not_sampled(self):
+        middleware = self.get_middleware(lambda request: HttpResponse('ok'))
+        with mock.patch.object(profiling, 'PROFILING_SAMPLE_RATE', 0), self.assertNoLogs(profiling.logger):
+            response = middleware(RequestFactory().get('/foo/'))
+        self.assertEqual(response.content, b'ok')
+        self.assertEqual(list(self.directory.glob('*')), [])
+
+    def test_profile_sampled_requests(self):
+        def view(request):
+            hot_function()
+            return HttpResponse('ok')
+
+        middleware = self.get_middleware(view)
+        with mock.patch.object(profiling, 'PROFILING_SAMPLE_RATE', 2):
+            for _ in range(5):
+                middleware(RequestFactory().get('/foo/bar/'))
+
+        files = sorted(self.directory.glob('*.prof'))
+        self.assertEqual(len(files), 2)
+        self.assertTrue(files[0].name.endswith('-foo_bar.prof'))
+
+        stdout = io.StringIO()
+        call_command('profiling_stats', directory=str(self.directory), stdout=stdout)
+        output = stdout.getvalue()
+        self.assertIn('cProfile of 2 sampled requests', output)
+        self.assertRegex(output, r'\n +ncalls +tottime +percall +cumtime +percall filename:lineno\(function\)\n')
+        self.assertRegex(  # The row of the two calls, also on one line
+            output, r'\n +2 +[\d.]+ +[\d.]+ +[\d.]+ +[\d.]+ test_profiling_middleware\.py:\d+\(hot_function\)\n'
+        )
+
+    def test_sample_slow_requests(self):
+        def view(request):
+            middleware.sampler.sample()  # Don't depend on the timing of the sampler thread
+            middleware.sampler.sample()
+            return HttpResponse('ok')
+
+        middleware = self.get_middleware(view, slow_threshold=0)
+        with mock.patch.object(profiling, 'PROFILING_SAMPLE_RATE', 0), \
+                self.assertLogs(profiling.logger, level='WARNING') as logs:
+            middleware(RequestFactory().get('/slow/'))
+        self.assertIn("Slow request GET '/slow/'", logs.output[0])
+
+        # Stop the sampler thread, it should not run into other tests:
+        thread = middleware.sampler.thread
+        middleware.sampler.idle_timeout = 0
+        if thread is not None:
+            thread.join(timeout=5)
+            self.assertFalse(thread.is_alive())
+
+        files = list(self.directory.glob('*.stacks'))
+        self.assertEqual(len(files), 1)
+        total_samples, self_counts, total_counts = aggregate_stacks(files)
+        self.assertGreaterEqual(total_samples, 2)  # The sampler thread may add some
+        self.assertTrue(any(function.startswith('sample (') for function in self_counts))
+        self.assertTrue(any(function.startswith('view (') for function in total_counts))
+
+        stdout = io.StringIO()
+        call_command('profiling_stats', directory=str(self.directory), stdout=stdout)
+        self.assertIn('Stack samples of 1 slow requests', stdout.getvalue())
+
+    def test_rotate_files(self):
+        for no in range(5):
+            (self.directory / f'{no}-1-foo.prof').touch()
+        (self.directory / 'other.txt').touch()
+
+        rotate_files(self.directory, max_files=2)
+        self.assertEqual(
+            sorted(path.name for path in self.directory.iterdir()), ['3-1-foo.prof', '4-1-foo.prof', 'other.txt']
+        )
+
+    def test_no_data(self):
+        stdout = io.StringIO()
+        call_command('profiling_stats', directory=str(self.directory), stdout=stdout)
+        self.assertEqual(stdout.getvalue(), f'No profiling data in {self.directory}\n')
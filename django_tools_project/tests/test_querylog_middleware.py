@@ -0,0 +1,64 @@
+"""
+    Test the query log middleware
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    :copyleft: 2026 by the django-tools team, see AUTHORS for more details.
+    :license: GNU GPL v3 or above, see LICENSE for more details.
+"""
+
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+
+from django_tools.middlewares import querylogmiddleware
+from django_tools.middlewares.querylogmiddleware import QueryLogMiddleware
+
+
+def n_plus_one_view(request):
+    for pk in range(5):
+        User.objects.filter(pk=pk).exists()
+    User.objects.count()
+    return HttpResponse('ok')
+
+
+@override_settings(DEBUG=False)
+class QueryLogMiddlewareTestCase(TestCase):
+    def call_view(self, **thresholds):
+        settings = {'QUERYLOG_MAX_QUERIES': None, 'QUERYLOG_MAX_TIME': None, 'QUERYLOG_MAX_REPEATS': None}
+        settings.update(thresholds)
+        with mock.patch.multiple(querylogmiddleware, **settings):
+            return QueryLogMiddleware(n_plus_one_view)(RequestFactory().get('/foo/'))
+
+    def test_below_thresholds(self):
+        with self.assertNoLogs(querylogmiddleware.logger):
+            response = self.call_view(QUERYLOG_MAX_QUERIES=6, QUERYLOG_MAX_REPEATS=5)
+        self.assertEqual(response.content, b'ok')
+
+    def test_too_many_queries(self):
+        with self.assertLogs(querylogmiddleware.logger, level='WARNING') as logs:
+            self.call_view(QUERYLOG_MAX_QUERIES=5)
+        output = logs.output[0]
+        self.assertIn("GET '/foo/' exceeds query thresholds (queries): 6 queries in ", output)
+        self.assertIn(' ms, 1 repeated statements', output)
+
+    def test_n_plus_one(self):
+        with self.assertLogs(querylogmiddleware.logger, level='WARNING') as logs, \
+                mock.patch.object(querylogmiddleware, 'QUERYLOG_HEADER', 'X-Query-Log'):
+            response = self.call_view(QUERYLOG_MAX_REPEATS=4)
+
+        data = logs.records[0].querylog
+        self.assertEqual(data['exceeded'], ['repeats'])
+        self.assertEqual(data['queries'], 6)
+        self.assertEqual(len(data['repeated']), 1)
+        repeated = data['repeated'][0]
+        self.assertEqual(repeated['count'], 5)
+        self.assertIn('FROM "auth_user" WHERE "auth_user"."id" = ? LIMIT ?', repeated['sql'])
+
+        self.assertRegex(response['X-Query-Log'], r'^queries=6; time=\d+\.\dms; repeated=1$')
+
+    def test_time(self):
+        with self.assertLogs(querylogmiddleware.logger, level='WARNING') as logs:
+            self.call_view(QUERYLOG_MAX_TIME=0)
+        self.assertEqual(logs.records[0].querylog['exceeded'], ['time'])
@@ -0,0 +1,647 @@
+"""
+    Test the per-site cache middleware
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    :copyleft: 2026 by the django-tools team, see AUTHORS for more details.
+    :license: GNU GPL v3 or above, see LICENSE for more details.
+"""
+
+import gzip
+import io
+import re
+import threading
+import time
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.core.cache import cache
+from django.core.management import call_command
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from django_tools.cache import compression, site_cache_middleware
+from django_tools.cache.counters import ShardedCounter
+from django_tools.cache.policies import DEFAULT_POLICY, PolicyTable
+from django_tools.cache.site_cache_middleware import FetchFromCacheMiddleware, UpdateCacheMiddleware
+
+
+HTML = '<html><body>' + '<p>Lorem ipsum dolor sit amet.</p>' * 30 + '</body></html>'
+
+
+class SiteCacheMiddlewareTestCase(SimpleTestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.fetch = FetchFromCacheMiddleware()
+        self.update = UpdateCacheMiddleware()
+
+    def get_request(self, path='/page/'):
+        request = RequestFactory().get(path)
+        request.LANGUAGE_CODE = 'en'
+        return request
+
+    def fetch_response(self, path='/page/'):
+        """
+        return the response from the cache or None
+        """
+        return self.fetch.process_request(self.get_request(path))
+
+    def update_response(self, response, path='/page/'):
+        return self.update.process_response(self.get_request(path), response)
+
+
+class StreamingResponseTestCase(SiteCacheMiddlewareTestCase):
+    def test_response(self):
+        response = self.update_response(HttpResponse(HTML))
+        self.assertEqual(response.content, HTML.encode())
+
+        cached_response = self.fetch_response()
+        self.assertIs(cached_response._from_cache, True)
+        self.assertEqual(cached_response._container, [HTML.encode()])  # Stored as one bytes object
+        self.assertTrue(cached_response.has_header('Expires'))
+
+    def test_streaming_response(self):
+        response = StreamingHttpResponse(chunk for chunk in HTML.split('<p>'))
+        response = self.update_response(response)
+        self.assertIsNone(self.fetch_response())  # Stored after the last chunk
+
+        content = b''.join(response.streaming_content)
+        self.assertEqual(content, HTML.replace('<p>', '').encode())
+
+        cached_response = self.fetch_response()
+        self.assertEqual(cached_response._container, [content])
+        self.assertEqual(cached_response['Content-Type'], 'text/html; charset=utf-8')
+
+    def test_async_streaming_response(self):
+        async def streaming_content():
+            for chunk in HTML.split('<p>'):
+                yield chunk
+
+        response = self.update_response(StreamingHttpResponse(streaming_content()))
+
+        async def consume():
+            return b''.join([chunk async for chunk in response.streaming_content])
+
+        content = async_to_sync(consume)()
+        self.assertEqual(self.fetch_response().content, content)
+
+    def test_max_size(self):
+        with mock.patch.object(site_cache_middleware, 'CACHE_MIDDLEWARE_MAX_SIZE', 100):
+            # Normal responses are not limited:
+            self.update_response(HttpResponse('x' * 101), path='/big/')
+            self.assertEqual(self.fetch_response('/big/').content, b'x' * 101)
+
+            response = self.update_response(StreamingHttpResponse(['x' * 60, 'x' * 60]), path='/big-stream/')
+            self.assertEqual(b''.join(response.streaming_content), b'x' * 120)  # Client gets all chunks
+            self.assertIsNone(self.fetch_response('/big-stream/'))
+
+            response = self.update_response(StreamingHttpResponse(['x' * 50, 'x' * 50]), path='/small-stream/')
+            self.assertIsNone(self.fetch_response('/small-stream/'))  # Stored after the last chunk
+            b''.join(response.streaming_content)
+            self.assertEqual(self.fetch_response('/small-stream/').content, b'x' * 100)
+
+    @override_settings(INTERNAL_IPS=['127.0.0.1'])
+    def test_csrf_check_stores_clean_content(self):
+        # The csrf check runs for internal IPs and must compare bytes with bytes:
+        self.update_response(HttpResponse(HTML))
+        self.assertEqual(self.fetch_response().content, HTML.encode())
+
+        with self.assertRaisesMessage(AssertionError, 'csrf_token would be put into the cache!'):
+            self.update_response(HttpResponse('<input name="csrfmiddlewaretoken">'), path='/form/')
+        self.assertIsNone(self.fetch_response('/form/'))
+
+    @override_settings(DEBUG=True)
+    def test_csrf_token(self):
+        with self.assertRaisesMessage(AssertionError, 'csrf_token would be put into the cache!'):
+            self.update_response(HttpResponse('<input name="csrfmiddlewaretoken">'))
+
+        response = self.update_response(StreamingHttpResponse(['<input name="csrf', 'middlewaretoken">']))
+        with self.assertLogs('django_tools.cache.site_cache_middleware', level='ERROR'):
+            b''.join(response.streaming_content)
+        self.assertIsNone(self.fetch_response())
+
+
+@mock.patch.object(site_cache_middleware, 'CACHE_MIDDLEWARE_COMPRESSION', ('br', 'gzip'))
+class CompressionTestCase(SiteCacheMiddlewareTestCase):
+    def test_compressed_entry(self):
+        self.update_response(HttpResponse(HTML, headers={'Content-Language': 'en'}))
+
+        page = cache.get('/page/:en:1')
+        self.assertIsInstance(page, dict)
+        if compression.brotli is None:
+            self.assertEqual(list(page['bodies']), ['gzip'])
+        else:
+            self.assertEqual(list(page['bodies']), ['br', 'gzip'])
+        self.assertLess(len(page['bodies']['gzip']), len(HTML) / 5)
+        self.assertEqual(gzip.decompress(page['bodies']['gzip']), HTML.encode())
+        self.assertEqual(page['headers']['Content-Language'], 'en')
+
+    def get_compressed_response(self, accept_encoding):
+        request = self.get_request()
+        request.META['HTTP_ACCEPT_ENCODING'] = accept_encoding
+        return self.fetch.process_request(request)
+
+    def test_serve_compressed(self):
+        self.update_response(HttpResponse(HTML))
+
+        response = self.get_compressed_response('gzip, deflate')
+        self.assertIs(response._from_cache, True)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Content-Length'], str(len(response.content)))
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        self.assertEqual(response['Content-Type'], 'text/html; charset=utf-8')
+        self.assertEqual(gzip.decompress(response.content), HTML.encode())
+
+    def test_serve_identity(self):
+        self.update_response(HttpResponse(HTML))
+
+        for accept_encoding in ('', 'deflate', 'gzip;q=0'):
+            with self.subTest(accept_encoding=accept_encoding):
+                response = self.get_compressed_response(accept_encoding)
+                self.assertFalse(response.has_header('Content-Encoding'))
+                self.assertEqual(response['Vary'], 'Accept-Encoding')
+                self.assertEqual(response.content, HTML.encode())
+
+    def test_small_content(self):
+        self.update_response(HttpResponse('small'))
+        self.assertEqual(cache.get('/page/:en:1')['bodies'], {'identity': b'small'})
+
+        response = self.get_compressed_response('gzip')
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(response.content, b'small')
+
+    def test_already_encoded(self):
+        content = gzip.compress(HTML.encode())
+        self.update_response(HttpResponse(content, headers={'Content-Encoding': 'gzip'}))
+
+        response = self.fetch_response()
+        self.assertIsInstance(cache.get('/page/:en:1'), HttpResponse)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response.content, content)
+
+
+class ConditionalGetTestCase(SiteCacheMiddlewareTestCase):
+    def get_conditional_response(self, **headers):
+        request = self.get_request()
+        request.META.update(headers)
+        return self.fetch.process_request(request)
+
+    def test_metadata(self):
+        self.update_response(HttpResponse(HTML))
+
+        cached_response = self.fetch_response()
+        meta = cache.get('/page/:en:1:meta')
+        self.assertEqual(meta['etag'], cached_response['ETag'])
+        self.assertEqual(meta['length'], len(HTML))
+        self.assertEqual(meta['headers']['Last-Modified'], cached_response['Last-Modified'])
+        self.assertEqual(meta['headers']['Cache-Control'], 'max-age=600')
+
+    def test_not_modified_without_content(self):
+        self.update_response(HttpResponse(HTML))
+        etag = self.fetch_response()['ETag']
+
+        with mock.patch.object(site_cache_middleware.cache, 'get', wraps=cache.get) as cache_get:
+            response = self.get_conditional_response(HTTP_IF_NONE_MATCH=etag)
+        cache_get.assert_called_once_with('/page/:en:1:meta')  # The content was not fetched
+        self.assertEqual(response.status_code, 304)
+        self.assertIs(response._from_cache, True)
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(response['Cache-Control'], 'max-age=600')
+        self.assertEqual(response.content, b'')
+
+        # weak comparison and lists:
+        self.assertEqual(self.get_conditional_response(HTTP_IF_NONE_MATCH=f'"foo", W/{etag}').status_code, 304)
+        self.assertEqual(self.get_conditional_response(HTTP_IF_NONE_MATCH='*').status_code, 304)
+
+    def test_modified(self):
+        self.update_response(HttpResponse(HTML))
+        last_modified = self.fetch_response()['Last-Modified']
+
+        response = self.get_conditional_response(HTTP_IF_NONE_MATCH='"other"')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, HTML.encode())
+
+        # If-Modified-Since is ignored with If-None-Match:
+        response = self.get_conditional_response(HTTP_IF_NONE_MATCH='"other"', HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 200)
+
+        response = self.get_conditional_response(HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 304)
+        response = self.get_conditional_response(HTTP_IF_MODIFIED_SINCE='Thu, 01 Jan 2015 00:00:00 GMT')
+        self.assertEqual(response.status_code, 200)
+
+    def test_delete_cache_item(self):
+        self.update_response(HttpResponse(HTML))
+        etag = self.fetch_response()['ETag']
+
+        site_cache_middleware.delete_cache_item('/page/', 'en')
+        self.assertIsNone(cache.get('/page/:en:1:meta'))
+        self.assertIsNone(self.get_conditional_response(HTTP_IF_NONE_MATCH=etag))
+
+    @mock.patch.object(site_cache_middleware, 'CACHE_MIDDLEWARE_COMPRESSION', ('gzip',))
+    def test_compressed(self):
+        self.update_response(HttpResponse(HTML))
+
+        response = self.get_conditional_response(HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertTrue(response['ETag'].startswith('W/"'))
+
+        response = self.get_conditional_response(HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+
+
+class ShardedCounterTestCase(SimpleTestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.counter = ShardedCounter({'requests': 'test_requests', 'hits': 'test_hits'}, flush_interval=60)
+
+    def test_threads(self):
+        def count():
+            for _ in range(1000):
+                self.counter.incr('requests')
+                self.counter.incr('hits', 2)
+
+        threads = [threading.Thread(target=count) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(self.counter.get_totals(), {'requests': 8000, 'hits': 16000})
+
+        # The shards of the finished threads are merged on the next new shard:
+        self.counter.incr('requests')
+        self.assertEqual(len(self.counter._shards), 1)
+        self.assertEqual(self.counter.get_totals(), {'requests': 8001, 'hits': 16000})
+
+    def test_flush(self):
+        self.counter.incr('requests')
+        self.counter.incr('requests')
+        self.counter.flush(cache)
+        self.assertEqual(cache.get_many(['test_requests', 'test_hits']), {'test_requests': 2})
+
+        # Only the difference is added:
+        cache.incr('test_requests', 10)  # e.g.: from a other process
+        self.counter.incr('requests')
+        self.counter.incr('hits')
+        self.assertEqual(self.counter.get_unflushed(), {'requests': 1, 'hits': 1})
+        self.counter.flush(cache)
+        self.assertEqual(cache.get_many(['test_requests', 'test_hits']), {'test_requests': 13, 'test_hits': 1})
+        self.assertEqual(self.counter.get_unflushed(), {'requests': 0, 'hits': 0})
+
+    def test_flush_if_due(self):
+        with mock.patch.object(cache, 'incr', side_effect=ValueError) as cache_incr:
+            self.counter.incr('requests')
+            self.counter.flush_if_due(cache)
+            self.assertEqual(cache_incr.call_count, 1)
+
+            self.counter.incr('requests')
+            self.counter.flush_if_due(cache)  # The interval is not over
+            self.assertEqual(cache_incr.call_count, 1)
+        self.assertEqual(cache.get('test_requests'), 1)
+
+
+@mock.patch.object(site_cache_middleware, 'COUNT_FETCH_FROM_CACHE', True)
+@mock.patch.object(site_cache_middleware, 'COUNT_UPDATE_CACHE', True)
+@mock.patch.object(site_cache_middleware, 'COUNT_IN_CACHE', True)
+class CountingTestCase(SiteCacheMiddlewareTestCase):
+    def setUp(self):
+        super().setUp()
+        site_cache_middleware.init_cache_counting()
+
+    def tearDown(self):
+        site_cache_middleware.COUNTER.reset()
+        super().tearDown()
+
+    def request(self):
+        request = self.get_request()
+        response = self.fetch.process_request(request) or HttpResponse(HTML)
+        return self.update.process_response(request, response)
+
+    def test_counting(self):
+        with mock.patch.object(cache, 'incr', wraps=cache.incr) as cache_incr:
+            for _ in range(4):
+                self.request()
+        self.assertEqual(cache_incr.call_count, 1)  # Only the first count was flushed directly
+
+        self.assertEqual(
+            dict(site_cache_middleware.LOCAL_CACHE_INFO),
+            {'requests': 4, 'request hits': 3, 'responses': 4, 'response hits': 3},
+        )
+        self.assertEqual(
+            site_cache_middleware.get_global_counts(),
+            {
+                'requests': 4,
+                'request hits': 3,
+                'responses': 4,
+                'response hits': 3,
+                'request hits ratio': 0.75,
+                'response hits ratio': 0.75,
+            },
+        )
+
+    def test_disabled(self):
+        with mock.patch.object(site_cache_middleware, 'COUNT_FETCH_FROM_CACHE', False):
+            self.request()
+            self.assertIsNone(site_cache_middleware.LOCAL_CACHE_INFO['requests'])
+        self.assertEqual(site_cache_middleware.LOCAL_CACHE_INFO['responses'], 1)
+
+    def test_command(self):
+        self.request()
+        self.request()
+
+        stdout = io.StringIO()
+        call_command('site_cache_info', stdout=stdout)
+        output = stdout.getvalue()
+        self.assertIn('requests             2\n', output)
+        self.assertIn('request hits ratio   50.0%\n', output)
+
+    def test_command_keeps_counts_of_other_processes(self):
+        # A other worker process has flushed its counts into the cache:
+        cache.set_many({site_cache_middleware.CACHE_REQUESTS: 7, site_cache_middleware.CACHE_REQUEST_HITS: 3})
+
+        # Initializing the counting (e.g.: importing the module in a new process) doesn't touch them:
+        site_cache_middleware.init_cache_counting()
+
+        stdout = io.StringIO()
+        call_command('site_cache_info', stdout=stdout)
+        output = stdout.getvalue()
+        self.assertIn('requests             7\n', output)
+        self.assertIn('request hits         3\n', output)
+        self.assertEqual(cache.get(site_cache_middleware.CACHE_REQUESTS), 7)
+
+        stdout = io.StringIO()
+        call_command('site_cache_info', reset=True, stdout=stdout)
+        self.assertIn('requests             7\n', stdout.getvalue())
+        self.assertIn('Counts reset.', stdout.getvalue())
+        self.assertEqual(cache.get(site_cache_middleware.CACHE_REQUESTS), 0)
+        self.assertEqual(cache.get(site_cache_middleware.CACHE_REQUEST_HITS), 0)
+
+
+@mock.patch.object(site_cache_middleware, 'CACHE_MIDDLEWARE_LOCK_TIMEOUT', 10)
+@mock.patch.object(site_cache_middleware, 'CACHE_MIDDLEWARE_LOCK_WAIT', 1)
+class SingleFlightTestCase(SiteCacheMiddlewareTestCase):
+    lock_key = '/page/:en:1:lock'
+
+    def test_wait_for_fill(self):
+        first_request = self.get_request()
+        self.assertIsNone(self.fetch.process_request(first_request))  # Takes the lock
+        self.assertIsNotNone(cache.get(self.lock_key))
+
+        def render_first(delay):
+            # The first request stores the page, while the second one waits
+            self.update.process_response(first_request, HttpResponse(HTML))
+
+        with mock.patch.object(site_cache_middleware.time, 'sleep', side_effect=render_first) as sleep:
+            response = self.fetch_response()
+        sleep.assert_called_once()
+        self.assertIs(response._from_cache, True)
+        self.assertEqual(response.content, HTML.encode())
+        self.assertIsNone(cache.get(self.lock_key))  # Released after the page was stored
+
+    def test_wait_timeout(self):
+        self.assertIsNone(self.fetch_response())  # Takes the lock
+
+        with mock.patch.object(site_cache_middleware, 'CACHE_MIDDLEWARE_LOCK_WAIT', 0.05), \
+                self.assertLogs('django_tools.cache.site_cache_middleware', level='DEBUG') as logs:
+            self.assertIsNone(self.fetch_response())
+        self.assertIn("Waiting for '/page/:en:1' timed out", '\n'.join(logs.output))
+
+    def test_released_without_page(self):
+        first_request = self.get_request()
+        self.assertIsNone(self.fetch.process_request(first_request))
+
+        def render_first(delay):
+            self.update.process_response(first_request, HttpResponse('error', status=500))
+
+        with mock.patch.object(site_cache_middleware.time, 'sleep', side_effect=render_first) as sleep:
+            self.assertIsNone(self.fetch_response())  # Renders the page itself
+        sleep.assert_called_once()
+        self.assertIsNone(cache.get(self.lock_key))
+
+    def test_streaming_release(self):
+        request = self.get_request()
+        self.assertIsNone(self.fetch.process_request(request))
+
+        response = self.update.process_response(request, StreamingHttpResponse(['foo', 'bar']))
+        self.assertIsNotNone(cache.get(self.lock_key))  # Still rendering
+        self.assertEqual(b''.join(response.streaming_content), b'foobar')
+        self.assertIsNone(cache.get(self.lock_key))
+        self.assertEqual(self.fetch_response().content, b'foobar')
+
+    @mock.patch.object(site_cache_middleware, 'CACHE_MIDDLEWARE_STALE_TIME', 60)
+    def test_stale_page(self):
+        self.update_response(HttpResponse('old'))
+        self.assertEqual(self.fetch_response().content, b'old')
+
+        expired = time.time() + 601  # CACHE_MIDDLEWARE_SECONDS + 1
+        with mock.patch('time.time', return_value=expired):
+            first_request = self.get_request()
+            self.assertIsNone(self.fetch.process_request(first_request))  # Renders the new page
+
+            with mock.patch.object(site_cache_middleware.time, 'sleep') as sleep:
+                response = self.fetch_response()
+            sleep.assert_not_called()
+            self.assertEqual(response.content, b'old')  # Don't wait: use the stale page
+
+            self.update.process_response(first_request, HttpResponse('new'))
+            self.assertEqual(self.fetch_response().content, b'new')
+
+
+@mock.patch.object(
+    site_cache_middleware,
+    'POLICY_TABLE',
+    PolicyTable((
+        ('/admin/', {'cache': False}),
+        ('/blog/', {'timeout': 3600, 'stale_time': 60}),
+        ('/api/', {'vary': ('Accept',)}),
+        (re.compile(r'/blog/\d+/$'), {'timeout': 10}),
+    )),
+)
+class PolicyTestCase(SiteCacheMiddlewareTestCase):
+    def test_lookup(self):
+        table = site_cache_middleware.POLICY_TABLE
+        self.assertIs(table.lookup('/admin/foo/').cache, False)
+        self.assertEqual(table.lookup('/blog/foo/').timeout, 3600)
+        self.assertEqual(table.lookup('/blog/123/').timeout, 10)
+        self.assertIs(table.lookup('/admin'), DEFAULT_POLICY)
+        self.assertIs(table.lookup('/foo/blog/'), DEFAULT_POLICY)
+
+        with self.assertRaisesMessage(TypeError, 'must be a string or a compiled regex'):
+            PolicyTable(((None, {}),))
+
+    def test_regex_with_groups(self):
+        table = PolicyTable((
+            ('/blog/', {'timeout': 3600}),
+            (re.compile(r'/(?P<year>\d{4})/'), {'timeout': 1}),
+            (re.compile(r'/(?P<year>\d{4})/(?P<month>\d{2})/'), {'timeout': 2}),  # same group name
+            (re.compile(r'/(\w+)/\1/'), {'timeout': 3}),  # backreference
+            (re.compile(r'/NEWS/', re.IGNORECASE), {'timeout': 4}),
+            (re.compile(r'(?i)/feed/'), {'timeout': 5}),  # global inline flag
+            (re.compile(r'/_policy0/'), {'timeout': 6}),
+        ))
+        self.assertEqual(len(table.matchers), 6)  # /NEWS/ and /_policy0/ + /blog/ are still combined
+        self.assertEqual(table.lookup('/2026/10/').timeout, 1)  # The first regex wins
+        self.assertEqual(table.lookup('/foo/foo/').timeout, 3)
+        self.assertIs(table.lookup('/foo/bar/'), DEFAULT_POLICY)
+        self.assertEqual(table.lookup('/news/').timeout, 4)
+        self.assertEqual(table.lookup('/Feed/').timeout, 5)
+        self.assertEqual(table.lookup('/_policy0/').timeout, 6)
+        self.assertEqual(table.lookup('/blog/blog/').timeout, 3)  # Regular expressions before prefixes
+        self.assertEqual(table.lookup('/blog/foo/').timeout, 3600)
+
+    def test_lookup_once(self):
+        request = self.get_request('/admin/foo/')
+        with mock.patch.object(PolicyTable, 'lookup', return_value=DEFAULT_POLICY) as lookup:
+            self.fetch.process_request(request)
+            self.update.process_response(request, HttpResponse(HTML))
+        lookup.assert_called_once_with('/admin/foo/')
+
+    def test_not_cached(self):
+        self.update_response(HttpResponse(HTML), path='/admin/foo/')
+        self.assertIsNone(self.fetch_response('/admin/foo/'))
+
+    def test_timeout(self):
+        self.update_response(HttpResponse(HTML), path='/blog/foo/')
+        self.assertEqual(self.fetch_response('/blog/foo/')['Cache-Control'], 'max-age=3600')
+        expires, _ = cache.get('/blog/foo/:en:1')  # Stored with the stale time
+        self.assertAlmostEqual(expires, time.time() + 3600, delta=5)
+
+        # A "max-age" from the view has priority:
+        self.update_response(HttpResponse(HTML, headers={'Cache-Control': 'max-age=120'}), path='/blog/bar/')
+        self.assertEqual(self.fetch_response('/blog/bar/')['Cache-Control'], 'max-age=120')
+
+        self.update_response(HttpResponse(HTML), path='/blog/123/')
+        self.assertEqual(self.fetch_response('/blog/123/')['Cache-Control'], 'max-age=10')
+
+    def test_vary(self):
+        def get_response(accept, content=None):
+            request = self.get_request('/api/')
+            request.META['HTTP_ACCEPT'] = accept
+            response = self.fetch.process_request(request)
+            if response is None:
+                response = self.update.process_response(request, HttpResponse(content))
+            return response
+
+        get_response('text/html', content='html')
+        get_response('application/json', content='json')
+
+        response = get_response('text/html')
+        self.assertIs(response._from_cache, True)
+        self.assertEqual(response.content, b'html')
+        self.assertEqual(response['Vary'], 'Accept')
+        self.assertEqual(get_response('application/json').content, b'json')
+
+
+@mock.patch.object(site_cache_middleware, 'CACHE_MIDDLEWARE_PREFIX_INVALIDATION', True)
+class InvalidationTestCase(SiteCacheMiddlewareTestCase):
+    def store(self, path, language_code='en'):
+        request = RequestFactory().get(path)
+        request.LANGUAGE_CODE = language_code
+        self.update.process_response(request, HttpResponse(f'{path} {language_code}'))
+
+    def is_cached(self, path, language_code='en'):
+        request = RequestFactory().get(path)
+        request.LANGUAGE_CODE = language_code
+        return self.fetch.process_request(request) is not None
+
+    def test_delete_cache_prefix(self):
+        paths = ('/', '/blog/', '/blog/?page=2', '/blog/2026/foo/', '/blogger/', '/about/')
+        for path in paths:
+            for language_code in ('en', 'de'):
+                self.store(path, language_code)
+                self.assertIs(self.is_cached(path, language_code), True)
+
+        # Only one cache call:
+        with mock.patch.object(cache, 'incr', wraps=cache.incr) as incr, \
+                mock.patch.object(cache, 'get_many') as get_many, \
+                mock.patch.object(cache, 'set_many') as set_many:
+            site_cache_middleware.delete_cache_prefix('/blog/')
+        incr.assert_called_once_with('DJANGOTOOLS_SITE_CACHE_GENERATION:1:/blog/')
+        get_many.assert_not_called()
+        set_many.assert_not_called()
+
+        for path in paths:
+            for language_code in ('en', 'de'):
+                self.assertIs(
+                    self.is_cached(path, language_code), path not in ('/blog/', '/blog/?page=2', '/blog/2026/foo/')
+                )
+
+        # Complete path segments only:
+        site_cache_middleware.delete_cache_prefix('/blo')
+        self.assertIs(self.is_cached('/blogger/', 'de'), True)
+        site_cache_middleware.delete_cache_prefix('/blogger')
+        self.assertIs(self.is_cached('/blogger/', 'de'), False)
+        self.assertIs(self.is_cached('/about/', 'de'), True)
+
+        # New pages are cached again:
+        self.store('/blog/2026/foo/')
+        self.assertIs(self.is_cached('/blog/2026/foo/'), True)
+
+        site_cache_middleware.delete_cache_prefix('/')
+        self.assertIs(self.is_cached('/about/', 'de'), False)
+        self.assertIs(self.is_cached('/blog/2026/foo/'), False)
+
+        # Other sites are not affected:
+        self.store('/foo/')
+        with self.settings(SITE_ID=2):
+            self.store('/foo/')
+            site_cache_middleware.delete_cache_prefix('/foo/')
+            self.assertIs(self.is_cached('/foo/'), False)
+        self.assertIs(self.is_cached('/foo/'), True)
+
+    @mock.patch.object(site_cache_middleware, 'POLICY_TABLE', PolicyTable((('/api/', {'vary': ('Accept',)}),)))
+    def test_vary_variants(self):
+        def get_request(accept):
+            request = self.get_request('/api/')
+            request.META['HTTP_ACCEPT'] = accept
+            return request
+
+        for accept in ('text/html', 'application/json'):
+            self.update.process_response(get_request(accept), HttpResponse(accept))
+            self.assertIsNotNone(self.fetch.process_request(get_request(accept)))
+
+        site_cache_middleware.delete_cache_prefix('/api/')
+        for accept in ('text/html', 'application/json'):
+            self.assertIsNone(self.fetch.process_request(get_request(accept)))
+
+    def test_invalidate_while_rendering(self):
+        request = self.get_request('/foo/')
+        self.assertIsNone(self.fetch.process_request(request))  # The generation is fetched here
+
+        site_cache_middleware.delete_cache_prefix('/foo/')  # e.g. the page is changed in a other process
+
+        # The rendered page may contain the old data -> stored with the old generation:
+        self.update.process_response(request, HttpResponse(HTML))
+        self.assertIsNone(self.fetch_response('/foo/'))
+
+    def test_evicted_generation(self):
+        self.store('/foo/bar/')
+        self.assertIs(self.is_cached('/foo/bar/'), True)
+
+        cache.delete('DJANGOTOOLS_SITE_CACHE_GENERATION:1:/foo/')  # e.g. evicted by the backend
+        self.assertIs(self.is_cached('/foo/bar/'), False)
+
+        # Invalidation without a counter:
+        self.store('/foo/bar/')
+        cache.delete('DJANGOTOOLS_SITE_CACHE_GENERATION:1:/foo/bar/')
+        site_cache_middleware.delete_cache_prefix('/foo/bar/')
+        self.assertIs(self.is_cached('/foo/bar/'), False)
+
+    def test_delete_cache_items(self):
+        for path in ('/foo/', '/bar/', '/baz/'):
+            for language_code in ('en', 'de'):
+                self.store(path, language_code)
+
+        with mock.patch.object(cache, 'delete_many', wraps=cache.delete_many) as delete_many:
+            site_cache_middleware.delete_cache_items(['/foo/', '/bar/'], ['en', 'de'])
+        delete_many.assert_called_once()
+        for path, cached in (('/foo/', False), ('/bar/', False), ('/baz/', True)):
+            self.assertIs(self.is_cached(path, 'en'), cached)
+            self.assertIs(self.is_cached(path, 'de'), cached)
+
+        site_cache_middleware.delete_cache_item('/baz/', 'en')
+        self.assertIs(self.is_cached('/baz/', 'en'), False)
+        self.assertIs(self.is_cached('/baz/', 'de'), True)
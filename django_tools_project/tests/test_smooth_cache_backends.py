@@ -0,0 +1,676 @@
+"""
+    Test smooth cache backends
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    :copyleft: 2026 by the django-tools team, see AUTHORS for more details.
+    :license: GNU GPL v3 or above, see LICENSE for more details.
+"""
+
+import tempfile
+import time
+from unittest import mock
+
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management.commands import createcachetable
+from django.db import DEFAULT_DB_ALIAS
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from django_tools.cache import pressure, smooth_cache_backends
+from django_tools.cache.smooth_cache_backends import (
+    SMOOTH_CACHE_CHANGE_TIME,
+    SmoothCacheTime,
+    SmoothDatabaseCache,
+    SmoothFileBasedCache,
+    SmoothLocMemCache,
+    SmoothTwoTierCache,
+    get_entry_expires,
+    get_tag_key,
+    pack_entry,
+    unpack_entry,
+)
+from django_tools_project.benchmarks.smooth_cache_envelope import benchmark_envelope
+
+
+class FakeClock:
+    """
+    Mock time.time(), time.monotonic() and os.getloadavg()
+    """
+
+    def __init__(self, now=None, load=0.0):
+        if now is None:
+            now = int(time.time())
+        self.now = now
+        self.load = load
+
+    def __enter__(self):
+        self.patchers = (
+            mock.patch('time.time', side_effect=lambda: self.now),
+            mock.patch('time.monotonic', side_effect=lambda: self.now),
+            mock.patch('os.getloadavg', side_effect=lambda: (self.load, self.load, self.load)),
+        )
+        for patcher in self.patchers:
+            patcher.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        for patcher in self.patchers:
+            patcher.stop()
+
+
+class SmoothCacheTestCase(SimpleTestCase):
+    def setUp(self):
+        super().setUp()
+        smooth_cache_backends._ENGINES.clear()
+        pressure._PROVIDERS.clear()
+        self.cache = SmoothLocMemCache('test-smooth-cache', {})
+        LocMemCache.clear(self.cache)  # Clear without smooth_update()
+
+    def tearDown(self):
+        smooth_cache_backends._ENGINES.clear()
+        pressure._PROVIDERS.clear()
+        super().tearDown()
+
+
+class SmoothCacheEngineTestCase(SmoothCacheTestCase):
+    def test_shared_engine(self):
+        other_thread_cache = SmoothLocMemCache('test-smooth-cache', {})
+        self.assertIs(self.cache.smooth_engine, other_thread_cache.smooth_engine)
+
+        other_cache = SmoothLocMemCache('other-location', {})
+        self.assertIsNot(self.cache.smooth_engine, other_cache.smooth_engine)
+
+    def test_smooth_update_by_load(self):
+        with FakeClock(load=0.0) as clock:  # max age: 5 sec
+            self.cache.set('foo', 'bar')
+            self.assertEqual(self.cache.get('foo'), 'bar')
+
+            engine = self.cache.smooth_engine
+            self.assertEqual(engine.timestamp_fetches, 1)
+            self.assertEqual(engine.load_evictions, 0)
+
+            self.cache.smooth_update()
+            self.assertEqual(self.cache.get(SMOOTH_CACHE_CHANGE_TIME, raw=True), clock.now)
+            # The timestamp should never expire:
+            self.assertIsNone(self.cache._expire_info[self.cache.make_key(SMOOTH_CACHE_CHANGE_TIME)])
+
+            clock.now += 3
+            self.assertEqual(self.cache.get('foo'), 'bar')  # Keep by load
+
+            clock.now += 3
+            self.assertEqual(self.cache.get('foo'), None)  # out-dated
+            self.assertEqual(engine.load_evictions, 1)
+
+            self.cache.set('foo', 'new')
+            clock.now += 1
+            self.assertEqual(self.cache.get('foo'), 'new')
+
+        info = engine.get_info()
+        self.assertEqual(info['max_age'], 5)
+        self.assertEqual(info['load_evictions'], 1)
+
+    def test_high_load(self):
+        with FakeClock(load=5.0) as clock:  # max age: 1h
+            self.cache.set('foo', 'bar')
+            self.cache.smooth_update()
+
+            clock.now += 60
+            self.assertEqual(self.cache.get('foo'), 'bar')
+
+            clock.now += 3600
+            self.assertEqual(self.cache.get('foo'), None)
+
+    def test_sample_load_once_per_tick(self):
+        with FakeClock() as clock:
+            self.cache.set('foo', 'bar')
+            with mock.patch('os.getloadavg', return_value=(0, 0, 0)) as getloadavg:
+                for _ in range(10):
+                    self.assertEqual(self.cache.get('foo'), 'bar')
+                self.assertEqual(getloadavg.call_count, 1)
+
+                clock.now += smooth_cache_backends.SMOOTH_CACHE_LOAD_INTERVAL
+                self.assertEqual(self.cache.get('foo'), 'bar')
+                self.assertEqual(getloadavg.call_count, 2)
+
+    def test_sync_change_time_from_other_process(self):
+        with FakeClock() as clock:
+            self.cache.set('foo', 'bar')
+            self.assertEqual(self.cache.get('foo'), 'bar')
+            engine = self.cache.smooth_engine
+            self.assertEqual(engine.timestamp_fetches, 1)
+
+            # smooth_update() in a other process:
+            clock.now += 1
+            self.cache.set(SMOOTH_CACHE_CHANGE_TIME, clock.now, raw=True)
+
+            # The new change time will be fetched after SMOOTH_CACHE_UPDATE_TIMESTAMP sec.:
+            clock.now += 10
+            self.assertEqual(self.cache.get('foo'), None)
+            self.assertEqual(engine.timestamp_fetches, 2)
+            self.assertEqual(engine.change_time, clock.now - 10)
+
+
+class SmoothCacheEnvelopeTestCase(SmoothCacheTestCase):
+    def test_packed_entry(self):
+        with FakeClock() as clock:
+            self.cache.set('foo', {'bar': 1})
+            entry = self.cache.get('foo', raw=True)
+            self.assertIsInstance(entry, bytes)
+            self.assertEqual(entry, pack_entry({'bar': 1}, create_time=clock.now, expires=clock.now + 300))
+            self.assertNotIn(b'smooth_cache_backends', entry)
+            self.assertEqual(self.cache.get('foo'), {'bar': 1})
+
+    def test_old_tuple_format(self):
+        with FakeClock() as clock:
+            self.cache.set('foo', (SmoothCacheTime(), 'old format'), raw=True)
+            self.assertEqual(self.cache.get('foo'), 'old format')
+
+            self.cache.smooth_update()
+            clock.now += 10
+            self.assertEqual(self.cache.get('foo'), None)
+
+    def test_invalid_entry(self):
+        self.cache.set('foo', 'not packed', raw=True)
+        with self.assertLogs(logger='django_tools.cache.smooth_cache_backends', level='ERROR') as logs:
+            self.assertEqual(self.cache.get('foo', 'default'), 'default')
+        self.assertIn("Maybe 'foo' is a old cache entry?", logs.output[0])
+        self.assertEqual(self.cache.get('foo', raw=True), None)  # invalid entry deleted
+
+    def test_benchmark(self):
+        results = benchmark_envelope(iterations=1)
+        self.assertEqual(len(results), 4)
+        for result in results:
+            self.assertLess(result['envelope size'], result['tuple size'])
+
+
+class SmoothCacheTagsTestCase(SmoothCacheTestCase):
+    def test_invalidate_tags(self):
+        with FakeClock() as clock:
+            self.cache.set('post', 'blog post', tags=['blog'])
+            self.cache.set('page', 'cms page', tags=['cms', 'pages'])
+            self.cache.set_many({'menu1': 'cms menu', 'menu2': 'blog menu'}, tags=['menu'])
+            self.cache.set('plain', 'no tags')
+
+            self.cache.smooth_update(tags=['blog', 'menu'])
+            self.assertEqual(self.cache.get(get_tag_key('blog'), raw=True), clock.now)
+
+            clock.now += 3
+            self.assertEqual(self.cache.get('post'), 'blog post')  # Keep by load
+
+            clock.now += 3
+            self.assertEqual(self.cache.get('post'), None)
+            self.assertEqual(self.cache.get('page'), 'cms page')
+            self.assertEqual(self.cache.get_many(['menu1', 'menu2', 'plain']), {'plain': 'no tags'})
+
+            # A global smooth_update() renew all entries:
+            self.cache.smooth_update()
+            clock.now += 10
+            self.assertEqual(self.cache.get_many(['page', 'plain']), {})
+
+    def test_one_lookup_for_all_tags(self):
+        with FakeClock():
+            self.cache.set('plain', 'no tags')
+            self.cache.get('plain')  # fetch the global change time
+            self.cache.set('foo', 'bar', tags=['one', 'two', 'three'])
+
+            with mock.patch.object(self.cache, 'get_many', wraps=self.cache.get_many) as get_many:
+                self.assertEqual(self.cache.get('foo'), 'bar')
+                self.assertEqual(self.cache.get('foo'), 'bar')
+            get_many.assert_called_once_with(
+                [get_tag_key('one'), get_tag_key('two'), get_tag_key('three')],
+                raw=True,
+            )
+            self.assertEqual(
+                self.cache.smooth_engine.get_info()['tag_change_times'],
+                {'one': 0, 'two': 0, 'three': 0},
+            )
+
+    def test_sync_tags_from_other_process(self):
+        with FakeClock() as clock:
+            self.cache.smooth_update()
+            clock.now += 1
+            self.cache.set('foo', 'bar', tags=['blog'])
+            self.assertEqual(self.cache.get('foo'), 'bar')
+            engine = self.cache.smooth_engine
+            self.assertEqual(engine.timestamp_fetches, 1)
+
+            # smooth_update(tags=['blog']) in a other process:
+            clock.now += 1
+            self.cache.set(get_tag_key('blog'), clock.now, timeout=None, raw=True)
+
+            clock.now += 5
+            self.assertEqual(self.cache.get('foo'), 'bar')  # not synced, yet
+
+            # The tag timestamps are fetched together with the global change time:
+            clock.now += 5
+            self.assertEqual(self.cache.get('foo'), None)
+            self.assertEqual(engine.timestamp_fetches, 2)
+
+    def test_invalid_tag(self):
+        with self.assertRaisesMessage(ValueError, "Invalid tags: ['foo\\nbar']"):
+            self.cache.set('foo', 'bar', tags=['foo\nbar'])
+
+
+class StaleWhileRevalidateTestCase(SmoothCacheTestCase):
+    def setUp(self):
+        super().setUp()
+        self.cache.stale_while_revalidate = True
+
+    def test_one_caller_refreshes(self):
+        with FakeClock() as clock:
+            self.cache.set('foo', 'old')
+            self.cache.smooth_update()
+            clock.now += 10
+
+            # The first caller should refresh the entry:
+            self.assertEqual(self.cache.get('foo'), None)
+
+            # All other callers get the stale value:
+            self.assertEqual(self.cache.get('foo'), 'old')
+            self.assertEqual(self.cache.get_many(['foo']), {'foo': 'old'})
+            self.assertEqual(self.cache.smooth_engine.stale_hits, 2)
+
+            self.cache.set('foo', 'new')
+            clock.now += 1
+            self.assertEqual(self.cache.get('foo'), 'new')
+
+            # A new smooth_update() results in a new refresh:
+            self.cache.smooth_update()
+            clock.now += 10
+            self.assertEqual(self.cache.get('foo', 'refresh'), 'refresh')
+            self.assertEqual(self.cache.get('foo'), 'new')
+
+    def test_get_or_set(self):
+        with FakeClock() as clock:
+            self.cache.set('foo', 'old')
+            self.cache.smooth_update()
+            clock.now += 10
+
+            self.assertEqual(self.cache.get_or_set('foo', lambda: 'new'), 'new')
+            self.assertEqual(self.cache.get('foo'), 'new')
+
+            self.cache.smooth_update()
+            clock.now += 10
+            self.assertEqual(self.cache.get('foo'), None)  # Refresh lock taken by other caller
+            self.assertEqual(self.cache.get_or_set('foo', 'not used'), 'new')  # stale value
+
+
+class SmoothCacheAsyncTestCase(SmoothCacheTestCase):
+    async def test_aget_aset(self):
+        with FakeClock() as clock:
+            await self.cache.asmooth_update()
+            clock.now += 1
+
+            await self.cache.aset('foo', 'bar')
+            await self.cache.aset_many({'one': 1, 'two': 2}, tags=['numbers'])
+            self.assertEqual(await self.cache.aget('foo'), 'bar')
+            self.assertEqual(await self.cache.aget('missing', 'default'), 'default')
+            self.assertEqual(await self.cache.aget_many(['one', 'two', 'missing']), {'one': 1, 'two': 2})
+            self.assertEqual(self.cache.get('foo'), 'bar')  # Same format as the sync API
+
+            self.assertIs(await self.cache.aadd('foo', 'new'), False)
+            self.assertEqual(await self.cache.aget_or_set('other', lambda: 'value'), 'value')
+
+            clock.now += 1
+            await self.cache.asmooth_update(tags=['numbers'])
+            clock.now += 6
+            self.assertEqual(await self.cache.aget_many(['foo', 'one', 'two']), {'foo': 'bar'})
+            self.assertEqual(await self.cache.aget('one', raw=True), None)  # out-dated entries deleted
+
+    async def test_non_blocking_timestamp_refresh(self):
+        with FakeClock() as clock:
+            await self.cache.asmooth_update()
+            clock.now += 1
+            await self.cache.aset('foo', 'bar')
+            self.assertEqual(await self.cache.aget('foo'), 'bar')
+            engine = self.cache.smooth_engine
+            await engine.refresh_task
+            self.assertEqual(engine.timestamp_fetches, 1)
+
+            # smooth_update() in a other process:
+            clock.now += 1
+            self.cache.set(SMOOTH_CACHE_CHANGE_TIME, clock.now, raw=True)
+
+            # The new change time would be fetched in background:
+            clock.now += 10
+            self.assertEqual(await self.cache.aget('foo'), 'bar')
+            self.assertEqual(engine.change_time, clock.now - 12)
+
+            await engine.refresh_task
+            self.assertEqual(engine.timestamp_fetches, 2)
+            self.assertEqual(engine.change_time, clock.now - 10)
+            self.assertEqual(await self.cache.aget('foo'), None)
+
+    async def test_failing_first_timestamp_fetch(self):
+        self.cache.set('foo', 'bar')
+        engine = self.cache.smooth_engine
+        with mock.patch.object(self.cache, '_raw_get_many', side_effect=ConnectionError('backend down')), \
+                self.assertLogs(logger='django_tools.cache.smooth_cache_backends', level='ERROR') as logs:
+            self.assertEqual(await self.cache.aget('foo'), 'bar')
+            self.assertEqual(await self.cache.aget('foo'), 'bar')  # Fetch is retried
+        self.assertIn("Can't fetch the change time", logs.output[0])
+        self.assertEqual(engine.timestamp_fetches, 2)
+        self.assertIsNone(engine.change_time)
+
+        # Backend is back:
+        self.assertEqual(await self.cache.aget('foo'), 'bar')
+        self.assertEqual(engine.timestamp_fetches, 3)
+        self.assertIsNotNone(engine.change_time)
+
+    async def test_locmem_without_thread(self):
+        with mock.patch.object(smooth_cache_backends, 'sync_to_async') as sync_to_async:
+            await self.cache.aset('foo', 'bar')
+            await self.cache.aget('foo')
+        sync_to_async.assert_not_called()
+
+
+class SmoothCacheBulkTestMixin:
+    def test_get_many_set_many(self):
+        with FakeClock() as clock:
+            self.assertEqual(self.cache.set_many({'foo': 1, 'bar': [2]}), [])
+            self.assertEqual(self.cache.get_many(['foo', 'bar', 'baz']), {'foo': 1, 'bar': [2]})
+            self.assertEqual(self.cache.get('bar'), [2])
+
+            # All values are packed:
+            raw_data = self.cache.get_many(['foo', 'bar'], raw=True)
+            self.assertEqual(
+                {key: unpack_entry(entry) for key, entry in raw_data.items()},
+                {'foo': (clock.now, 1), 'bar': (clock.now, [2])},
+            )
+
+            self.cache.smooth_update()
+            clock.now += 10
+            self.cache.set('baz', 3)
+            self.assertEqual(self.cache.get_many(['foo', 'bar', 'baz']), {'baz': 3})
+
+            # Out-dated entries are deleted:
+            self.assertEqual(self.cache.get_many(['foo', 'bar'], raw=True), {})
+
+    def test_delete_many(self):
+        self.cache.set_many({'foo': 1, 'bar': 2, 'baz': 3})
+        self.cache.delete_many(['foo', 'bar'])
+        self.assertEqual(self.cache.get_many(['foo', 'bar', 'baz']), {'baz': 3})
+
+    def test_get_or_set(self):
+        self.assertEqual(self.cache.get_or_set('foo', 'bar'), 'bar')
+        self.assertEqual(self.cache.get_or_set('foo', 'not used'), 'bar')
+        self.assertEqual(self.cache.get_or_set('callable', lambda: 'value'), 'value')
+        self.assertEqual(self.cache.get('callable'), 'value')
+
+    def test_add(self):
+        self.assertIs(self.cache.add('foo', 'bar'), True)
+        self.assertIs(self.cache.add('foo', 'other'), False)
+        self.assertEqual(self.cache.get('foo'), 'bar')
+
+    def test_incr_decr(self):
+        with FakeClock() as clock:
+            self.cache.set('counter', 1)
+            self.assertEqual(self.cache.incr('counter'), 2)
+            self.assertEqual(self.cache.incr('counter', 10), 12)
+            self.assertEqual(self.cache.decr('counter', 2), 10)
+            self.assertEqual(self.cache.get('counter'), 10)
+
+            with self.assertRaisesMessage(ValueError, "Key 'missing' not found"):
+                self.cache.incr('missing')
+
+            # incr() doesn't renew the create time:
+            self.cache.smooth_update()
+            clock.now += 10
+            with self.assertRaisesMessage(ValueError, "Key 'counter' not found"):
+                self.cache.incr('counter')
+
+    def test_incr_keeps_expire_time(self):
+        with FakeClock() as clock:
+            self.cache.smooth_update()
+            clock.now += 1
+            self.cache.set('counter', 1, timeout=60)
+            self.cache.set('forever', 1, timeout=None)
+            clock.now += 50
+            self.assertEqual(self.cache.incr('counter'), 2)
+            self.assertEqual(self.cache.incr('forever'), 2)
+            self.assertEqual(get_entry_expires(self.cache.get('counter', raw=True)), clock.now + 10)
+            self.assertEqual(get_entry_expires(self.cache.get('forever', raw=True)), 0)
+
+            clock.now += 11
+            with self.assertRaisesMessage(ValueError, "Key 'counter' not found"):
+                self.cache.incr('counter')  # Expired with the origin timeout
+            self.assertEqual(self.cache.incr('forever'), 3)
+
+            # touch() sets a new expire time, that is used by incr(), too:
+            self.cache.set('counter', 1, timeout=10)
+            self.assertIs(self.cache.touch('counter', 100), True)
+            clock.now += 50
+            self.assertEqual(self.cache.incr('counter'), 2)
+            self.assertEqual(get_entry_expires(self.cache.get('counter', raw=True)), clock.now + 50)
+            self.assertIs(self.cache.touch('missing'), False)
+
+    def test_change_time_never_expires(self):
+        with FakeClock() as clock:
+            self.cache.smooth_update()
+            change_time = clock.now
+            clock.now += self.cache.default_timeout + 1
+            self.assertEqual(self.cache.get(SMOOTH_CACHE_CHANGE_TIME, raw=True), change_time)
+
+    async def test_async(self):
+        await self.cache.aset('foo', 'bar')
+        await self.cache.aset_many({'one': 1, 'two': 2})
+        self.assertEqual(await self.cache.aget('foo'), 'bar')
+        self.assertEqual(await self.cache.aget_many(['foo', 'one', 'missing']), {'foo': 'bar', 'one': 1})
+        self.assertEqual(await self.cache.aget_or_set('two', 'new'), 2)
+
+
+class SmoothLocMemCacheBulkTestCase(SmoothCacheBulkTestMixin, SmoothCacheTestCase):
+    pass
+
+
+class SmoothFileBasedCacheBulkTestCase(SmoothCacheBulkTestMixin, SmoothCacheTestCase):
+    def setUp(self):
+        smooth_cache_backends._ENGINES.clear()
+        pressure._PROVIDERS.clear()
+        self.temp_dir = tempfile.TemporaryDirectory(prefix='smooth_cache_')
+        self.cache = SmoothFileBasedCache(self.temp_dir.name, {})
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+        super().tearDown()
+
+
+class SmoothDatabaseCacheBulkTestCase(SmoothCacheBulkTestMixin, SmoothCacheTestCase, TestCase):
+    def setUp(self):
+        smooth_cache_backends._ENGINES.clear()
+        pressure._PROVIDERS.clear()
+        command = createcachetable.Command()
+        command.verbosity = 0
+        command.create_table(DEFAULT_DB_ALIAS, 'smooth_cache_table', dry_run=False)
+        self.cache = SmoothDatabaseCache('smooth_cache_table', {})
+
+    def test_get_many_with_one_query(self):
+        self.cache.set_many({f'key{no}': no for no in range(20)})
+        self.cache.get('key0')  # fetch the change time
+
+        with self.assertNumQueries(1):
+            data = self.cache.get_many([f'key{no}' for no in range(20)])
+        self.assertEqual(data, {f'key{no}': no for no in range(20)})
+
+
+@override_settings(
+    CACHES={
+        'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+        'smooth-shared': {
+            'BACKEND': 'django_tools.cache.smooth_cache_backends.SmoothLocMemCache',
+            'LOCATION': 'test-smooth-cache',
+        },
+        # Two tiers with different options in front of the same shared cache:
+        'small-two-tier': {
+            'BACKEND': 'django_tools.cache.smooth_cache_backends.SmoothTwoTierCache',
+            'LOCATION': 'smooth-shared',
+            'OPTIONS': {'MAX_ENTRIES': 1},
+        },
+        'big-two-tier': {
+            'BACKEND': 'django_tools.cache.smooth_cache_backends.SmoothTwoTierCache',
+            'LOCATION': 'smooth-shared',
+            'OPTIONS': {'MAX_ENTRIES': 10, 'EVICTION': 'FIFO'},
+        },
+    }
+)
+class SmoothTwoTierCacheTestCase(SmoothCacheTestCase):
+    def setUp(self):
+        super().setUp()
+        smooth_cache_backends._LOCAL_TIERS.clear()
+        self.cache = caches['smooth-shared']  # Uses the new SmoothCacheEngine
+        self.two_tier = SmoothTwoTierCache('smooth-shared', {'OPTIONS': {'MAX_ENTRIES': 3}})
+
+    def tearDown(self):
+        smooth_cache_backends._LOCAL_TIERS.clear()
+        del caches['smooth-shared']
+        super().tearDown()
+
+    def test_local_hits(self):
+        with FakeClock() as clock:
+            self.two_tier.smooth_update()
+            clock.now += 1
+
+            self.cache.set('foo', 'bar')  # set in the shared cache, only
+            self.assertEqual(self.two_tier.get('foo'), 'bar')
+            self.assertEqual(self.two_tier.get('foo'), 'bar')
+            self.assertEqual(self.two_tier.get('missing', 'default'), 'default')
+            self.two_tier.set('one', 1)
+            self.assertEqual(self.cache.get('one'), 1)
+            self.assertEqual(self.two_tier.get_many(['foo', 'one', 'missing']), {'foo': 'bar', 'one': 1})
+
+            stats = self.two_tier.get_stats()
+            self.assertEqual(stats['local_hits'], 3)
+            self.assertEqual(stats['local_misses'], 3)
+            self.assertEqual(stats['shared_hits'], 1)
+            self.assertEqual(stats['shared_misses'], 2)
+
+            # Other threads use the same local tier:
+            other_thread = SmoothTwoTierCache('smooth-shared', {'OPTIONS': {'MAX_ENTRIES': 3}})
+            self.assertIs(other_thread.local_tier, self.two_tier.local_tier)
+
+    def test_aliases_with_same_location(self):
+        small, big = caches['small-two-tier'], caches['big-two-tier']
+        self.assertIsNot(small.local_tier, big.local_tier)
+        self.assertEqual(small.local_tier.max_entries, 1)
+        self.assertEqual(big.local_tier.max_entries, 10)
+        self.assertFalse(big.local_tier.lru)
+
+        with FakeClock() as clock:
+            self.cache.smooth_update()
+            clock.now += 1
+
+            big.set_many({'a': 1, 'b': 2})
+            self.assertEqual(len(big.local_tier.entries), 2)
+            self.assertEqual(small.get_many(['a', 'b']), {'a': 1, 'b': 2})  # via the shared cache
+            self.assertEqual(len(small.local_tier.entries), 1)
+
+    def test_stale_while_revalidate(self):
+        self.cache.stale_while_revalidate = True
+        with FakeClock() as clock:
+            self.two_tier.smooth_update()
+            clock.now += 1
+            self.two_tier.set('foo', 'old', tags=['blog'])
+            self.assertEqual(self.two_tier.get('foo'), 'old')  # local hit
+
+            # Renewing tags doesn't drop the local tier:
+            self.two_tier.smooth_update(tags=['blog'])
+            clock.now += 10
+
+            # The first caller should refresh the entry:
+            self.assertEqual(self.two_tier.get('foo'), None)
+            self.assertEqual(self.cache.smooth_engine.stale_hits, 0)
+
+            # All other callers get the stale value:
+            self.assertEqual(self.two_tier.get('foo'), 'old')
+            self.assertEqual(self.cache.smooth_engine.stale_hits, 1)
+
+    def test_lru_eviction(self):
+        with FakeClock() as clock:
+            self.two_tier.smooth_update()
+            clock.now += 1
+
+            self.two_tier.set_many({'a': 1, 'b': 2, 'c': 3})
+            self.assertEqual(self.two_tier.get('a'), 1)  # 'b' is now the least recently used
+            self.two_tier.set('d', 4)
+
+            local_tier = self.two_tier.local_tier
+            self.assertEqual(len(local_tier.entries), 3)
+            self.assertEqual(local_tier.evictions, 1)
+
+            # 'b' must be fetched from the shared cache:
+            self.assertEqual(self.two_tier.get('b'), 2)
+            self.assertEqual(local_tier.shared_hits, 1)
+
+    def test_fifo_eviction(self):
+        two_tier = SmoothTwoTierCache('other-two-tier', {'OPTIONS': {'MAX_ENTRIES': 2, 'EVICTION': 'FIFO'}})
+        local_tier = two_tier.local_tier
+        local_tier.put('a', b'1')
+        local_tier.put('b', b'2')
+        self.assertEqual(local_tier.get('a'), b'1')  # doesn't change the order
+        local_tier.put('c', b'3')
+        self.assertEqual(list(local_tier.entries), ['b', 'c'])
+
+        with self.assertRaisesMessage(ImproperlyConfigured, "Unknown eviction policy 'RANDOM'"):
+            SmoothTwoTierCache('bad', {'OPTIONS': {'EVICTION': 'RANDOM'}})
+
+    def test_local_timeout(self):
+        with FakeClock() as clock:
+            self.two_tier.smooth_update()
+            clock.now += 1
+            self.two_tier.set('foo', 'bar')
+
+            # Change the shared entry directly, e.g. from a other process:
+            self.cache.set('foo', 'new')
+            self.assertEqual(self.two_tier.get('foo'), 'bar')
+
+            clock.now += smooth_cache_backends.SMOOTH_CACHE_UPDATE_TIMESTAMP + 1
+            self.assertEqual(self.two_tier.get('foo'), 'new')
+
+    def test_drop_local_tier_on_change_time(self):
+        with FakeClock() as clock:
+            self.two_tier.smooth_update()
+            clock.now += 1
+            self.two_tier.set('foo', 'bar')
+            self.assertEqual(self.two_tier.get('foo'), 'bar')
+
+            # smooth_update() in a other process:
+            clock.now += 1
+            self.cache.set(SMOOTH_CACHE_CHANGE_TIME, clock.now, raw=True)
+            clock.now += 1
+            self.cache.set('foo', 'new')
+
+            clock.now += 6
+            self.assertEqual(self.two_tier.get('foo'), 'bar')  # change time not fetched, yet
+            self.assertEqual(self.cache.smooth_engine.change_time, clock.now - 9)
+
+            clock.now += 2
+            self.assertEqual(self.two_tier.get('foo'), 'new')  # fetch the new change time
+            self.assertEqual(self.cache.smooth_engine.change_time, clock.now - 9)
+
+            self.assertEqual(self.two_tier.get('foo'), 'new')
+            stats = self.two_tier.get_stats()
+            self.assertEqual(stats['drops'], 1)
+            self.assertEqual(stats['shared_hits'], 1)
+
+    def test_delete_and_tags(self):
+        with FakeClock() as clock:
+            self.two_tier.smooth_update()
+            clock.now += 1
+            self.two_tier.set('foo', 'bar', tags=['pages'])
+            self.two_tier.set('other', 'value')
+
+            clock.now += 1
+            self.two_tier.smooth_update(tags=['pages'])
+            clock.now += 6
+            self.assertEqual(self.two_tier.get('foo'), None)
+            self.assertEqual(self.two_tier.get('other'), 'value')
+
+            self.two_tier.delete('other')
+            self.assertEqual(self.two_tier.get('other'), None)
+            self.assertEqual(self.cache.get('other'), None)
+
+    def test_no_smooth_backend(self):
+        two_tier = SmoothTwoTierCache('default', {})
+        with self.assertRaisesMessage(ImproperlyConfigured, "Cache 'default' is not a smooth cache backend"):
+            two_tier.get('foo')
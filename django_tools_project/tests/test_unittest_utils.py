@@ -21,7 +21,7 @@ from django_tools.unittest_utils.assertments import (
     assert_startswith,
     dedent,
 )
-from django_tools.unittest_utils.print_sql import PrintQueries
+from django_tools.unittest_utils.print_sql import AssertQueryBudget, PrintQueries
 from django_tools.unittest_utils.stdout_redirect import StdoutStderrBuffer
 from django_tools.unittest_utils.tempdir import TempDir
 from django_tools.unittest_utils.template import TEMPLATE_INVALID_PREFIX, set_string_if_invalid
@@ -182,6 +182,23 @@ class TestBaseTestCase(TestUserMixin, HtmlAssertionMixin, TestCase):
         self.assertIn("1 - SELECT COUNT(", output)
         self.assertIn('FROM "auth_user"', output)
 
+    def test_assert_query_budget(self):
+        with AssertQueryBudget('Within budget', max_queries=2, max_repeats=1, max_time=60) as queries:
+            self.UserModel.objects.all().count()
+            self.UserModel.objects.filter(pk=1).exists()
+        self.assertEqual(len(queries.captured_queries), 2)
+
+        with self.assertRaises(AssertionError) as cm, AssertQueryBudget('N+1', max_queries=3, max_repeats=1):
+            for pk in range(3):
+                self.UserModel.objects.filter(pk=pk).exists()
+            self.UserModel.objects.all().count()
+        report = str(cm.exception)
+        self.assertIn(' *** N+1 ***', report)
+        self.assertIn('Query budget exceeded: 4 queries (max: 3), a statement executed 3 times (max: 1)', report)
+        self.assertIn('3 x ', report)
+        self.assertIn('"auth_user"."id" = ? LIMIT ? <-- repeated', report)
+        self.assertIn('1 x ', report)
+
     def test_create_users(self):
         self.UserModel.objects.all().delete()
 